@@ -1,24 +1,25 @@
-import streamlit as st
-import pandas as pd
-from auth import (create_user, authenticate_user, insert_session, 
-                  get_sessions_for_user, get_sessions_hosted_by, propose_slots_to_session, 
-                  get_proposed_slots, finalize_slot, get_session_by_id, 
-                  get_resources, add_resource)
-from bson.objectid import ObjectId
-from cloudinary_config import cloudinary
-import cloudinary.uploader
+import startup_profile
+with startup_profile.section("import:core"):
+    import streamlit as st
+    from auth import (create_user, authenticate_user, insert_session, propose_slots_to_session,
+                      finalize_slot, get_session_by_id, 
+                      get_resources, add_resource, get_session_summaries_for_user,
+                      get_session_summaries_hosted_by, get_vote_counts,
+                      verified_credentials, get_ballots, find_conflicts,
+                      insert_series, get_occurrences_for_users, search_sessions,
+                      rank_vote_counts, new_session_document)
+    from recurrence import WEEKDAYS
+    from auth_executor import AuthBusyError
+    from rate_limit import RateLimited
+    import notifications
+    import tracing
+    from bson.objectid import ObjectId
 from datetime import datetime, timedelta
-from collections import Counter
-import base64
-import os
-import sendgrid
-from sendgrid.helpers.mail import Mail
-from dotenv import load_dotenv
-import pickle
-import json
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
+import uuid
+
+# pandas, pyarrow, Cloudinary and the Google client libraries are imported
+# inside the pages that use them, so the login screen and dashboard start
+# without them. Python caches the modules, so only the first visit pays.
 
 
 st.set_page_config(page_title="StudySync", layout="centered")
@@ -29,6 +30,9 @@ if "user_email" not in st.session_state:
     st.session_state.user_email = None
 if "page" not in st.session_state:
     st.session_state.page = "dashboard"
+if "auth_token" not in st.session_state:
+    # Identifies this browser session, e.g. for login throttling without a client address
+    st.session_state.auth_token = uuid.uuid4().hex
 
 # 
 # --- Sidebar ---
@@ -39,41 +43,83 @@ with st.sidebar:
     else:
         st.title("📚StudySync")
         if st.button("Logout"):
+            # Signing out also ends the bcrypt-free re-login for this account
+            verified_credentials.forget(st.session_state.user_email)
+            st.session_state.pop("credentials", None)
             st.session_state.authenticated = False
             st.session_state.user_email = None
             st.rerun()
 
 # --- Main Area ---
-if not st.session_state.authenticated:
-    st.title(f"{st.session_state.auth_mode}")
-    email = st.text_input("Email")
-    password = st.text_input("Password", type="password")
-
-    if st.button("Submit"):
-        if st.session_state.auth_mode == "Login":
-            if authenticate_user(email, password):
-                st.session_state.authenticated = True
-                st.session_state.user_email = email
-                st.session_state.page = "dashboard"
-                st.success("✅ Logged in")
-                st.rerun()
-            else:
-                st.error("❌ Invalid credentials")
-        else:  # Register mode
-            ok = create_user(email, password)
-            if ok:
-                st.success("✅ Registered successfully. Please login.... ")
-            else:
-                st.error("❌ Registration failed")
+# Each rerun is timed as one span, e.g. "page.dashboard"
+with tracing.span("page." + (st.session_state.page if st.session_state.authenticated else "login")):
+    if not st.session_state.authenticated:
+        st.title(f"{st.session_state.auth_mode}")
+        email = st.text_input("Email")
+        password = st.text_input("Password", type="password")
+
+        # Throttling key for this browser. Behind a proxy the socket address is
+        # the proxy's, shared by every user, so the caller's address is only used
+        # when CLIENT_IP_HEADER names the header the proxy appends it to (the
+        # last entry is used) or CLIENT_IP_DIRECT says there is no proxy;
+        # otherwise each browser session is throttled on its own
+        proxy_header = st.secrets.get("CLIENT_IP_HEADER")
+        if proxy_header:
+            forwarded = st.context.headers.get(proxy_header)
+            client_ip = forwarded.split(",")[-1].strip() if forwarded else None
+        else:
+            client_ip = st.context.ip_address if st.secrets.get("CLIENT_IP_DIRECT") else None
+        client_id = client_ip or st.session_state.auth_token
 
-else:
-    if st.session_state.page == "dashboard":
-        load_dotenv()
-        st.title("📚 StudySync Dashboard")
-        st.write(f"Welcome, {st.session_state.user_email.split('@')[0].title()}!")
+        if st.button("Submit"):
+            try:
+                if st.session_state.auth_mode == "Login":
+                    if authenticate_user(email, password, client_id=client_id):
+                        st.session_state.authenticated = True
+                        st.session_state.user_email = email
+                        st.session_state.page = "dashboard"
+                        st.success("✅ Logged in")
+                        st.rerun()
+                    else:
+                        st.error("❌ Invalid credentials")
+                else:  # Register mode
+                    ok = create_user(email, password, client_id=client_id)
+                    if ok:
+                        st.success("✅ Registered successfully. Please login.... ")
+                    else:
+                        st.error("❌ Registration failed")
+            except AuthBusyError:
+                st.error("⏳ Too many sign-ins right now, please try again in a moment.")
+            except RateLimited as e:
+                st.error(f"🚫 Too many attempts. Please wait {int(e.retry_after) + 1} seconds and try again.")
 
-        # CSS styling for cards
-        st.markdown("""
+    else:
+        # Drains the email outbox, including jobs left over from before a restart
+        notifications.get_worker()
+        if st.secrets.get("METRICS_PORT"):
+            tracing.serve(st.secrets["METRICS_PORT"])
+
+        if st.session_state.page == "dashboard":
+            st.title("📚 StudySync Dashboard")
+            st.write(f"Welcome, {st.session_state.user_email.split('@')[0].title()}!")
+
+            query = st.text_input("🔎 Search your sessions and shared files",
+                                  placeholder="e.g. linear alg, notes.pdf, docs.google")
+            if query:
+                hits = search_sessions(st.session_state.user_email, query)
+                if not hits:
+                    st.info("No matches.")
+                for i, hit in enumerate(hits):
+                    if hit["kind"] == "resource":
+                        label = f"[{hit['label']}]({hit['url']})" if hit.get("url") else hit["label"]
+                        st.markdown(f"📎 {label} · in **{hit['session_title']}**")
+                    elif st.button(f"📚 {hit['label']}", key=f"search_hit_{i}"):
+                        st.session_state.focus_session = hit["session_id"]
+                        st.session_state.page = "resources"
+                        st.rerun()
+
+            # CSS styling for cards
+            st.markdown("""
     <style>
         .card-container {
             display: flex;
@@ -103,445 +149,638 @@ else:
     </style>
         """, unsafe_allow_html=True)
 
-        st.markdown('<div class="card-container">', unsafe_allow_html=True)
-
-        if st.button("📚 Create Study Session", key="create"):
-            st.session_state.page = "create_session"
-            st.rerun()
-
-        if st.button("🗳️ Vote on Session", key="vote"):
-            st.session_state.page = "vote_session"
-            st.rerun()
-
-        if st.button("🗳️ Finalize Votes", key="final_vote"):
-            st.session_state.page = "final_vote_session"
-            st.rerun()
-
-        if st.button("📁 View Resources", key="resources"):
-            st.session_state.page = "resources"
-            st.rerun()
+            st.markdown('<div class="card-container">', unsafe_allow_html=True)
 
-        if st.button("📅 Calendar View", key="calendar"):
-            st.session_state.page = "calendar"
-            st.rerun()
-
-        if st.button("📊 Feedback & Analytics", key="feedback"):
-            st.session_state.page = "feedback"
-            st.rerun()
+            if st.button("📚 Create Study Session", key="create"):
+                st.session_state.page = "create_session"
+                st.rerun()
 
-        st.markdown('</div>', unsafe_allow_html=True)
+            if st.button("🗳️ Vote on Session", key="vote"):
+                st.session_state.page = "vote_session"
+                st.rerun()
 
+            if st.button("🗳️ Finalize Votes", key="final_vote"):
+                st.session_state.page = "final_vote_session"
+                st.rerun()
 
-        # Other pages
-    elif st.session_state.page == "create_session":
-        st.title("📚 Create Study Session")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
-        # Session form
-        with st.form("create_session_form"):
-            session_title = st.text_input("📌 Session Topic", placeholder="e.g. Linear Algebra - Final Prep")
-            session_description = st.text_area("📝 Description", placeholder="Details, materials covered, etc.")
-    
-            participants = st.text_area("👥 Invite Participants (comma-separated emails)",
-                                 placeholder="e.g. alice@example.com, bob@university.edu")
+            if st.button("📁 View Resources", key="resources"):
+                st.session_state.page = "resources"
+                st.rerun()
 
-            propose_deadline = st.date_input("📅 Deadline to Propose Time Slots",
-                                     min_value=datetime.now().date() + timedelta(days=1))
+            if st.button("📅 Calendar View", key="calendar"):
+                st.session_state.page = "calendar"
+                st.rerun()
 
-            submitted = st.form_submit_button("➕ Create Session")
+            if st.button("📊 Feedback & Analytics", key="feedback"):
+                st.session_state.page = "feedback"
+                st.rerun()
 
-        # Handle form submission
-        if submitted:
-            if not session_title or not participants:
-                st.error("Please provide at least a title and one participant.")
-            else:
-                participant_list = [email.strip() for email in participants.split(",") if email.strip()]
-        
-                # Here you'd call your MongoDB insert function (replace with your function later)
-                session_data = {
-                    "host_email": st.session_state.user_email,
-                    "title": session_title,
-                    "description": session_description,
-                    "participants": participant_list,
-                    "propose_deadline": str(propose_deadline),
-                    "created_at": str(datetime.utcnow()),
-                    "finalized": False,
-                    "proposed_slots": [],
-                    "confirmed_slot": None
-                }
-
-                st.success("🎉 Session created successfully!")
-                insert_session(session_data)
-                st.success("🎉 Session saved to database!")
-
-
-    elif st.session_state.page == "vote_session":
-        st.title("🗳️ Propose/Vote Time Slots for Study Session")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
-        
-        user_email = st.session_state.user_email
-        sessions = get_sessions_for_user(user_email)
+            if st.session_state.user_email in st.secrets.get("ADMIN_EMAILS", []):
+                if st.button("⏱️ Performance", key="admin"):
+                    st.session_state.page = "admin"
+                    st.rerun()
 
-        if not sessions:
-            st.info("🤷 You have no invited sessions.")
-            st.stop()
+            st.markdown('</div>', unsafe_allow_html=True)
 
-        session_map = {f"{s['title']} (Host: {s['host_email']})": s for s in sessions}
-        selected = st.selectbox("Select a session to propose slots", list(session_map.keys()))
 
-        session = session_map[selected]
-        session_id = session["_id"]
+            # Other pages
+        elif st.session_state.page == "create_session":
+            with startup_profile.section("import:create_session"):
+                import session_import
+            st.title("📚 Create Study Session")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
+            # Session form
+            with st.form("create_session_form"):
+                session_title = st.text_input("📌 Session Topic", placeholder="e.g. Linear Algebra - Final Prep")
+                session_description = st.text_area("📝 Description", placeholder="Details, materials covered, etc.")
+    
+                participants = st.text_area("👥 Invite Participants (comma-separated emails)",
+                                     placeholder="e.g. alice@example.com, bob@university.edu")
 
-        with st.form("propose_slots"):
-            st.subheader(f"Propose time slots for: {session['title']}")
-            slot_count = st.number_input("How many time slots do you want to propose?", min_value=1, max_value=5, step=1)
-            proposed_slots = []
+                propose_deadline = st.date_input("📅 Deadline to Propose Time Slots",
+                                         min_value=datetime.now().date() + timedelta(days=1))
 
-            for i in range(slot_count):
-                slot = st.date_input(f"Date {i+1}", key=f"date_{i}")
-                time = st.time_input(f"Time {i+1}", key=f"time_{i}")
-                proposed_slots.append(datetime.combine(slot, time).isoformat())
+                with st.expander("🔁 Repeat weekly"):
+                    repeat_days = st.multiselect("Days", range(7), format_func=lambda d: WEEKDAYS[d])
+                    repeat_interval = st.selectbox("Every", [1, 2], format_func=lambda n: "week" if n == 1 else "2 weeks")
+                    repeat_first = st.date_input("First session", value=datetime.now().date() + timedelta(days=1))
+                    repeat_time = st.time_input("Time", value=datetime.strptime("18:00", "%H:%M").time())
+                    repeat_duration = st.number_input("Duration (minutes)", min_value=15, max_value=24 * 60,
+                                                      value=60, step=15, key="repeat_duration")
+                    repeat_until = st.date_input("Repeat until (optional)", value=None)
+                    repeat_skip = st.text_input("Skip dates (comma-separated YYYY-MM-DD)")
 
-            submitted = st.form_submit_button("Submit Time Slots")
+                submitted = st.form_submit_button("➕ Create Session")
 
+            # Handle form submission
             if submitted:
-                propose_slots_to_session(ObjectId(session_id), user_email, proposed_slots)
-                st.success("✅ Time slots proposed successfully.")
-
-    elif st.session_state.page == "final_vote_session":
-        st.title("🕒 Finalize Study Session Time (Host Only)")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
+                if not session_title or not participants:
+                    st.error("Please provide at least a title and one participant.")
+                else:
+                    participant_list, invalid = session_import.parse_emails(participants)
+                    if invalid:
+                        st.warning(f"Skipped invalid email(s): {', '.join(invalid)}")
+                    if not participant_list:
+                        st.error("Please provide at least one valid participant email.")
+                        st.stop()
+
+                    session_data = new_session_document(st.session_state.user_email, session_title,
+                                                        session_description, participant_list, propose_deadline)
+
+                    if repeat_days:
+                        # Recurring series are stored once and expanded on demand
+                        dtstart = datetime.combine(repeat_first, repeat_time)
+                        try:
+                            exdates = [datetime.combine(datetime.strptime(d.strip(), "%Y-%m-%d").date(), repeat_time)
+                                       for d in repeat_skip.split(",") if d.strip()]
+                        except ValueError:
+                            st.error("Skip dates must look like 2025-01-31.")
+                            st.stop()
+                        insert_series({
+                            "host_email": st.session_state.user_email,
+                            "title": session_title,
+                            "description": session_description,
+                            "participants": participant_list,
+                            "rule": {
+                                "freq": "WEEKLY",
+                                "interval": repeat_interval,
+                                "byday": sorted(repeat_days),
+                                "dtstart": dtstart,
+                                "until": datetime.combine(repeat_until, datetime.max.time()) if repeat_until else None,
+                                "count": None,
+                                "duration": int(repeat_duration),
+                            },
+                            "exdates": exdates,
+                            "created_at": datetime.utcnow(),
+                        })
+                        st.success("🔁 Recurring session series saved!")
+                    else:
+                        st.success("🎉 Session created successfully!")
+                        insert_session(session_data)
+                        st.success("🎉 Session saved to database!")
+
+            with st.expander("📥 Bulk import from roster"):
+                st.caption("CSV with columns title, description, participants, propose_deadline "
+                           "(or one row per title,email), or a JSON list of the same fields.")
+                roster = st.file_uploader("Roster file", type=["csv", "json"], key="roster_file")
+                roster_deadline = st.date_input("Default proposal deadline",
+                                                value=datetime.now().date() + timedelta(days=7),
+                                                min_value=datetime.now().date() + timedelta(days=1),
+                                                key="roster_deadline")
+                roster_invite = st.checkbox("Email invitations to participants", value=True)
+                if roster and st.button("📥 Import Sessions"):
+                    try:
+                        rows = session_import.read_roster(roster.getvalue(), roster.name)
+                    except session_import.RosterError as e:
+                        st.error(str(e))
+                        st.stop()
+                    with st.spinner(f"Importing {len(rows)} sessions..."):
+                        report = session_import.import_sessions(rows, st.session_state.user_email,
+                                                                roster_deadline, invite=roster_invite)
+                    st.success(f"🎉 Created {report['created']} of {report['rows']} sessions"
+                               f" and queued {report['invitations_queued']} invitations.")
+                    if report["errors"]:
+                        st.error(f"{len(report['errors'])} row(s) were not imported:")
+                        st.dataframe(report["errors"], hide_index=True)
+                    if report["warnings"]:
+                        st.warning(f"{len(report['warnings'])} row(s) had invalid emails that were skipped:")
+                        st.dataframe(report["warnings"], hide_index=True)
+
+
+        elif st.session_state.page == "vote_session":
+            with startup_profile.section("import:vote_session"):
+                import live_updates
+
+            st.title("🗳️ Propose/Vote Time Slots for Study Session")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
+        
+            user_email = st.session_state.user_email
+            sessions = get_session_summaries_for_user(user_email)
+
+            if not sessions:
+                st.info("🤷 You have no invited sessions.")
+                st.stop()
+
+            session_map = {f"{s['title']} (Host: {s['host_email']})": s for s in sessions}
+            selected = st.selectbox("Select a session to propose slots", list(session_map.keys()))
+
+            session = session_map[selected]
+            session_id = session["_id"]
+
+            with st.form("propose_slots"):
+                st.subheader(f"Propose time slots for: {session['title']}")
+                slot_count = st.number_input("How many time slots do you want to propose?", min_value=1, max_value=5, step=1)
+                proposed_slots = []
+
+                for i in range(slot_count):
+                    slot = st.date_input(f"Date {i+1}", key=f"date_{i}")
+                    time = st.time_input(f"Time {i+1}", key=f"time_{i}")
+                    proposed_slots.append(datetime.combine(slot, time).isoformat())
+
+                submitted = st.form_submit_button("Submit Time Slots")
+
+                if submitted:
+                    propose_slots_to_session(ObjectId(session_id), user_email, proposed_slots)
+                    st.success("✅ Time slots proposed successfully.")
+
+            feed = live_updates.get_feed()
+
+            # Re-runs on its own; reads the in-memory feed, so idle ticks cost no query
+            @st.fragment(run_every=float(st.secrets.get("LIVE_REFRESH_SECONDS", 3)))
+            def live_tally():
+                state = feed.subscribe(session_id)
+                st.subheader("📊 Live Tally")
+                if state.final_slot:
+                    st.success(f"✅ Finalized for {state.final_slot}")
+                tally = rank_vote_counts(state.vote_counts, state.voter_count, top_k=5)
+                if not tally["slots"]:
+                    st.info("No slots proposed yet.")
+                for entry in tally["slots"]:
+                    st.write(f"🕒 {entry['slot']} — {entry['votes']} of {tally['voter_count']} voter(s)")
+
+            live_tally()
+
+        elif st.session_state.page == "final_vote_session":
+            with startup_profile.section("import:final_vote_session"):
+                import scheduling
+                import calendar_sync
+
+            st.title("🕒 Finalize Study Session Time (Host Only)")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
 
-        user_email = st.session_state.user_email
-        #sessions = get_sessions_for_user(user_email)
-        sessions = get_sessions_hosted_by(user_email)
+            user_email = st.session_state.user_email
+            #sessions = get_sessions_for_user(user_email)
+            sessions = get_session_summaries_hosted_by(user_email)
 
-        host_sessions = [s for s in sessions if s['host_email'] == user_email]
+            host_sessions = [s for s in sessions if s['host_email'] == user_email]
         
-        if not host_sessions:
-            st.info("🤷 You are not hosting any sessions.")
-            st.stop()
-
-        session_map = {f"{s['title']} ({s['_id']})": s for s in host_sessions}
-        selected = st.selectbox("Select a session to finalize", list(session_map.keys()))
-
-        session = session_map[selected]
-        session_id = session["_id"]
-
-        # Show all proposed slots
-        proposed = get_proposed_slots(ObjectId(session_id))
-        flat_slots = []
-
-        for entry in proposed:
-            for slot in entry["slots"]:
-                flat_slots.append(slot)
-
-        slot_counts = Counter(flat_slots)
-        st.subheader("🗳️ Slot Votes")
-        for slot, count in slot_counts.items():
-            st.write(f"🕐 {slot} — {count} vote(s)")
-
-        def send_confirmation_email(session, final_slot):
-            sg = sendgrid.SendGridAPIClient(api_key=st.secrets["SENDGRID_API_KEY"])
-
-            for email in session["participants"]:
-                message = Mail(
-                    from_email="shubhamgupta94181@gmail.com",
-                    to_emails=email,
-                    subject="✅ Study Session Confirmed!",
-                    html_content=f"""
-                    <p>Hi {email.split('@')[0].title()},</p>
-                    <p>The study session <strong>{session['title']}</strong> has been confirmed at:</p>
-                    <h3>{final_slot}</h3>
-                    <p>Thanks,<br>StudySync Team</p>
-                """
-                )
-                try:
-                    r = sg.send(message)
-                    st.write(r.status_code)
-                except Exception as e:
-                    print(f"SendGrid error for {email}: {e}")
-
-        # Determine if there's a clear majority
-        most_common = slot_counts.most_common(1)
-        confirmed_slot = None
-
-        if most_common and most_common[0][1] > 1:
-            confirmed_slot = most_common[0][0]
-            st.success(f"✅ Majority Slot Found: {confirmed_slot}")
-            if st.button("Finalize & Notify"):
-                finalize_slot(ObjectId(session_id), confirmed_slot)
-                st.success("Session time finalized. Sending notifications...")
-                send_confirmation_email(session, confirmed_slot)
-        else:
-            st.warning("⚠️ No clear majority. Please select a slot manually:")
-            custom_slot = st.selectbox("Pick one from proposed", list(slot_counts.keys()))
-            if st.button("Finalize Custom & Notify"):
-                finalize_slot(ObjectId(session_id), custom_slot)
-                st.success("✅ Session time finalized by host.")
-                send_confirmation_email(session, custom_slot)
+            if not host_sessions:
+                st.info("🤷 You are not hosting any sessions.")
+                st.stop()
+
+            session_map = {f"{s['title']} ({s['_id']})": s for s in host_sessions}
+            selected = st.selectbox("Select a session to finalize", list(session_map.keys()))
+
+            # Only the selected session is fetched in full (participants, slots)
+            session_id = session_map[selected]["_id"]
+            session = get_session_by_id(ObjectId(session_id))
+
+            # Show all proposed slots, ranked by distinct voters
+            tally = get_vote_counts(ObjectId(session_id))
+            ranked_slots = tally["slots"]
+            st.subheader("🗳️ Slot Votes")
+            st.caption(f"{tally['voter_count']} participant(s) voted")
+            for entry in ranked_slots:
+                st.write(f"🕐 {entry['slot']} — {entry['votes']} vote(s)")
+
+            def send_confirmation_email(session, final_slot):
+                # Queued in the outbox and sent in the background, one API call per batch
+                queued = notifications.enqueue_confirmations(session, final_slot)
+                notifications.get_worker().wake()
+                st.info(f"📧 {queued} confirmation email(s) queued.")
+
+            attendees = [session["host_email"], *session.get("participants", [])]
+
+            def show_conflicts(slot):
+                # Other finalized sessions that overlap this slot for any attendee
+                if not slot:
+                    return
+                conflicts = find_conflicts(attendees, slot, duration, exclude_session_id=session["_id"])
+                for c in conflicts:
+                    st.warning(f"⚠️ `{c['user_email']}` is already in **{c['title']}** "
+                               f"({c['start']:%b %d %I:%M %p} – {c['end']:%I:%M %p})")
+
+            duration = st.number_input("Session length (minutes)", min_value=15, max_value=480,
+                                       value=int(session.get("duration", 60)), step=15)
+
+            # Determine if there's a clear majority
+            confirmed_slot = None
+
+            if ranked_slots and ranked_slots[0]["votes"] > 1:
+                confirmed_slot = ranked_slots[0]["slot"]
+                st.success(f"✅ Majority Slot Found: {confirmed_slot}")
+                show_conflicts(confirmed_slot)
+                if st.button("Finalize & Notify"):
+                    finalize_slot(ObjectId(session_id), confirmed_slot, duration)
+                    calendar_sync.schedule(ObjectId(session_id))
+                    st.success("Session time finalized. Sending notifications...")
+                    send_confirmation_email(session, confirmed_slot)
+            else:
+                st.warning("⚠️ No clear majority. Please select a slot manually:")
+                custom_slot = st.selectbox("Pick one from proposed", [entry["slot"] for entry in ranked_slots])
+                show_conflicts(custom_slot)
+                if st.button("Finalize Custom & Notify", disabled=not custom_slot):
+                    finalize_slot(ObjectId(session_id), custom_slot, duration)
+                    calendar_sync.schedule(ObjectId(session_id))
+                    st.success("✅ Session time finalized by host.")
+                    send_confirmation_email(session, custom_slot)
+
+            # Overlapping availability: 14:00 and 14:05 count towards the same window
+            st.subheader("🧮 Best Windows by Availability")
+            windows = scheduling.rank_windows(get_ballots(ObjectId(session_id)), duration_minutes=duration)
+            if not windows:
+                st.info("No overlapping availability yet.")
+            else:
+                for window in windows:
+                    st.write(f"🕐 {window['start']:%b %d, %Y %I:%M %p} – {window['end']:%I:%M %p} — "
+                             f"{window['participants']} participant(s) available")
+                best_slot = windows[0]["start"].isoformat()
+                show_conflicts(best_slot)
+                if st.button("Finalize Best Window & Notify"):
+                    finalize_slot(ObjectId(session_id), best_slot, duration)
+                    calendar_sync.schedule(ObjectId(session_id))
+                    st.success("✅ Session time finalized from availability.")
+                    send_confirmation_email(session, best_slot)
 
     
-    elif st.session_state.page == "resources":
-        st.title("📁 Shared Resources")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
-        
-        user_email = st.session_state.user_email
-        sessions = get_sessions_for_user(user_email)
-
-        if not sessions:
-            st.info("No sessions found.")
-            st.stop()
+        elif st.session_state.page == "resources":
+            with startup_profile.section("import:resources"):
+                import uploads
+                import live_updates
 
-        session_map = {f"{s['title']} ({s['_id']})": s for s in sessions}
-        selected = st.selectbox("Select a session", list(session_map.keys()))
-        session = session_map[selected]
-        session_id = ObjectId(session["_id"])
-
-        st.subheader("📤 Upload Resources")
-
-        uploaded_file = st.file_uploader("Upload a file (PDF, DOC, PPT)", type=["pdf", "docx", "pptx"])
-        link = st.text_input("Or share a link (Google Docs, Notes, etc.)")
+            st.title("📁 Shared Resources")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
+        
+            user_email = st.session_state.user_email
+            # Hosts share resources too, and are not in their own participants
+            sessions = list({s["_id"]: s for s in [*get_session_summaries_for_user(user_email),
+                                                   *get_session_summaries_hosted_by(user_email)]}.values())
+
+            if not sessions:
+                st.info("No sessions found.")
+                st.stop()
+
+            session_map = {f"{s['title']} ({s['_id']})": s for s in sessions}
+            # Opened from a dashboard search hit
+            focus = st.session_state.pop("focus_session", None)
+            focus_index = next((i for i, s in enumerate(sessions) if s["_id"] == focus), None)
+            if focus is not None and focus_index is None:
+                st.error("That session is no longer available to you.")
+            focus_index = focus_index or 0
+            selected = st.selectbox("Select a session", list(session_map.keys()), index=focus_index)
+            session = session_map[selected]
+            session_id = ObjectId(session["_id"])
+
+            st.subheader("📤 Upload Resources")
+
+            uploaded_file = st.file_uploader("Upload a file (PDF, DOC, PPT)", type=["pdf", "docx", "pptx"])
+            link = st.text_input("Or share a link (Google Docs, Notes, etc.)")
+
+            page_key = f"resource_page_{session_id}"
+            if st.button("Share"):
+                st.session_state.pop(page_key, None)  # show our own share right away
+                if uploaded_file:
+                    file_name = uploaded_file.name
+                    result = uploads.upload_resource(uploaded_file, file_name)
+                    add_resource(session_id, user_email, file_url=result["url"], filename=file_name,
+                                 content_hash=result["sha256"])
+                    if result["deduplicated"]:
+                        st.success("✅ File already in the library, linked the existing copy!")
+                        st.caption(f"Saved re-uploading {result['bytes'] / 1e6:.1f} MB")
+                    else:
+                        st.success("✅ File uploaded to Cloudinary!")
+                        if result["seconds"]:
+                            st.caption(f"{result['bytes'] / 1e6:.1f} MB at "
+                                       f"{result['bytes'] / 1e6 / result['seconds']:.1f} MB/s")
+                elif link:
+                    add_resource(session_id, user_email, link=link)
+                    st.success("✅ Link shared!")
+                else:
+                    st.warning("Please upload a file or share a link.")
+
+            st.divider()
+
+            st.subheader("📚 Shared Resources")
+            feed = live_updates.get_feed()
+
+            # Re-queries the page only when the feed reports a new resource
+            @st.fragment(run_every=float(st.secrets.get("LIVE_REFRESH_SECONDS", 3)))
+            def shared_resources():
+                state = feed.subscribe(session_id)
+                # Stack of page cursors for this session; None is the newest page
+                cursors = st.session_state.setdefault(f"resource_cursors_{session_id}", [None])
+                version = (state.resources_version, cursors[-1])
+                cached = st.session_state.get(page_key)
+                if cached is None or cached[0] != version:
+                    cached = st.session_state[page_key] = (version, get_resources(session_id, limit=20, after=cursors[-1]))
+                resources, next_cursor = cached[1]
+                fresh = {r["_id"] for r in state.new_resources}
+
+                if not resources:
+                    st.info("No resources shared yet.")
+                else:
+                    for r in resources:
+                        uploader = r["uploader"]
+                        time = r["timestamp"].strftime("%Y-%m-%d %H:%M")
+                        badge = "🆕 " if r["_id"] in fresh else ""
+
+                        if "file_url" in r:
+                            st.markdown(f"{badge}📄 **[{r['filename']}]({r['file_url']})** — uploaded by `{uploader}` on `{time}`")
+                        elif "link" in r:
+                            st.markdown(f"{badge}🔗 [Link]({r['link']}) — shared by `{uploader}` on `{time}`")
+
+                    newer, older = st.columns(2)
+                    if len(cursors) > 1 and newer.button("⬅️ Newer"):
+                        cursors.pop()
+                        st.rerun(scope="fragment")
+                    if next_cursor and older.button("Older ➡️"):
+                        cursors.append(next_cursor)
+                        st.rerun(scope="fragment")
+
+            shared_resources()
+
+
+        elif st.session_state.page == "calendar":
+            with startup_profile.section("import:calendar"):
+                import google_calendar
+                from google_auth_oauthlib.flow import Flow
+
+            #st.title("📅 Calendar Integration")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
 
-        if st.button("Share"):
-            if uploaded_file:
-                result = cloudinary.uploader.upload(
-                    uploaded_file,
-                    resource_type="raw",  # for non-image files like PDFs, DOCs
-                    folder=f"study_sessions/{session_id}/"
+            CLIENT_ID = st.secrets["GOOGLE_CLIENT_ID"]
+            CLIENT_SECRET = st.secrets["GOOGLE_CLIENT_SECRET"]
+            REDIRECT_URI = st.secrets["GOOGLE_REDIRECT_URI"]
+
+            SCOPES = google_calendar.SCOPES
+
+            def get_flow():
+                return Flow.from_client_config(
+                    {
+                        "web": {
+                            "client_id": CLIENT_ID,
+                            "client_secret": CLIENT_SECRET,
+                            "redirect_uris": [REDIRECT_URI],
+                            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                            "token_uri": "https://oauth2.googleapis.com/token"
+                        }
+                    },
+                    scopes=SCOPES,
+                    redirect_uri=REDIRECT_URI
                 )
-                file_url = result['secure_url']
-                file_name = uploaded_file.name
-                add_resource(session_id, user_email, file_url=file_url, filename=file_name)
-                st.success("✅ File uploaded to Cloudinary!")
-            elif link:
-                add_resource(session_id, user_email, link=link)
-                st.success("✅ Link shared!")
-            else:
-                st.warning("Please upload a file or share a link.")
-
-        st.divider()
-
-        st.subheader("📚 Shared Resources")
-        resources = get_resources(session_id)
 
-        if not resources:
-            st.info("No resources shared yet.")
-        else:
-            for r in sorted(resources, key=lambda x: x["timestamp"], reverse=True):
-                uploader = r["uploader"]
-                time = r["timestamp"].strftime("%Y-%m-%d %H:%M")
-
-                if "file_url" in r:
-                    st.markdown(f"📄 **[{r['filename']}]({r['file_url']})** — uploaded by `{uploader}` on `{time}`")
-                elif "link" in r:
-                    st.markdown(f"🔗 [Link]({r['link']}) — shared by `{uploader}` on `{time}`")
-
-
-    elif st.session_state.page == "calendar":
-        #st.title("📅 Calendar Integration")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
+            st.title("📅 Google Calendar Integration")
 
-        load_dotenv()
-
-        CLIENT_ID = st.secrets["GOOGLE_CLIENT_ID"]
-        CLIENT_SECRET = st.secrets["GOOGLE_CLIENT_SECRET"]
-        REDIRECT_URI = st.secrets["GOOGLE_REDIRECT_URI"]
-
-        SCOPES = ["https://www.googleapis.com/auth/calendar"]
-
-        def get_flow():
-            return Flow.from_client_config(
-                {
-                    "web": {
-                        "client_id": CLIENT_ID,
-                        "client_secret": CLIENT_SECRET,
-                        "redirect_uris": [REDIRECT_URI],
-                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token"
-                    }
-                },
-                scopes=SCOPES,
-                redirect_uri=REDIRECT_URI
-            )
-
-        def save_token(token):
-            with open("token.json", "w") as f:
-                json.dump(token, f)
-
-        def load_token():
-            try:
-                with open("credentials.pkl", "rb") as token:
-                    return pickle.load(token)
-            except FileNotFoundError:
-                return None
+            user_email = st.session_state.user_email
+            # Per-user token, refreshed automatically if it has expired
+            creds = google_calendar.token_store.load(user_email)
 
-        st.title("📅 Google Calendar Integration")
+            if not creds or not creds.valid:
+                flow = get_flow()
+                auth_url, _ = flow.authorization_url(prompt='consent')
 
-        creds = load_token()
+                st.markdown(f"[🔐 Click here to authorize Google Calendar]({auth_url})")
 
-        if not creds or not creds.valid:
-            flow = get_flow()
-            auth_url, _ = flow.authorization_url(prompt='consent')
+                query_params = st.query_params
 
-            st.markdown(f"[🔐 Click here to authorize Google Calendar]({auth_url})")
+                # After redirect from Google
+                if "code" in query_params:
+                    auth_code = query_params["code"]
+                    with tracing.span("google.oauth_token"):
+                        flow.fetch_token(code=auth_code)
+                    creds = flow.credentials
 
-            query_params = st.query_params
+                    # Save credentials to session and to this user's token record
+                    st.session_state.credentials = creds
+                    google_calendar.token_store.save(user_email, creds)
 
-            # After redirect from Google
-            if "code" in query_params:
-                auth_code = query_params["code"][0]
-                flow.fetch_token(code=auth_code)
-                creds = flow.credentials
+                    st.success("✅ Google Calendar connected successfully! Please refresh the app.")
 
-                # Save credentials to session and optionally to file
+            else:
+                # Save loaded credentials to session
                 st.session_state.credentials = creds
-                with open("credentials.pkl", "wb") as f:
-                    pickle.dump(creds, f)
-
-                st.success("✅ Google Calendar connected successfully! Please refresh the app.")
-
-        else:
-            # Save loaded credentials to session
-            st.session_state.credentials = creds
-
-        # ----- Display upcoming events if authenticated -----
 
-        if "credentials" in st.session_state:
-            creds = st.session_state.credentials
-            service = build("calendar", "v3", credentials=creds)
+            # ----- Display upcoming events if authenticated -----
 
-            now = datetime.utcnow().isoformat() + 'Z'
-            later = (datetime.utcnow() + timedelta(days=7)).isoformat() + 'Z'
+            if "credentials" in st.session_state:
+                creds = st.session_state.credentials
+                # Served from the per-user event mirror, refreshed incrementally
+                events = google_calendar.event_cache.upcoming(user_email, creds, days=7, limit=10)
 
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=now,
-                timeMax=later,
-                maxResults=10,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+                st.subheader("📅 Upcoming Events This Week")
 
-            events = events_result.get('items', [])
-
-            st.subheader("📅 Upcoming Events This Week")
-
-            if not events:
-                st.info("No upcoming events found.")
+                if not events:
+                    st.info("No upcoming events found.")
+                else:
+                    for event in events:
+                        start = event['start'].get('dateTime', event['start'].get('date'))
+                        start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
+                        st.markdown(f"**{event.get('summary', 'No Title')}**  \n🕒 {start_dt.strftime('%b %d, %Y %I:%M %p')}")
             else:
-                for event in events:
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                    st.markdown(f"**{event.get('summary', 'No Title')}**  \n🕒 {start_dt.strftime('%b %d, %Y %I:%M %p')}")
-        else:
-            st.warning("🔒 Please connect your Google Calendar using the link above.")
+                st.warning("🔒 Please connect your Google Calendar using the link above.")
 
-            
+            # Recurring series are expanded for this week only
+            now = datetime.now()
+            occurrences = list(get_occurrences_for_users([user_email], now, now + timedelta(days=7)))
+            if occurrences:
+                st.subheader("🔁 Recurring Sessions This Week")
+                for occurrence in sorted(occurrences, key=lambda o: o["start"]):
+                    st.markdown(f"**{occurrence['title']}**  \n🕒 {occurrence['start'].strftime('%b %d, %Y %I:%M %p')}"
+                                f" – {occurrence['end'].strftime('%I:%M %p')}")
 
-    elif st.session_state.page == "feedback":
-        st.title("📊 Feedback & Analytics")
-        if st.button("🔙 Back to Dashboard"):
-            st.session_state.page = "dashboard"
-            st.rerun()
-
-        # Initialize feedback file if not exists
-        FEEDBACK_FILE = "feedback.csv"
-        if not os.path.exists(FEEDBACK_FILE):
-            df_init = pd.DataFrame(columns=["session_id", "title", "host_email", "duration", "rating", "comment", "timestamp"])
-            df_init.to_csv(FEEDBACK_FILE, index=False)
-
-        # Fetch session details from MongoDB
-        user_email = st.session_state.user_email
-        sessions = get_sessions_for_user(user_email)
-        host_sessions = [s for s in sessions if s['host_email'] == user_email]
-
-        if not sessions:
-            st.info("No sessions found.")
-            st.stop()
-
-        # session_map = {f"{s['title']} ({s['_id']})": s for s in sessions}
-        # selected = st.selectbox("Select a session", list(session_map.keys()))
-        # session = session_map[selected]
-        # session_id = ObjectId(session["_id"])
-
-        # Prepare session options for selectbox
-        session_options = [(session["_id"], session["title"]) for session in sessions]  # Assuming "_id" as session_id
-        session_ids, session_titles = zip(*session_options)
-
-        # Display feedback form
-        st.header("📝 Post-Session Feedback")
-
-        session_id = st.selectbox("Select Session ID", options=session_ids, format_func=lambda x: next(
-            title for id, title in zip(session_ids, session_titles) if id == x))
-        selected_session = next(session for session in sessions if session["_id"] == session_id)
-
-        # Pre-fill session details
-        title = selected_session.get("title", "")
-        host = selected_session.get("host_email", "")
-        duration = selected_session.get("duration", 60)  # Default to 60 minutes if duration not found
-
-        rating = st.slider("Rate the Session", 1, 5)
-        comment = st.text_area("Your Comments")
-
-        if st.button("Submit Feedback"):
-            # Create new feedback entry
-            new_entry = pd.DataFrame([{
-                "session_id": session_id,
-                "title": title,
-                "host_email": host,
-                "duration": duration,
-                "rating": rating,
-                "comment": comment,
-                "timestamp": datetime.now()
-            }])
-
-            # Save feedback to CSV file
-            new_entry.to_csv(FEEDBACK_FILE, mode="a", index=False, header=not os.path.exists(FEEDBACK_FILE))
-            st.success("✅ Feedback submitted!")
             
-            # --- Analytics Section ---
-            st.header("📊 Feedback Analytics")
-
-            # Load all feedback data
-            feedback_data = pd.read_csv(FEEDBACK_FILE)
 
-            if feedback_data.empty:
-                st.info("No feedback data available yet.")
-            else:
-                # Calculate average ratings for each session
-                session_ratings = feedback_data.groupby("session_id")["rating"].mean().reset_index()
-                session_ratings = session_ratings.rename(columns={"rating": "average_rating"})
+        elif st.session_state.page == "feedback":
+            with startup_profile.section("import:feedback"):
+                import pandas as pd
+                from feedback_store import get_store as get_feedback_store
+                import feedback_analytics
 
-                # Merge with session details
-                feedback_with_details = pd.merge(feedback_data, session_ratings, on="session_id")
-
-                # Calculate other analytics:
-                # 1. Most frequent topics
-                topic_counts = feedback_with_details["title"].value_counts()
+            st.title("📊 Feedback & Analytics")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
 
-                # 2. Average session duration
-                avg_duration = feedback_with_details["duration"].mean()
+            # Feedback lives in an append-only store; the old feedback.csv is imported once
+            feedback_store = get_feedback_store(st.secrets.get("FEEDBACK_DIR", "feedback_data"),
+                                                legacy_csv="feedback.csv")
+
+            # Fetch session details from MongoDB
+            user_email = st.session_state.user_email
+            sessions = get_session_summaries_for_user(user_email)
+            host_sessions = [s for s in sessions if s['host_email'] == user_email]
+
+            if not sessions:
+                st.info("No sessions found.")
+                st.stop()
+
+            # session_map = {f"{s['title']} ({s['_id']})": s for s in sessions}
+            # selected = st.selectbox("Select a session", list(session_map.keys()))
+            # session = session_map[selected]
+            # session_id = ObjectId(session["_id"])
+
+            # Prepare session options for selectbox
+            session_options = [(session["_id"], session["title"]) for session in sessions]  # Assuming "_id" as session_id
+            session_ids, session_titles = zip(*session_options)
+
+            # Display feedback form
+            st.header("📝 Post-Session Feedback")
+
+            session_id = st.selectbox("Select Session ID", options=session_ids, format_func=lambda x: next(
+                title for id, title in zip(session_ids, session_titles) if id == x))
+            selected_session = get_session_by_id(session_id)
+
+            # Pre-fill session details
+            title = selected_session.get("title", "")
+            host = selected_session.get("host_email", "")
+            duration = selected_session.get("duration", 60)  # Default to 60 minutes if duration not found
+
+            rating = st.slider("Rate the Session", 1, 5)
+            comment = st.text_area("Your Comments")
+
+            if st.button("Submit Feedback"):
+                # Save the new feedback entry
+                feedback_store.append({
+                    "session_id": session_id,
+                    "title": title,
+                    "host_email": host,
+                    "duration": duration,
+                    "rating": rating,
+                    "comment": comment,
+                    "timestamp": datetime.now()
+                })
+                st.success("✅ Feedback submitted!")
+            
+                # --- Analytics Section ---
+                st.header("📊 Feedback Analytics")
+
+                # Running aggregates are maintained on append, so this is O(1) in the row count
+                aggregates = feedback_store.aggregates()
+
+                if not aggregates.rows:
+                    st.info("No feedback data available yet.")
+                else:
+                    # Calculate other analytics:
+                    # 1. Most frequent topics
+                    topic_counts = pd.Series(aggregates.topic_counts(), name="count")
+
+                    # 2. Average session duration
+                    avg_duration = aggregates.average_duration()
+
+                    # 3. Most common rating
+                    most_common_rating = aggregates.most_common_rating()
+
+                    # Show analytics
+                    st.subheader("Most Frequent Topics")
+                    st.write(topic_counts)
+
+                    st.subheader("Average Session Duration (minutes)")
+                    st.write(avg_duration)
+
+                    st.subheader("Most Common Rating")
+                    st.write(most_common_rating)
+
+            # Trends need the raw entries, so they are only computed on request
+            if st.toggle("📈 Show rating trends"):
+                frame = feedback_analytics.load_frame(feedback_store)
+                if frame.empty:
+                    st.info("No feedback data available yet.")
+                else:
+                    st.subheader("Weekly Average Rating by Host")
+                    weekly = feedback_analytics.weekly_host_ratings(frame)
+                    st.line_chart(weekly.pivot(index="week", columns="host_email", values="average_rating"))
+
+                    st.subheader("Topic Trends (feedback per week)")
+                    st.line_chart(feedback_analytics.topic_trends(frame))
+
+                    st.subheader("Rating Percentiles by Topic")
+                    st.dataframe(feedback_analytics.rating_percentiles(frame))
+
+        elif st.session_state.page == "admin":
+            st.title("⏱️ Performance")
+            if st.button("🔙 Back to Dashboard"):
+                st.session_state.page = "dashboard"
+                st.rerun()
 
-                # 3. Most common rating
-                most_common_rating = feedback_with_details["rating"].mode()[0]
+            if st.session_state.user_email not in st.secrets.get("ADMIN_EMAILS", []):
+                st.error("This page is only available to administrators.")
+                st.stop()
+
+            import mongo
+            import uploads
+            from auth import session_cache, login_limiters, register_limiter, unknown_emails
+
+            st.caption("Percentiles cover the most recent samples per span; counts are since process start.")
+            for title, prefix in (("Pages", "page."), ("Data functions", "auth."), ("Password hashing", "bcrypt."),
+                                  ("MongoDB commands", "mongo."), ("External APIs", "")):
+                rows = tracing.snapshot(prefix)
+                if not prefix:
+                    rows = [row for row in rows
+                            if row["name"].split(".", 1)[0] in ("cloudinary", "sendgrid", "google")]
+                if rows:
+                    st.subheader(title)
+                    st.dataframe(rows, hide_index=True)
+
+            health = mongo.health()
+            st.subheader("MongoDB")
+            if health["ok"]:
+                st.success(f"Reachable, ping {health['latency_ms']:.1f} ms")
+            else:
+                st.error(f"Unreachable: {health['error']}")
+            st.json(health["pool"])
 
-                # Show analytics
-                st.subheader("Most Frequent Topics")
-                st.write(topic_counts)
+            st.subheader("Session cache")
+            st.json(session_cache.stats())
 
-                st.subheader("Average Session Duration (minutes)")
-                st.write(avg_duration)
+            st.subheader("Resource uploads")
+            st.json(uploads.stats.snapshot())
 
-                st.subheader("Most Common Rating")
-                st.write(most_common_rating)
+            st.subheader("Login throttling")
+            st.dataframe([{"limiter": limiter.name, **limiter.stats()}
+                          for limiter in (*login_limiters.values(), register_limiter)], hide_index=True)
+            st.caption(f"{len(unknown_emails)} unknown email(s) cached")
 
+            with st.expander("Prometheus metrics"):
+                metrics = tracing.export_prometheus()
+                st.download_button("⬇️ Download", metrics, file_name="studysync_metrics.txt")
+                st.code(metrics, language="text")
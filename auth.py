@@ -1,93 +1,589 @@
 import streamlit as st
-from pymongo import MongoClient
-import bcrypt
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
-from dotenv import load_dotenv
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from collections import Counter
+from cachetools import TTLCache
+from session_cache import SessionCache
+from search import SearchIndex
+from indexes import ensure_indexes, verify_query_plans
+from auth_executor import AuthExecutor, VerifiedCredentialCache
+from rate_limit import TokenBucketLimiter
+from recurrence import occurrences, last_occurrence_bound
+import startup_profile
+from tracing import traced
+from mongo import get_client, listing_read_preference
 
-load_dotenv()
-client = MongoClient(st.secrets["MONGO_URI"])
+# MongoClient connects in the background; nothing here waits on the network
+with startup_profile.section("init:mongo_client"):
+    client = get_client()
 db = client["studysync"]
 sessions_collection = db["sessions"]
+# Read-heavy listing queries may be routed away from the primary
+listing_collection = sessions_collection.with_options(read_preference=listing_read_preference())
+resources_collection = db["resources"]
+busy_collection = db["busy_intervals"]
+series_collection = db["session_series"]
 users = db["users"]
 
+# One create_index round trip per index; run them off the startup path.
+# create_user waits for them because it relies on the unique email index,
+# and checks for an existing account itself if that index could not be built.
+indexes_ready = threading.Event()
+unique_email_index = False
+
+def _prepare_indexes():
+    global unique_email_index
+    try:
+        with startup_profile.section("init:indexes"):
+            ensure_indexes(db)
+    except Exception as e:
+        print(f"Could not ensure indexes: {e}")
+    try:
+        unique_email_index = any(
+            index["key"] == [("email", 1)] and index.get("unique")
+            for index in users.index_information().values())
+    except Exception as e:
+        print(f"Could not read users indexes: {e}")
+    finally:
+        indexes_ready.set()
+    if not unique_email_index:
+        print("users.email has no unique index; registration checks for duplicates itself")
+
+if st.secrets.get("VERIFY_QUERY_PLANS", False):
+    # Opt-in check that is meant to fail startup, so it stays synchronous
+    _prepare_indexes()
+    verify_query_plans(db)
+else:
+    threading.Thread(target=_prepare_indexes, name="ensure-indexes", daemon=True).start()
+
+session_cache = SessionCache(
+    maxsize=int(st.secrets.get("SESSION_CACHE_SIZE", 1024)),
+    ttl=float(st.secrets.get("SESSION_CACHE_TTL", 30)),
+)
+search_index = SearchIndex(db["search_index"])
+
+@traced("auth.insert_session")
 def insert_session(session_data):
-    return sessions_collection.insert_one(session_data)
+    result = sessions_collection.insert_one(session_data)
+    session_cache.invalidate_listings(session_data.get("host_email"),
+                                      session_data.get("participants", []))
+    search_index.index_session(session_data)
+    return result
+
+@traced("auth.insert_sessions")
+def insert_sessions(sessions, batch_size=1000):
+    # Bulk create: unordered insert_many per batch, so one bad document does
+    # not stop the rest. Returns (created documents, [(index, error message)]).
+    created, errors = [], []
+    for start in range(0, len(sessions), batch_size):
+        batch = sessions[start:start + batch_size]
+        failed = {}
+        try:
+            sessions_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        for i, doc in enumerate(batch):
+            if i in failed:
+                errors.append((start + i, failed[i]))
+            else:
+                created.append(doc)
+
+    if created:
+        participants = {email for doc in created for email in doc.get("participants", [])}
+        for host_email in {doc.get("host_email") for doc in created}:
+            session_cache.invalidate_listings(host_email, participants)
+        search_index.index_new_sessions(created)
+    return created, errors
+
+def new_session_document(host_email, title, description, participants, propose_deadline):
+    return {
+        "host_email": host_email,
+        "title": title,
+        "description": description,
+        "participants": participants,
+        "propose_deadline": str(propose_deadline),
+        "created_at": str(datetime.utcnow()),
+        "finalized": False,
+        "proposed_slots": [],
+        "confirmed_slot": None
+    }
 
+@traced("auth.get_sessions_for_user")
 def get_sessions_for_user(user_email):
-    return list(sessions_collection.find({"participants": user_email}))
+    return session_cache.get_or_load(
+        ("participant", user_email),
+        lambda: list(listing_collection.find({"participants": user_email})))
 
+@traced("auth.get_sessions_hosted_by")
 def get_sessions_hosted_by(user_email):
-    return list(sessions_collection.find({"host_email": user_email}))
+    return session_cache.get_or_load(
+        ("host", user_email),
+        lambda: list(listing_collection.find({"host_email": user_email})))
+
+# Fields needed to build a session picker; the heavy proposed_slots and
+# resources arrays stay on the server until a session is actually selected.
+# Pass a copy: mongomock rewrites the projection it is given.
+SESSION_SUMMARY_PROJECTION = {"_id": 1, "title": 1, "host_email": 1}
+
+@traced("auth.get_session_summaries_for_user")
+def get_session_summaries_for_user(user_email):
+    return session_cache.get_or_load(
+        ("participant_summary", user_email),
+        lambda: list(listing_collection.find({"participants": user_email},
+                                             dict(SESSION_SUMMARY_PROJECTION))),
+        track_sessions=False)
+
+@traced("auth.get_session_summaries_hosted_by")
+def get_session_summaries_hosted_by(user_email):
+    return session_cache.get_or_load(
+        ("host_summary", user_email),
+        lambda: list(listing_collection.find({"host_email": user_email},
+                                             dict(SESSION_SUMMARY_PROJECTION))),
+        track_sessions=False)
+
+
+# Vote counters are materialized on the session document:
+#   vote_counts: {slot: n}       ballots: {user: [slots]}       voter_count: n
+# Map keys are user emails / ISO slots, so "." and "$" are escaped.
+def _field_key(value):
+    return value.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def _unfield_key(value):
+    return value.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
 
+MAX_VOTE_RETRIES = 5
 
+@traced("auth.propose_slots_to_session")
 def propose_slots_to_session(session_id, user_email, proposed_slots):
-    sessions_collection.update_one(
-        {"_id": session_id},
-        {"$push": {
-            "proposed_slots": {
-                "user": user_email,
-                "slots": proposed_slots,
-                "submitted_at": datetime.utcnow()
-            }
-        }}
-    )
+    ballot = list(dict.fromkeys(proposed_slots))
+    user_key = _field_key(user_email)
+    ballot_field = f"ballots.{user_key}"
+
+    for _ in range(MAX_VOTE_RETRIES):
+        current = sessions_collection.find_one(
+            {"_id": session_id}, {ballot_field: 1, "voter_count": 1})
+        if current is None:
+            return
+        if "voter_count" not in current:
+            # Session predates the counters; seed them from the raw history
+            rebuild_vote_counters(session_id)
+            continue
+
+        previous = current.get("ballots", {}).get(user_key)
+        increments = {}
+        for slot in ballot:
+            if slot not in (previous or []):
+                increments[f"vote_counts.{_field_key(slot)}"] = 1
+        for slot in previous or []:
+            if slot not in ballot:
+                increments[f"vote_counts.{_field_key(slot)}"] = -1
+        if previous is None:
+            increments["voter_count"] = 1
+
+        now = datetime.utcnow()
+        update = {
+            "$push": {
+                "proposed_slots": {
+                    "user": user_email,
+                    "slots": proposed_slots,
+                    "submitted_at": now
+                }
+            },
+            "$set": {ballot_field: ballot, "updated_at": now},
+        }
+        if increments:
+            update["$inc"] = increments
+
+        # Only applies if the user's ballot is unchanged since it was read
+        guard = {ballot_field: previous if previous is not None else {"$exists": False}}
+        result = sessions_collection.update_one({"_id": session_id, **guard}, update)
+        if result.matched_count:
+            session_cache.invalidate_session(session_id)
+            return
+
+    raise RuntimeError(f"Could not record slots for {user_email}: too many concurrent updates")
+
+@traced("auth.get_ballots")
+def get_ballots(session_id):
+    # Latest slots per user: {user_email: [slot, ...]}
+    session = sessions_collection.find_one({"_id": session_id}, {"ballots": 1})
+    if session is None:
+        return {}
+    if "ballots" not in session:
+        ballots = {}
+        for entry in sorted(get_proposed_slots(session_id),
+                            key=lambda e: e.get("submitted_at") or datetime.min):
+            ballots[entry["user"]] = list(dict.fromkeys(entry["slots"]))
+        return ballots
+    return {_unfield_key(user): slots for user, slots in session["ballots"].items()}
+
+@traced("auth.get_vote_counts")
+def get_vote_counts(session_id, top_k=None):
+    # Reads the materialized counters: O(distinct slots), not O(proposals)
+    session = session_cache.get_or_load(
+        ("votes", session_id),
+        lambda: sessions_collection.find_one(
+            {"_id": session_id}, {"vote_counts": 1, "voter_count": 1}))
+    if session is None:
+        return {"slots": [], "voter_count": 0}
+    if "voter_count" not in session:
+        return tally_slot_votes(session_id, top_k)
+    return rank_vote_counts(session.get("vote_counts", {}), session["voter_count"], top_k)
+
+def rank_vote_counts(vote_counts, voter_count, top_k=None):
+    # vote_counts as stored (escaped keys), e.g. from live_updates
+    ranked = sorted(
+        ({"slot": _unfield_key(key), "votes": votes}
+         for key, votes in vote_counts.items() if votes > 0),
+        key=lambda entry: (-entry["votes"], entry["slot"]))
+    if top_k:
+        ranked = ranked[:top_k]
+    return {"slots": ranked, "voter_count": voter_count}
+
+@traced("auth.rebuild_vote_counters")
+def rebuild_vote_counters(session_id, dry_run=False):
+    # Recompute counters from proposed_slots and report any drift
+    for _ in range(MAX_VOTE_RETRIES):
+        session = sessions_collection.find_one(
+            {"_id": session_id},
+            {"proposed_slots": 1, "vote_counts": 1, "voter_count": 1})
+        if session is None:
+            return None
+
+        history = session.get("proposed_slots", [])
+        ballots = {}
+        for entry in sorted(history, key=lambda e: e.get("submitted_at") or datetime.min):
+            ballots[entry["user"]] = list(dict.fromkeys(entry["slots"]))
+        counts = Counter(slot for slots in ballots.values() for slot in slots)
+
+        stored = {_unfield_key(key): votes
+                  for key, votes in session.get("vote_counts", {}).items() if votes}
+        drift = {slot: (stored.get(slot, 0), counts.get(slot, 0))
+                 for slot in set(stored) | set(counts)
+                 if stored.get(slot, 0) != counts.get(slot, 0)}
+        report = {
+            "session_id": session_id,
+            "drift": drift,
+            "voter_count": (session.get("voter_count"), len(ballots)),
+        }
+        if dry_run:
+            return report
 
+        # Guard on history length so a concurrent proposal forces a retry
+        result = sessions_collection.update_one(
+            {"_id": session_id, "proposed_slots": {"$size": len(history)}},
+            {"$set": {
+                "vote_counts": {_field_key(slot): n for slot, n in counts.items()},
+                "ballots": {_field_key(user): slots for user, slots in ballots.items()},
+                "voter_count": len(ballots),
+                "updated_at": datetime.utcnow(),
+            }}
+        )
+        if result.matched_count:
+            session_cache.invalidate_session(session_id)
+            return report
+
+    raise RuntimeError(f"Could not rebuild vote counters for {session_id}: too many concurrent updates")
+
+@traced("auth.get_proposed_slots")
 def get_proposed_slots(session_id):
-    session = sessions_collection.find_one({"_id": session_id})
+    session = get_session_by_id(session_id)
     return session.get("proposed_slots", [])
 
-def finalize_slot(session_id, confirmed_slot):
-    sessions_collection.update_one(
+@traced("auth.tally_slot_votes")
+def tally_slot_votes(session_id, top_k=None):
+    # Ranked per-slot counts computed server-side. Only each user's latest
+    # submission counts, and a slot repeated within one ballot counts once.
+    ranked = [
+        {"$unwind": "$slots"},
+        {"$group": {"_id": "$slots", "voters": {"$addToSet": "$_id"}}},
+        {"$project": {"_id": 0, "slot": "$_id", "voters": 1,
+                      "votes": {"$size": "$voters"}}},
+        {"$sort": {"votes": -1, "slot": 1}},
+    ]
+    if top_k:
+        ranked.append({"$limit": top_k})
+
+    pipeline = [
+        {"$match": {"_id": session_id}},
+        {"$unwind": "$proposed_slots"},
+        {"$replaceRoot": {"newRoot": "$proposed_slots"}},
+        {"$sort": {"submitted_at": 1}},
+        {"$group": {"_id": "$user", "slots": {"$last": "$slots"}}},
+        {"$facet": {
+            "slots": ranked,
+            "voters": [{"$count": "n"}],
+        }},
+    ]
+    result = next(sessions_collection.aggregate(pipeline), None) or {}
+    voters = result.get("voters") or [{"n": 0}]
+    return {"slots": result.get("slots", []), "voter_count": voters[0]["n"]}
+
+@traced("auth.finalize_slot")
+def finalize_slot(session_id, confirmed_slot, duration=None):
+    # Checked before anything is written, so a bad slot cannot half-finalize
+    try:
+        datetime.fromisoformat(confirmed_slot)
+    except (TypeError, ValueError):
+        raise ValueError(f"Not an ISO date-time slot: {confirmed_slot!r}") from None
+    now = datetime.utcnow()
+    update = {
+        "final_slot": confirmed_slot,
+        "finalized_at": now,
+        "updated_at": now
+    }
+    if duration:
+        update["duration"] = duration
+    session = sessions_collection.find_one_and_update(
         {"_id": session_id},
-        {"$set": {
-            "final_slot": confirmed_slot,
-            "finalized_at": datetime.utcnow()
-        }}
+        {"$set": update},
+        {"title": 1, "host_email": 1, "participants": 1, "duration": 1}
     )
+    session_cache.invalidate_session(session_id)
+    if session:
+        _record_busy_intervals(session, confirmed_slot, duration or session.get("duration", 60))
+
+# Finalized sessions are indexed per attendee in busy_intervals so conflict
+# checks are an index range scan per user, not a scan of their sessions.
+# Queries bound `start` from below by the longest allowed session.
+MAX_SESSION_MINUTES = 24 * 60
+
+def _record_busy_intervals(session, slot, duration):
+    start = datetime.fromisoformat(slot)
+    end = start + timedelta(minutes=min(duration, MAX_SESSION_MINUTES))
+    attendees = list(dict.fromkeys([session["host_email"], *session.get("participants", [])]))
+    busy_collection.delete_many({"session_id": session["_id"], "user_email": {"$nin": attendees}})
+    if attendees:
+        busy_collection.bulk_write([
+            UpdateOne(
+                {"session_id": session["_id"], "user_email": email},
+                {"$set": {"start": start, "end": end, "title": session.get("title", "")}},
+                upsert=True)
+            for email in attendees
+        ], ordered=False)
+
+@traced("auth.find_conflicts")
+def find_conflicts(user_emails, slot, duration, exclude_session_id=None):
+    # Finalized sessions of any of these users that overlap [slot, slot + duration)
+    start = datetime.fromisoformat(slot)
+    end = start + timedelta(minutes=duration)
+    query = {
+        "user_email": {"$in": list(user_emails)},
+        "start": {"$lt": end, "$gt": start - timedelta(minutes=MAX_SESSION_MINUTES)},
+        "end": {"$gt": start},
+    }
+    if exclude_session_id is not None:
+        query["session_id"] = {"$ne": exclude_session_id}
+    conflicts = list(busy_collection.find(query, {"_id": 0}))
+
+    # Recurring series are not materialized; expand just this window
+    wanted = set(user_emails)
+    window_start = start - timedelta(minutes=MAX_SESSION_MINUTES)
+    for occurrence in get_occurrences_for_users(wanted, window_start, end):
+        if occurrence["end"] > start and occurrence["series_id"] != exclude_session_id:
+            for email in wanted.intersection(occurrence["attendees"]):
+                conflicts.append({"session_id": occurrence["series_id"], "user_email": email,
+                                  "start": occurrence["start"], "end": occurrence["end"],
+                                  "title": occurrence["title"]})
+    return sorted(conflicts, key=lambda c: c["start"])
+
+# A recurring session is one session_series document holding the rule;
+# occurrences are generated on demand for the window being looked at.
+@traced("auth.insert_series")
+def insert_series(series_data):
+    series_data["rule"]["last_start"] = last_occurrence_bound(series_data["rule"])
+    return series_collection.insert_one(series_data)
+
+# Cursors and generators below are consumed by traced callers (find_conflicts,
+# the calendar page), so their time shows up there rather than here.
+def get_series_for_users(user_emails, window_start, window_end):
+    user_emails = list(user_emails)
+    return series_collection.find({"$and": [
+        {"$or": [{"participants": {"$in": user_emails}},
+                 {"host_email": {"$in": user_emails}}]},
+        {"rule.dtstart": {"$lt": window_end}},
+        {"$or": [{"rule.last_start": None}, {"rule.last_start": {"$gte": window_start}}]},
+    ]})
+
+def expand_occurrences(series_docs, window_start, window_end):
+    # Generator over occurrences of the given series starting in the window
+    for series in series_docs:
+        rule = series["rule"]
+        duration = timedelta(minutes=rule.get("duration", 60))
+        for start in occurrences(rule, window_start, window_end, series.get("exdates", [])):
+            yield {
+                "series_id": series["_id"],
+                "title": series["title"],
+                "host_email": series["host_email"],
+                "attendees": [series["host_email"], *series.get("participants", [])],
+                "start": start,
+                "end": start + duration,
+            }
 
+def get_occurrences_for_users(user_emails, window_start, window_end):
+    return expand_occurrences(get_series_for_users(user_emails, window_start, window_end),
+                              window_start, window_end)
+
+@traced("auth.get_session_by_id")
 def get_session_by_id(session_id):
-    return sessions_collection.find_one({"_id": session_id})
+    return session_cache.get_or_load(
+        ("session", session_id),
+        lambda: sessions_collection.find_one({"_id": session_id}))
 
-def add_resource(session_id, uploader, file_url=None, link=None, filename=None):
+@traced("auth.add_resource")
+def add_resource(session_id, uploader, file_url=None, link=None, filename=None, content_hash=None):
     resource = {
+        "session_id": session_id,
         "uploader": uploader,
         "timestamp": datetime.utcnow(),
     }
     if file_url and filename:
         resource["file_url"] = file_url
         resource["filename"] = filename
+        if content_hash:
+            resource["sha256"] = content_hash
     if link:
         resource["link"] = link
 
-    sessions_collection.update_one(
-        {"_id": session_id},
-        {"$push": {"resources": resource}}
-    )
+    # Resources live in their own collection; the session document stays small
+    result = resources_collection.insert_one(resource)
+    search_index.index_resource(resource)
+    return result
+
+@traced("auth.search_sessions")
+def search_sessions(user_email, query, limit=20):
+    # Scoped to sessions the user is invited to or hosts (both listings are cached)
+    session_ids = {s["_id"] for s in get_session_summaries_for_user(user_email)}
+    session_ids.update(s["_id"] for s in get_session_summaries_hosted_by(user_email))
+    return search_index.search(session_ids, query, limit)
+
+@traced("auth.get_resources")
+def get_resources(session_id, limit=20, after=None):
+    # Newest first, keyset-paginated on (timestamp, _id). Pass the returned
+    # cursor back as `after` for the next page; it is None on the last page.
+    query = {"session_id": session_id}
+    if after:
+        timestamp, resource_id = after
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": resource_id}},
+        ]
+    page = list(resources_collection.find(query)
+                .sort([("timestamp", -1), ("_id", -1)])
+                .limit(limit + 1))
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = (page[-1]["timestamp"], page[-1]["_id"])
+    return page, next_cursor
+
+
+auth_executor = AuthExecutor(
+    max_workers=int(st.secrets.get("AUTH_WORKERS", 0)) or None,
+    max_pending=int(st.secrets.get("AUTH_MAX_PENDING", 32)),
+    rounds=int(st.secrets.get("BCRYPT_ROUNDS", 12)),
+)
+verified_credentials = VerifiedCredentialCache(
+    ttl=float(st.secrets.get("VERIFIED_CREDENTIAL_TTL", 300)))
 
-def get_resources(session_id):
-    session = sessions_collection.find_one({"_id": session_id})
-    return session.get("resources", [])
+# Login and registration attempts are throttled per email and per client
+# before any Mongo lookup or bcrypt work. RATE_LIMIT_BACKEND = "mongo" shares
+# the buckets between replicas.
+_rate_limit_collection = db["rate_limits"] if st.secrets.get("RATE_LIMIT_BACKEND") == "mongo" else None
+login_limiters = {
+    "email": TokenBucketLimiter(
+        "login_email", burst=int(st.secrets.get("LOGIN_EMAIL_BURST", 5)),
+        per_minute=float(st.secrets.get("LOGIN_EMAIL_PER_MINUTE", 5)), collection=_rate_limit_collection),
+    "client": TokenBucketLimiter(
+        "login_client", burst=int(st.secrets.get("LOGIN_CLIENT_BURST", 30)),
+        per_minute=float(st.secrets.get("LOGIN_CLIENT_PER_MINUTE", 30)), collection=_rate_limit_collection),
+}
+register_limiter = TokenBucketLimiter(
+    "register_client", burst=int(st.secrets.get("REGISTER_CLIENT_BURST", 5)),
+    per_minute=float(st.secrets.get("REGISTER_CLIENT_PER_MINUTE", 2)), collection=_rate_limit_collection)
 
+# Emails with no account. Repeat attempts skip the users lookup, and still
+# pay for one bcrypt check so they take as long as a wrong password does.
+# Per process: an account registered on another replica is seen once its
+# entry expires.
+unknown_emails = TTLCache(maxsize=int(st.secrets.get("UNKNOWN_EMAIL_CACHE_SIZE", 100000)),
+                          ttl=float(st.secrets.get("UNKNOWN_EMAIL_TTL", 60)))
+_unknown_lock = threading.Lock()
+_dummy_hash = None
+_dummy_hash_lock = threading.Lock()
 
+@traced("bcrypt.hash")
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    return auth_executor.hash_password(password)
 
+@traced("bcrypt.check")
 def check_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    return auth_executor.check_password(password, hashed)
 
-def create_user(email, password):
-    if users.find_one({"email": email}):
+def _limit_key(value):
+    return (value or "").strip().lower()
+
+def _unknown_email_hash():
+    # Hashed once at the configured cost, so checking against it costs the same
+    global _dummy_hash
+    with _dummy_hash_lock:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password(os.urandom(16).hex())
+        return _dummy_hash
+
+@traced("auth.create_user")
+def create_user(email, password, client_id=None):
+    # users.email has a unique index, so the insert itself rejects duplicates.
+    # Raises RateLimited when this client registers too often.
+    if client_id:
+        register_limiter.acquire(client_id)
+    if not (indexes_ready.wait(timeout=30) and unique_email_index):
+        # Best effort only: two concurrent registrations can still both pass
+        if users.find_one({"email": email}, {"_id": 1}):
+            return False
+    try:
+        users.insert_one({
+            "email": email,
+            "password": hash_password(password)
+        })
+    except DuplicateKeyError:
         return False
-    users.insert_one({
-        "email": email,
-        "password": hash_password(password)
-    })
+    with _unknown_lock:
+        unknown_emails.pop(email, None)
     return True
 
-def authenticate_user(email, password):
-    user = users.find_one({"email": email})
-    if user and check_password(password, user["password"]):
+@traced("auth.authenticate_user")
+def authenticate_user(email, password, client_id=None):
+    # Raises RateLimited when this email or client has too many recent attempts
+    if client_id:
+        login_limiters["client"].acquire(client_id)
+    login_limiters["email"].acquire(_limit_key(email))
+
+    with _unknown_lock:
+        known_unknown = email in unknown_emails
+    user = None if known_unknown else users.find_one({"email": email})
+    if not user:
+        if not known_unknown:
+            with _unknown_lock:
+                unknown_emails[email] = True
+        check_password(password, _unknown_email_hash())
+        return None
+    if verified_credentials.check(email, password, user["password"]):
+        _refund_login(email, client_id)
+        return user
+    if check_password(password, user["password"]):
+        verified_credentials.remember(email, password, user["password"])
+        _refund_login(email, client_id)
         return user
     return None
+
+
+def _refund_login(email, client_id):
+    # Successful logins count towards neither the account's nor the client's
+    # limit, so users sharing an address only lose out to failed attempts
+    login_limiters["email"].refund(_limit_key(email))
+    if client_id:
+        login_limiters["client"].refund(client_id)
@@ -0,0 +1,105 @@
+import atexit
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from cachetools import TTLCache
+
+# bcrypt is CPU-bound; running it in worker processes keeps Streamlit's script
+# threads free to render while a burst of logins is being verified.
+# This module must stay importable without Streamlit (spawned workers import it).
+
+
+class AuthBusyError(Exception):
+    pass
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+class AuthExecutor:
+    def __init__(self, max_workers=None, max_pending=32, rounds=12,
+                 queue_timeout=2.0, result_timeout=30.0):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.rounds = rounds
+        self.queue_timeout = queue_timeout
+        self.result_timeout = result_timeout
+        # Work in flight + queued; callers past this wait, then get AuthBusyError
+        self._slots = threading.BoundedSemaphore(self.max_workers + max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.rejected = 0
+
+    def hash_password(self, password):
+        return self._run(_hashpw, password.encode("utf-8"), self.rounds)
+
+    def check_password(self, password, hashed):
+        return self._run(_checkpw, password.encode("utf-8"), hashed)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.rejected += 1
+            raise AuthBusyError("Authentication queue is full, try again shortly")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.result_timeout)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking Streamlit's threaded server process is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(self.shutdown)
+            return self._pool
+
+
+class VerifiedCredentialCache:
+    # Remembers a successful bcrypt check per account, so logging in again
+    # (after a page reload opens a new browser session) skips bcrypt. Only the
+    # correct password matches; anything else still goes through bcrypt.
+    # Passwords are kept only as an HMAC under a per-process key.
+    def __init__(self, maxsize=4096, ttl=300):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def remember(self, email, password, stored_hash):
+        with self._lock:
+            self._entries[email] = (stored_hash, self._digest(password))
+
+    def check(self, email, password, stored_hash):
+        with self._lock:
+            entry = self._entries.get(email)
+        if entry is None:
+            return False
+        cached_hash, digest = entry
+        # A changed password hash in the database invalidates the entry
+        return cached_hash == stored_hash and hmac.compare_digest(digest, self._digest(password))
+
+    def forget(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
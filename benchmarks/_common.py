@@ -0,0 +1,51 @@
+import os
+import sys
+import statistics
+import time
+
+# Benchmarks import the app's own modules from the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_auth(mongo_uri=None, **secrets):
+    """Import auth.py against a local mongod (mongo_uri) or mongomock.
+
+    auth.py reads st.secrets and connects at import time, so secrets are
+    swapped out before the import happens.
+    """
+    import streamlit as st
+
+    st.secrets = {"MONGO_URI": mongo_uri or "mongomock://", **secrets}
+
+    import auth
+    auth.indexes_ready.wait()
+    return auth
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
@@ -0,0 +1,189 @@
+import email
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-ins for the third-party HTTP APIs the app calls, so load tests
+# exercise the real SDK code paths without network access or quotas:
+#   SendGrid         POST /v3/mail/send                 -> 202
+#   Cloudinary       POST /v1_1/<cloud>/<type>/upload   -> upload result JSON
+#   Google Calendar  POST /batch/calendar/v3            -> multipart batch reply
+#                    GET  .../calendars/primary/events  -> FakeCalendar feed
+#   Google OAuth     POST /token                        -> refreshed access token
+# Point the app at it with SENDGRID_API_HOST, CLOUDINARY_UPLOAD_PREFIX,
+# GOOGLE_CALENDAR_ENDPOINT and GOOGLE_TOKEN_URI. `latency` adds a fixed delay per request.
+# Tests can read the request bodies from `received` and make the next calls
+# to an API fail with script(name, status, ...).
+
+BOUNDARY = "batch_stub_boundary"
+
+
+class StubServer:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = {}
+        self.received = {}
+        self._scripted = {}
+        self.calendar = FakeCalendar()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="api-stubs", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def script(self, name, *statuses):
+        with self._lock:
+            self._scripted.setdefault(name, []).extend(statuses)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.received.clear()
+            self._scripted.clear()
+            self.calendar = FakeCalendar()
+
+    def record(self, name, body):
+        # Returns the scripted status for this call, if any
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            self.received.setdefault(name, []).append(body)
+            scripted = self._scripted.get(name)
+            return scripted.pop(0) if scripted else None
+
+
+class FakeCalendar:
+    # events.list for one primary calendar: pages of `page_size`, a sync token
+    # per change, and 410 Gone for tokens issued before expire_sync_tokens()
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.version = 0
+        self._events = {}
+        self._changed_at = {}
+        self._valid_from = 0
+
+    def put(self, event):
+        self.version += 1
+        self._events[event["id"]] = dict(event, status=event.get("status", "confirmed"))
+        self._changed_at[event["id"]] = self.version
+
+    def cancel(self, event_id):
+        self.put({"id": event_id, "status": "cancelled"})
+
+    def expire_sync_tokens(self):
+        self._valid_from = self.version + 1
+
+    def list(self, query):
+        sync_token = query.get("syncToken")
+        if sync_token is not None:
+            if int(sync_token) < self._valid_from:
+                return 410, {"error": {"code": 410, "message": "Sync token is no longer valid"}}
+            items = [e for i, e in self._events.items() if self._changed_at[i] > int(sync_token)]
+        else:
+            items = [e for e in self._events.values() if e["status"] != "cancelled"]
+        offset = int(query.get("pageToken", 0))
+        result = {"items": items[offset:offset + self.page_size]}
+        if offset + self.page_size < len(items):
+            result["nextPageToken"] = str(offset + self.page_size)
+        else:
+            result["nextSyncToken"] = str(self.version)
+        return 200, result
+
+
+def _handler_for(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path.endswith("/calendars/primary/events"):
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status = stub.record("google.events_list", query)
+                if status:
+                    self._reply(status, json.dumps({"error": {"code": status}}).encode("utf-8"))
+                    return
+                status, result = stub.calendar.list(query)
+                self._reply(status, json.dumps(result).encode("utf-8"))
+            else:
+                self._reply(404, b'{"error": "not stubbed"}')
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if stub.latency:
+                time.sleep(stub.latency)
+            if self.path.startswith("/v3/mail/send"):
+                status = stub.record("sendgrid.send", body)
+                if status:
+                    self._reply(status, b'{"errors": [{"message": "scripted failure"}]}')
+                else:
+                    self._reply(202, b"", "text/plain")
+            elif "/upload" in self.path:
+                stub.record("cloudinary.upload", body)
+                # Echo the requested folder/public_id, as Cloudinary does
+                fields = dict(re.findall(rb'name="(folder|public_id)"\r\n\r\n([^\r]*)\r\n', body))
+                public_id = (fields.get(b"folder", b"").decode() +
+                             (fields.get(b"public_id") or uuid.uuid4().hex.encode()).decode())
+                self._reply(200, json.dumps({
+                    "public_id": public_id, "bytes": len(body), "resource_type": "raw",
+                    "secure_url": f"https://res.cloudinary.test/raw/upload/{public_id}",
+                }).encode("utf-8"))
+            elif self.path.startswith("/token"):
+                status = stub.record("google.token", body)
+                if status:
+                    self._reply(status, b'{"error": "invalid_grant", "error_description": "Token has been revoked."}')
+                    return
+                self._reply(200, json.dumps({
+                    "access_token": f"refreshed-{uuid.uuid4().hex[:8]}", "expires_in": 3600,
+                    "token_type": "Bearer", "scope": "https://www.googleapis.com/auth/calendar",
+                }).encode("utf-8"))
+            elif self.path.startswith("/batch/calendar"):
+                stub.record("google.events_batch", body)
+                self._reply(200, _batch_response(self.headers["Content-Type"], body),
+                            f"multipart/mixed; boundary={BOUNDARY}")
+            else:
+                self._reply(404, b'{"error": "not stubbed"}')
+
+        def _reply(self, status, payload, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _batch_response(content_type, body):
+    # Every part succeeds and echoes its event body back, as Calendar does
+    message = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+    parts = []
+    for part in message.get_payload():
+        content_id = part["Content-ID"].strip("<>")
+        inner = part.get_payload(decode=True).decode("utf-8")
+        request_line, _, rest = inner.partition("\n")
+        event_body = rest.split("\r\n\r\n", 1)[-1].split("\n\n", 1)[-1].strip()
+        event = json.loads(event_body) if event_body.startswith("{") else {}
+        event.setdefault("id", request_line.split()[1].split("?")[0].rstrip("/").rsplit("/", 1)[-1])
+        event.setdefault("status", "confirmed")
+        parts.append(
+            f"--{BOUNDARY}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+            f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{json.dumps(event)}\r\n")
+    return ("".join(parts) + f"--{BOUNDARY}--\r\n").encode("utf-8")
@@ -0,0 +1,104 @@
+"""Bulk roster import versus creating sessions one at a time.
+
+Generates a CSV roster of --sessions sessions (default 10k) with
+--participants invitees each, then compares a per-row insert_session()
+loop (on the first --baseline-rows rows) with session_import's batched
+path: parse, validate and unordered insert_many batches. The invitation
+batch into the outbox is timed separately; mongomock checks the outbox's
+unique index with a scan per document, so without --mongo-uri only the
+first --invite-sessions (default 20) sessions are invited.
+
+    python benchmarks/bench_bulk_import.py --sessions 10000 --participants 30
+    python benchmarks/bench_bulk_import.py --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import date, timedelta
+
+from _common import load_auth
+
+TOPICS = ["Linear Algebra", "Organic Chemistry", "Thermodynamics", "Microeconomics", "Data Structures",
+          "Operating Systems", "Calculus", "Statistics", "Genetics", "Databases"]
+
+
+def build_roster(n_sessions, participants, bad_every, seed=0):
+    rng = random.Random(seed)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["title", "description", "participants", "propose_deadline"])
+    deadline = (date.today() + timedelta(days=14)).isoformat()
+    for i in range(n_sessions):
+        emails = [f"Student{rng.randrange(50000)}@Example.edu " for _ in range(participants)]
+        if bad_every and i % bad_every == 0:
+            emails.append("not-an-email")
+        writer.writerow([f"{rng.choice(TOPICS)} - Section {i}", "Weekly review", ";".join(emails),
+                         deadline if i % 7 else ""])
+    return out.getvalue()
+
+
+def reset(auth, notifications):
+    auth.sessions_collection.delete_many({})
+    auth.search_index.collection.delete_many({})
+    notifications.outbox.delete_many({})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--participants", type=int, default=30)
+    parser.add_argument("--baseline-rows", type=int, default=1000,
+                        help="rows created one at a time for the per-row rate")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--invite-sessions", type=int,
+                        help="sessions to invite (default: all against Mongo, 20 on mongomock)")
+    parser.add_argument("--bad-every", type=int, default=100, help="every Nth row gets an invalid email")
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri)
+    import notifications
+    import session_import
+
+    host = "bulk-bench@example.com"
+    roster = build_roster(args.sessions, args.participants, args.bad_every)
+    start = time.perf_counter()
+    rows = session_import.read_roster(roster, "roster.csv")
+    parse_s = time.perf_counter() - start
+    print(f"parsed rows={len(rows)} in {parse_s * 1000:.0f}ms")
+
+    reset(auth, notifications)
+    docs, _ = session_import.prepare_sessions(rows[:args.baseline_rows], host)
+    start = time.perf_counter()
+    for doc in docs:
+        doc.pop("_row")
+        auth.insert_session(doc)
+    per_row_s = time.perf_counter() - start
+    per_row_rate = len(docs) / per_row_s
+    print(f"per-row  sessions={len(docs)} {per_row_s:.2f}s {per_row_rate:,.0f} sessions/s")
+
+    reset(auth, notifications)
+    start = time.perf_counter()
+    report = session_import.import_sessions(rows, host, invite=False, batch_size=args.batch_size)
+    bulk_s = time.perf_counter() - start
+    bulk_rate = report["created"] / bulk_s
+    print(f"bulk     sessions={report['created']} {bulk_s:.2f}s {bulk_rate:,.0f} sessions/s "
+          f"errors={len(report['errors'])} warnings={len(report['warnings'])}")
+    print(f"speedup  {bulk_rate / per_row_rate:.1f}x")
+    assert report["created"] == auth.sessions_collection.count_documents({"host_email": host})
+
+    invite_limit = args.invite_sessions or (None if args.mongo_uri else 20)
+    invite_ids = report["session_ids"][:invite_limit]
+    created = list(auth.sessions_collection.find({"_id": {"$in": invite_ids}}))
+    start = time.perf_counter()
+    queued = notifications.enqueue_invitations(created)
+    invite_s = time.perf_counter() - start
+    print(f"invites  sessions={len(created)} queued={queued} {invite_s:.2f}s {queued / invite_s:,.0f} jobs/s")
+    assert queued == notifications.outbox.count_documents({"kind": "invitation"})
+    reset(auth, notifications)
+
+
+if __name__ == "__main__":
+    main()
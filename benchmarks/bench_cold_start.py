@@ -0,0 +1,74 @@
+"""Cold-start time of the login screen and dashboard, one fresh process per run.
+
+Each run renders app.py with Streamlit's AppTest in a new interpreter, so
+nothing is cached between samples. Fails if a page-scoped dependency leaks
+back into the startup path or the p50 exceeds --budget-ms.
+
+    python benchmarks/bench_cold_start.py --runs 5 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import ROOT, percentile
+
+# Must not be imported until their page is visited
+PAGE_SCOPED = ["pandas", "pyarrow", "sendgrid", "cloudinary", "googleapiclient", "google_auth_oauthlib"]
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+tooling = set(sys.modules)
+
+at = AppTest.from_file("app.py", default_timeout=60)
+at.secrets["MONGO_URI"] = {mongo_uri!r} or "mongomock://"
+at.secrets["SENDGRID_API_KEY"] = "SG.bench"
+if {page!r} != "login":
+    at.session_state["authenticated"] = True
+    at.session_state["user_email"] = "bench@example.com"
+    at.session_state["page"] = {page!r}
+at.run()
+assert not at.exception, at.exception
+elapsed = time.perf_counter() - start
+loaded = sorted({{m.split(".")[0] for m in set(sys.modules) - tooling}})
+print(json.dumps({{"seconds": elapsed, "modules": loaded}}))
+"""
+
+
+def cold_run(page, mongo_uri, profile_path):
+    env = dict(os.environ, PROFILE_STARTUP=profile_path)
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(page=page, mongo_uri=mongo_uri or "")],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=3000)
+    args = parser.parse_args()
+
+    import startup_profile
+
+    for page in ("login", "dashboard"):
+        with tempfile.TemporaryDirectory() as tmp:
+            profile_path = os.path.join(tmp, "startup_profile.jsonl")
+            runs = [cold_run(page, args.mongo_uri, profile_path) for _ in range(args.runs)]
+            samples = [run["seconds"] for run in runs]
+            leaked = sorted(set(PAGE_SCOPED) & set(runs[-1]["modules"]))
+            print(f"page={page:10} runs={len(samples)} p50={percentile(samples, 50) * 1000:.0f}ms "
+                  f"max={max(samples) * 1000:.0f}ms page-scoped loaded={leaked or 'none'}")
+            print("  last run breakdown:")
+            startup_profile.report(profile_path)
+            assert not leaked, f"{page} imports page-scoped modules at startup: {leaked}"
+            assert percentile(samples, 50) * 1000 < args.budget_ms, f"{page} cold start exceeded budget"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Windowed feedback analytics on synthetic feedback.csv files.
+
+    python benchmarks/bench_feedback_analytics.py --rows 10000,1000000,10000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import _common  # noqa: F401  (puts the repo root on sys.path)
+import feedback_analytics
+
+
+def generate_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_sessions = max(10, rows // 50)
+    topics = np.array([f"Topic {i}" for i in range(200)])
+    hosts = np.array([f"host{i}@example.com" for i in range(500)])
+    session = rng.integers(0, n_sessions, rows)
+    start = np.datetime64("2023-01-01T00:00:00")
+    frame = pd.DataFrame({
+        "session_id": np.char.add("s", session.astype(str)),
+        "title": topics[session % len(topics)],
+        "host_email": hosts[session % len(hosts)],
+        "duration": rng.choice([30, 45, 60, 90, 120], rows),
+        "rating": rng.integers(1, 6, rows),
+        "comment": "",
+        "timestamp": start + rng.integers(0, 3 * 365 * 86400, rows).astype("timedelta64[s]"),
+    })
+    frame.to_csv(path, index=False)
+
+
+def timeit(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"    {label:24} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="10000,1000000,10000000")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in [int(n) for n in args.rows.split(",")]:
+            path = os.path.join(tmp, f"feedback-{rows}.csv")
+            generate_csv(path, rows)
+            print(f"{rows:,} rows ({os.path.getsize(path) / 1e6:.1f} MB csv)")
+            frame = timeit("load typed", lambda: feedback_analytics.read_feedback_csv(path))
+            print(f"    {'frame memory':24} {frame.memory_usage(deep=True).sum() / 1e6:10.1f} MB")
+            timeit("weekly_host_ratings", lambda: feedback_analytics.weekly_host_ratings(frame))
+            timeit("topic_trends", lambda: feedback_analytics.topic_trends(frame))
+            timeit("rolling_average_rating", lambda: feedback_analytics.rolling_average_rating(frame))
+            timeit("rating_percentiles", lambda: feedback_analytics.rating_percentiles(frame))
+            timeit("last 90 days window", lambda: feedback_analytics.in_window(
+                frame, start=frame["timestamp"].max() - pd.Timedelta(days=90)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Query volume and update latency: per-viewer reruns vs the shared live feed.
+
+--viewers people keep a session's vote page open while votes arrive. The
+"rerun" model re-reads the session document for every viewer on every
+refresh; the "feed" model has each viewer read live_updates state, with one
+watcher per process doing the queries. Against a replica set the feed uses
+change streams; standalone mongod and mongomock use the polling fallback.
+
+    python benchmarks/bench_live_updates.py --viewers 200 --seconds 10
+    python benchmarks/bench_live_updates.py --mongo-uri "mongodb://localhost:27017/?replicaSet=rs0"
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from _common import load_auth, percentile
+
+
+def vote(auth, session_id, voters, writes):
+    # Votes are cast from the viewer loop: mongomock is not thread-safe
+    i = len(writes)
+    slot = (datetime(2030, 1, 1, 9) + timedelta(hours=i % 8)).isoformat()
+    auth.propose_slots_to_session(session_id, voters[i % len(voters)], [slot])
+    writes.append((time.perf_counter(), i + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--refresh", type=float, default=1.0, help="page refresh interval")
+    parser.add_argument("--vote-interval", type=float, default=0.25, help="seconds between votes")
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri, LIVE_POLL_SECONDS=args.refresh / 2)
+    import live_updates
+
+    voters = [f"voter{i}@example.com" for i in range(args.viewers)]
+    session_id = auth.sessions_collection.insert_one({
+        "title": "live-bench", "host_email": "host@example.com", "participants": voters,
+        "proposed_slots": [], "vote_counts": {}, "ballots": {}, "voter_count": 0,
+    }).inserted_id
+
+    for model in ("rerun", "feed"):
+        feed = live_updates.get_feed() if model == "feed" else None
+        if feed:
+            feed.subscribe(session_id)
+            start_queries = feed.queries
+        queries = 0
+        writes, seen = [], []
+        started = time.perf_counter()
+        while time.perf_counter() < started + args.seconds:
+            tick = time.perf_counter()
+            while len(writes) < (tick - started) / args.vote_interval:
+                vote(auth, session_id, voters, writes)
+            for _ in range(args.viewers):
+                if model == "rerun":
+                    doc = auth.sessions_collection.find_one({"_id": session_id})
+                    queries += 1
+                    total = sum(doc.get("vote_counts", {}).values())
+                else:
+                    total = sum(feed.subscribe(session_id).vote_counts.values())
+            seen.append((time.perf_counter(), total))
+            time.sleep(max(0.0, args.refresh - (time.perf_counter() - tick)))
+        if feed:
+            queries = feed.queries - start_queries
+
+        # Staleness: how long after a write the viewers first saw its effect
+        delays = []
+        for written_at, n in writes:
+            shown = next((t for t, total in seen if t >= written_at and total >= n), None)
+            if shown is not None:
+                delays.append(shown - written_at)
+        mode = feed.mode if feed else "direct"
+        print(f"{model:5} ({mode:13}) viewers={args.viewers} queries={queries:6} "
+              f"({queries / args.seconds:.0f}/s) staleness p50={percentile(delays, 50) * 1000:.0f}ms "
+              f"p99={percentile(delays, 99) * 1000:.0f}ms")
+        auth.sessions_collection.update_one({"_id": session_id},
+                                            {"$set": {"vote_counts": {}, "ballots": {}, "voter_count": 0}})
+
+    auth.sessions_collection.delete_one({"_id": session_id})
+
+
+if __name__ == "__main__":
+    main()
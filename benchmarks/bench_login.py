@@ -0,0 +1,66 @@
+"""Concurrent login latency: inline bcrypt vs the auth executor.
+
+    python benchmarks/bench_login.py --logins 64 --concurrency 16 --rounds 10
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from _common import load_auth, summarize
+
+
+def run(login, emails, concurrency):
+    def one(email):
+        start = time.perf_counter()
+        assert login(email)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        samples = list(pool.map(one, emails))
+        wall = time.perf_counter() - start
+    return samples, wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri, BCRYPT_ROUNDS=args.rounds)
+    password = "correct horse battery staple"
+    emails = [f"bench{i}@example.com" for i in range(args.logins)]
+    auth.users.delete_many({"email": {"$in": emails}})
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(args.rounds))
+    auth.users.insert_many([{"email": email, "password": hashed} for email in emails])
+
+    def inline(email):
+        # The pre-executor path: bcrypt on the calling thread
+        user = auth.users.find_one({"email": email})
+        return bcrypt.checkpw(password.encode("utf-8"), user["password"])
+
+    def executor(email):
+        auth.verified_credentials.forget(email)
+        return auth.authenticate_user(email, password)
+
+    def repeat(email):
+        # Logging in again hits the verified-credential cache
+        return auth.authenticate_user(email, password)
+
+    auth.auth_executor.check_password(password, hashed)  # warm the worker pool
+
+    for name, login in (("inline", inline), ("executor", executor), ("cached", repeat)):
+        samples, wall = run(login, emails, args.concurrency)
+        stats = summarize(samples)
+        print(f"{name:9} n={stats['n']} p50={stats['p50_ms']:.1f}ms "
+              f"p99={stats['p99_ms']:.1f}ms throughput={len(samples) / wall:.1f}/s")
+    auth.auth_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
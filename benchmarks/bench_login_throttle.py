@@ -0,0 +1,104 @@
+"""Login cost under a credential-stuffing burst, with and without throttling.
+
+One attacking client fires --attempts logins (wrong passwords for real
+accounts, plus unknown emails) from --concurrency threads while a real user
+logs in every --legit-interval seconds from their own client. Reports how
+many bcrypt checks the burst cost, how many attempts were rejected, and the
+real user's login latency.
+
+    python benchmarks/bench_login_throttle.py --attempts 400 --concurrency 16
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from _common import load_auth, summarize
+
+PASSWORD = "correct horse battery staple"
+
+
+def bcrypt_checks(tracing):
+    return next((row["count"] for row in tracing.snapshot("bcrypt.check")), 0)
+
+
+def attack(auth, tracing, RateLimited, emails, attempts, concurrency, legit_interval):
+    rng = random.Random(0)
+    targets = [rng.choice(emails) if rng.random() < 0.5 else f"nobody{rng.randrange(50)}@example.com"
+               for _ in range(attempts)]
+    rejected = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def one(email):
+        try:
+            auth.authenticate_user(email, "hunter2", client_id="203.0.113.9")
+        except RateLimited:
+            with lock:
+                rejected[0] += 1
+
+    legit = []
+
+    def legit_user():
+        while not done.is_set():
+            start = time.perf_counter()
+            assert auth.authenticate_user(emails[0], PASSWORD, client_id="198.51.100.7")
+            legit.append(time.perf_counter() - start)
+            done.wait(legit_interval)
+
+    checks_before = bcrypt_checks(tracing)
+    user_thread = threading.Thread(target=legit_user)
+    user_thread.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, targets))
+    wall = time.perf_counter() - start
+    done.set()
+    user_thread.join()
+    # The real user's own logins are bcrypt checks too
+    return {"wall": wall, "rejected": rejected[0],
+            "bcrypt_checks": bcrypt_checks(tracing) - checks_before - len(legit),
+            "legit": summarize(legit)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--attempts", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--legit-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri, BCRYPT_ROUNDS=args.rounds)
+    import tracing
+    from rate_limit import RateLimited, TokenBucketLimiter
+
+    emails = [f"throttle{i}@example.com" for i in range(args.accounts)]
+    auth.users.delete_many({"email": {"$in": emails}})
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(args.rounds))
+    auth.users.insert_many([{"email": email, "password": hashed} for email in emails])
+    auth.authenticate_user(emails[0], PASSWORD)  # warm the worker pool and the unknown-email hash
+    auth.authenticate_user("warmup@example.com", PASSWORD)
+
+    throttled = dict(auth.login_limiters)
+    unthrottled = {name: TokenBucketLimiter(f"off_{name}", burst=10**9, per_minute=10**9)
+                   for name in throttled}
+    for name, limiters in (("unthrottled", unthrottled), ("throttled", throttled)):
+        auth.login_limiters.update(limiters)
+        auth.unknown_emails.clear()
+        result = attack(auth, tracing, RateLimited, emails, args.attempts, args.concurrency,
+                        args.legit_interval)
+        legit = result["legit"]
+        print(f"{name:12} attempts={args.attempts} rejected={result['rejected']} "
+              f"bcrypt_checks={result['bcrypt_checks']} wall={result['wall']:.2f}s "
+              f"legit_login n={legit['n']} p50={legit['p50_ms']:.1f}ms p99={legit['p99_ms']:.1f}ms")
+    auth.auth_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Concurrent listing queries through the shared, pooled client.
+
+Simulates many Streamlit sessions hitting the uncached summary listing at
+once and reports request latency next to the pool / command metrics the
+connection manager collects. Pool metrics stay at zero under mongomock.
+
+    python benchmarks/bench_mongo_pool.py --mongo-uri mongodb://localhost:27017 --concurrency 64
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import load_auth, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-size", type=int, default=50)
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri, MONGO_MAX_POOL_SIZE=args.pool_size)
+    import mongo
+
+    users = [f"pool{i}@example.com" for i in range(args.users)]
+    auth.sessions_collection.delete_many({"title": "pool-bench"})
+    auth.sessions_collection.insert_many([
+        {"title": "pool-bench", "host_email": users[i % args.users],
+         "participants": users[i % args.users:i % args.users + 5]}
+        for i in range(args.users * 5)
+    ])
+
+    def one(i):
+        start = time.perf_counter()
+        # Bypass the session cache so every request reaches the server
+        list(auth.listing_collection.find({"participants": users[i % args.users]},
+                                          dict(auth.SESSION_SUMMARY_PROJECTION)))
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.perf_counter()
+        samples = list(pool.map(one, range(args.requests)))
+        wall = time.perf_counter() - start
+
+    stats = summarize(samples)
+    health = mongo.health()
+    print(f"concurrency={args.concurrency} pool={args.pool_size} requests={args.requests} "
+          f"throughput={args.requests / wall:.0f}/s p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+    print(json.dumps({"ok": health["ok"], "ping_ms": round(health["latency_ms"], 2),
+                      "pool": health["pool"],
+                      "command_p50_ms": health["commands"]["p50_ms"],
+                      "command_p99_ms": health["commands"]["p99_ms"]}, indent=2))
+    auth.sessions_collection.delete_many({"title": "pool-bench"})
+    assert health["ok"], health["error"]
+    assert health["pool"]["checkout_failures"] == 0, "connection checkouts timed out"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Expanding one week of long-running recurring series, then the calendar
+page's series query by user and window against Mongo.
+
+    python benchmarks/bench_recurrence.py --series 1000
+    python benchmarks/bench_recurrence.py --mongo-uri mongodb://localhost:27017 --stored 100000
+"""
+import argparse
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _common import load_auth, summarize, timed
+import recurrence
+
+
+def synthetic_series(count, years, now):
+    dtstart = now - timedelta(weeks=52 * years)
+    return [{
+        "freq": "WEEKLY",
+        "interval": 1 + i % 2,
+        "byday": [i % 7, (i + 3) % 7],
+        "dtstart": dtstart + timedelta(hours=i % 10),
+        "until": None,
+        "count": None,
+        "duration": 60,
+    } for i in range(count)]
+
+
+def expand(rules, window_start, window_end):
+    return sum(1 for rule in rules for _ in recurrence.occurrences(rule, window_start, window_end))
+
+
+def seed_series(auth, n_series, n_users, now, seed=0):
+    # Series of all ages; a third have already ended, so last_start rules them out
+    rng = random.Random(seed)
+    auth.series_collection.delete_many({"title": "series-bench"})
+    docs = []
+    for i in range(n_series):
+        dtstart = now - timedelta(weeks=rng.randrange(1, 52 * 10))
+        ended = i % 3 == 0
+        rule = {"freq": "WEEKLY", "interval": 1 + i % 2, "byday": [i % 7, (i + 3) % 7],
+                "dtstart": dtstart, "until": dtstart + timedelta(weeks=rng.randrange(1, 12)) if ended else None,
+                "count": None, "duration": 60}
+        rule["last_start"] = recurrence.last_occurrence_bound(rule)
+        docs.append({"title": "series-bench", "host_email": f"user{i % n_users}@example.com",
+                     "participants": [f"user{rng.randrange(n_users)}@example.com" for _ in range(5)],
+                     "rule": rule, "exdates": []})
+        if len(docs) == 5000:
+            auth.series_collection.insert_many(docs)
+            docs = []
+    if docs:
+        auth.series_collection.insert_many(docs)
+
+
+def bench_series_query(args, now, window_end):
+    auth = load_auth(args.mongo_uri)
+    seed_series(auth, args.stored, args.users, now)
+    users = [f"user{i}@example.com" for i in range(args.users)]
+    rng = random.Random(1)
+    samples, found = timed(lambda: len(list(auth.get_occurrences_for_users([rng.choice(users)], now, window_end))),
+                           args.repeat * 10)
+    stats = summarize(samples)
+    print(f"stored={args.stored} users={args.users} get_occurrences_for_users one week "
+          f"p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms occurrences={found}")
+    if args.mongo_uri:
+        # mongomock has no query planner; against mongod show what the query touched
+        plan = auth.get_series_for_users([users[0]], now, window_end).explain()
+        execution = plan.get("executionStats", {})
+        print(f"  plan: returned={execution.get('nReturned')} keys={execution.get('totalKeysExamined')} "
+              f"docs={execution.get('totalDocsExamined')}")
+    auth.series_collection.delete_many({"title": "series-bench"})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--stored", type=int, default=20000, help="series stored in Mongo for the query")
+    parser.add_argument("--users", type=int, default=2000, help="users the stored series are spread over")
+    args = parser.parse_args()
+
+    now = datetime(2025, 1, 6, 8, 0)
+    window_end = now + timedelta(days=7)
+    baseline = None
+    for years in (1, 5, 20):
+        rules = synthetic_series(args.series, years, now)
+        samples, found = timed(lambda: expand(rules, now, window_end), args.repeat)
+        tracemalloc.start()
+        expand(rules, now, window_end)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats = summarize(samples)
+        baseline = baseline or stats["p50_ms"]
+        print(f"years={years:3} series={args.series} occurrences={found} "
+              f"p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms peak={peak / 1024:.0f}KiB")
+        # Cost depends on the window, not on how long the series has been running
+        assert stats["p50_ms"] < baseline * 3 + 5, "expansion cost grows with series age"
+
+    bench_series_query(args, now, window_end)
+
+
+if __name__ == "__main__":
+    main()
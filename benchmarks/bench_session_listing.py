@@ -0,0 +1,70 @@
+"""Full-document vs projected session listings.
+
+    python benchmarks/bench_session_listing.py --sessions 300 --slots 200 --resources 100
+    python benchmarks/bench_session_listing.py --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import bson
+
+from _common import load_auth, summarize, timed
+
+
+def seed(auth, user, n_sessions, n_slots, n_resources):
+    auth.sessions_collection.delete_many({"participants": user})
+    now = datetime.utcnow()
+    docs = []
+    for i in range(n_sessions):
+        docs.append({
+            "host_email": f"host{i % 17}@example.com",
+            "title": f"Session {i}",
+            "description": "x" * 200,
+            "participants": [user] + [f"p{j}@example.com" for j in range(20)],
+            "proposed_slots": [
+                {"user": f"p{j % 20}@example.com",
+                 "slots": [(now + timedelta(hours=j + k)).isoformat() for k in range(3)],
+                 "submitted_at": now}
+                for j in range(n_slots)
+            ],
+            "resources": [
+                {"uploader": f"p{j % 20}@example.com", "timestamp": now,
+                 "file_url": f"https://res.cloudinary.com/demo/raw/upload/{i}/{j}.pdf",
+                 "filename": f"notes-{j}.pdf"}
+                for j in range(n_resources)
+            ],
+        })
+    auth.sessions_collection.insert_many(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--slots", type=int, default=200)
+    parser.add_argument("--resources", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    auth = load_auth(args.mongo_uri)
+    user = "bench-user@example.com"
+    seed(auth, user, args.sessions, args.slots, args.resources)
+
+    def full():
+        auth.session_cache.clear()
+        return auth.get_sessions_for_user(user)
+
+    def summary():
+        auth.session_cache.clear()
+        return auth.get_session_summaries_for_user(user)
+
+    for name, fn in (("full", full), ("summary", summary)):
+        samples, docs = timed(fn, args.repeat)
+        size = sum(len(bson.encode(doc)) for doc in docs)
+        stats = summarize(samples)
+        print(f"{name:8} docs={len(docs):5} bytes={size:12,} "
+              f"p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Per-span overhead of the tracing layer.
+
+    python benchmarks/bench_tracing.py --calls 200000
+"""
+import argparse
+import time
+
+import _common  # noqa: F401  (puts the repo root on sys.path)
+import tracing
+
+
+def plain(x):
+    return x + 1
+
+
+@tracing.traced("bench.traced")
+def traced(x):
+    return x + 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--budget-us", type=float, default=20.0)
+    args = parser.parse_args()
+
+    timings = {}
+    for name, fn in (("plain", plain), ("traced", traced)):
+        start = time.perf_counter()
+        for i in range(args.calls):
+            fn(i)
+        timings[name] = (time.perf_counter() - start) / args.calls * 1e6
+
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        with tracing.span("bench.span"):
+            pass
+    timings["span"] = (time.perf_counter() - start) / args.calls * 1e6
+
+    overhead = timings["traced"] - timings["plain"]
+    print(f"calls={args.calls} plain={timings['plain']:.2f}us traced={timings['traced']:.2f}us "
+          f"span={timings['span']:.2f}us overhead/call={overhead:.2f}us")
+    row = tracing.snapshot("bench.traced")[0]
+    print(f"recorded count={row['count']} p50={row['p50_ms'] * 1000:.2f}us p99={row['p99_ms'] * 1000:.2f}us")
+    assert overhead < args.budget_us, "tracing overhead exceeded the per-call budget"
+
+
+if __name__ == "__main__":
+    main()
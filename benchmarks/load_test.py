@@ -0,0 +1,410 @@
+"""Load test that replays StudySync user journeys against the data layer.
+
+Drives the same functions app.py calls, from --concurrency worker threads,
+each looping over randomly chosen journeys for --duration seconds:
+
+    login      authenticate_user (bcrypt through the auth executor)
+    browse     dashboard listings, search, one session in full
+    propose    propose_slots_to_session on an invited session
+    finalize   vote tally, finalize_slot, confirmation emails (SendGrid),
+               calendar sync (Google Calendar batch)
+    resources  upload a file (Cloudinary, content-addressed), add a link,
+               list the newest page
+    feedback   FeedbackStore.append, running aggregates, rating percentiles
+
+SendGrid, Cloudinary and Google Calendar are served by local stubs
+(benchmarks/_stubs.py); Mongo is a local mongod (--mongo-uri) or mongomock.
+mongomock is not thread-safe, so without --mongo-uri journeys are run one
+at a time and only the per-operation latencies are meaningful.
+
+Throughput and latency percentiles are printed per operation and written
+as JSON (--output) so runs can be diffed with --compare:
+
+    python benchmarks/load_test.py --users 40 --concurrency 1,8 --duration 20
+    python benchmarks/load_test.py --mongo-uri mongodb://localhost:27017 --concurrency 32 \\
+        --output results/main.json
+    python benchmarks/load_test.py --mongo-uri mongodb://localhost:27017 --compare results/main.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import bcrypt
+
+from _common import ROOT, load_auth, percentile
+from _stubs import StubServer
+
+PASSWORD = "correct horse battery staple"
+JOURNEYS = {"login": 2, "browse": 6, "propose": 3, "finalize": 1, "resources": 2, "feedback": 1}
+TOPICS = ["Linear Algebra", "Organic Chemistry", "Thermodynamics", "Microeconomics", "Data Structures",
+          "Operating Systems", "Calculus", "Statistics", "Genetics", "Databases"]
+QUERIES = ["linear", "chem", "data structures", "stat", "review"]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.last_error = {}
+
+    @contextlib.contextmanager
+    def op(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = self.errors.get(name, 0) + 1
+                self.last_error[name] = repr(e)
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples.setdefault(name, []).append(elapsed)
+
+    def report(self, wall):
+        operations = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            samples = self.samples.get(name, [])
+            operations[name] = {
+                "n": len(samples),
+                "errors": self.errors.get(name, 0),
+                "throughput_per_s": len(samples) / wall if wall else 0.0,
+                "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": max(samples) * 1000 if samples else 0.0,
+            }
+            if name in self.last_error:
+                operations[name]["last_error"] = self.last_error[name]
+        return operations
+
+
+class Journeys:
+    def __init__(self, app, recorder, data, feedback_store, worker, rng_seed):
+        self.app = app
+        self.op = recorder.op
+        self.data = data
+        self.feedback_store = feedback_store
+        self.worker = worker
+        self._local = threading.local()
+        self._seeds = iter(range(rng_seed, rng_seed + 1_000_000))
+        self._seed_lock = threading.Lock()
+
+    @property
+    def rng(self):
+        if not hasattr(self._local, "rng"):
+            with self._seed_lock:
+                self._local.rng = random.Random(next(self._seeds))
+        return self._local.rng
+
+    def login(self, user):
+        auth = self.app["auth"]
+        # Half the logins are repeats that the verified-credential cache serves
+        if self.rng.randrange(2):
+            auth.verified_credentials.forget(user)
+        with self.op("login"):
+            assert auth.authenticate_user(user, PASSWORD)
+
+    def browse(self, user):
+        auth = self.app["auth"]
+        with self.op("dashboard"):
+            invited = auth.get_session_summaries_for_user(user)
+            auth.get_session_summaries_hosted_by(user)
+        with self.op("search"):
+            auth.search_sessions(user, self.rng.choice(QUERIES))
+        if invited:
+            with self.op("session_detail"):
+                auth.get_session_by_id(self.rng.choice(invited)["_id"])
+
+    def propose(self, user):
+        sessions = self.data["invited"].get(user)
+        if not sessions:
+            return self.browse(user)
+        slots = sorted(self.rng.sample(self.data["slots"], 3))
+        with self.op("propose_slots"):
+            self.app["auth"].propose_slots_to_session(self.rng.choice(sessions), user, slots)
+
+    def finalize(self, user):
+        sessions = self.data["hosted"].get(user)
+        if not sessions:
+            return self.browse(user)
+        auth, notifications, calendar_sync = (self.app["auth"], self.app["notifications"],
+                                              self.app["calendar_sync"])
+        session_id = self.rng.choice(sessions)
+        with self.op("tally"):
+            tally = auth.get_vote_counts(session_id, top_k=5)
+        slot = tally["slots"][0]["slot"] if tally["slots"] else self.rng.choice(self.data["slots"])
+        with self.op("finalize_slot"):
+            auth.finalize_slot(session_id, slot, 60)
+            session = auth.get_session_by_id(session_id)
+        with self.op("notify_confirmations"):
+            notifications.enqueue_confirmations(session, slot)
+            self.worker.run_once()
+        with self.op("calendar_sync"):
+            calendar_sync.sync_session(session_id)
+
+    def resources(self, user):
+        sessions = self.data["invited"].get(user) or self.data["hosted"].get(user)
+        if not sessions:
+            return self.browse(user)
+        auth, uploads = self.app["auth"], self.app["uploads"]
+        session_id = self.rng.choice(sessions)
+        # Some files are re-shared notes that hit the content-hash dedupe path
+        if self.rng.random() < 0.3:
+            content = self.rng.choice(self.data["shared_files"])
+        else:
+            content = self.rng.randbytes(self.data["file_bytes"])
+        filename = f"notes-{self.rng.randrange(10**6)}.pdf"
+        with self.op("upload_resource"):
+            uploaded = uploads.upload_resource(io.BytesIO(content), filename)
+            auth.add_resource(session_id, user, file_url=uploaded["url"], filename=filename,
+                              content_hash=uploaded["sha256"])
+        with self.op("add_link"):
+            auth.add_resource(session_id, user, link=f"https://github.com/studysync/{self.rng.randrange(10**6)}")
+        with self.op("list_resources"):
+            auth.get_resources(session_id, limit=20)
+
+    def feedback(self, user):
+        sessions = self.data["invited"].get(user)
+        if not sessions:
+            return self.browse(user)
+        auth, feedback_analytics = self.app["auth"], self.app["feedback_analytics"]
+        session = auth.get_session_by_id(self.rng.choice(sessions))
+        with self.op("feedback_submit"):
+            self.feedback_store.append({
+                "session_id": session["_id"], "title": session["title"],
+                "host_email": session["host_email"], "duration": session.get("duration", 60),
+                "rating": self.rng.randint(1, 5), "comment": "", "timestamp": datetime.now(),
+            })
+            self.feedback_store.aggregates()
+        with self.op("feedback_analytics"):
+            feedback_analytics.rating_percentiles(feedback_analytics.load_frame(self.feedback_store))
+
+
+def seed(app, n_users, sessions_per_host, participants, rounds, rng):
+    auth, google_calendar = app["auth"], app["google_calendar"]
+    users = [f"load{i}@example.com" for i in range(n_users)]
+    hosts = users[:max(1, n_users // 5)]
+    auth.users.delete_many({"email": {"$in": users}})
+    auth.sessions_collection.delete_many({"host_email": {"$in": hosts}})
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds))
+    auth.users.insert_many([{"email": email, "password": hashed} for email in users])
+
+    docs = []
+    for host in hosts:
+        others = [u for u in users if u != host]
+        for i in range(sessions_per_host):
+            docs.append(auth.new_session_document(
+                host, f"{rng.choice(TOPICS)} - Review {i}", "Load test session",
+                rng.sample(others, min(participants, len(others))), date.today() + timedelta(days=7)))
+    created, _ = auth.insert_sessions(docs)
+
+    # Every user has linked Google Calendar; the stub accepts any token
+    expiry = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    google_calendar.token_store.collection.delete_many({"_id": {"$in": users}})
+    google_calendar.token_store.collection.insert_many([
+        {"_id": email, "updated_at": datetime.utcnow(),
+         "token": {"token": "stub", "refresh_token": "stub", "client_id": "stub",
+                   "client_secret": "stub", "expiry": expiry}}
+        for email in users])
+
+    start = datetime.combine(date.today() + timedelta(days=3), datetime.min.time())
+    invited, hosted = {}, {}
+    for doc in created:
+        hosted.setdefault(doc["host_email"], []).append(doc["_id"])
+        for email in doc["participants"]:
+            invited.setdefault(email, []).append(doc["_id"])
+    return {
+        "users": users,
+        "invited": invited,
+        "hosted": hosted,
+        "slots": [(start + timedelta(hours=h)).isoformat() for h in range(9, 9 + 24 * 3, 3)],
+        "shared_files": [rng.randbytes(64 * 1024) for _ in range(5)],
+        "file_bytes": 64 * 1024,
+    }
+
+
+def run_level(journeys, mix, users, concurrency, duration, serialize):
+    names, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+    guard = threading.Lock() if serialize else contextlib.nullcontext()
+    counts = {name: 0 for name in names}
+    failed = [0]
+    counts_lock = threading.Lock()
+
+    def worker():
+        rng = journeys.rng
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            user = rng.choice(users)
+            try:
+                with guard:
+                    getattr(journeys, name)(user)
+            except Exception:
+                with counts_lock:
+                    failed[0] += 1
+                continue
+            with counts_lock:
+                counts[name] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - start, counts, failed[0]
+
+
+def parse_mix(text):
+    if not text:
+        return dict(JOURNEYS)
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in JOURNEYS:
+            raise SystemExit(f"unknown journey {name!r}; choose from {', '.join(JOURNEYS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_path, levels):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    print(f"\ncompared with {previous_path}")
+    for level in levels:
+        before = previous.get(level["concurrency"])
+        if not before:
+            continue
+        print(f"  concurrency={level['concurrency']}")
+        for name, stats in level["operations"].items():
+            old = before["operations"].get(name)
+            if not old or not old["p50_ms"]:
+                continue
+            print(f"    {name:22} p50 {_change(old['p50_ms'], stats['p50_ms'])}  "
+                  f"p99 {_change(old['p99_ms'], stats['p99_ms'])}  "
+                  f"throughput {_change(old['throughput_per_s'], stats['throughput_per_s'])}")
+
+
+def _change(old, new):
+    return f"{(new - old) / old * 100:+6.1f}%" if old else "   n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--sessions-per-host", type=int, default=5)
+    parser.add_argument("--participants", type=int, default=8, help="invitees per session")
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated worker counts, one run each")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per concurrency level")
+    parser.add_argument("--mix", help="journey weights, e.g. browse=6,login=2 (default: built-in mix)")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt rounds for seeded users")
+    parser.add_argument("--stub-latency-ms", type=float, default=0, help="added to every stubbed API call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/load_test-<time>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    stubs = StubServer(latency=args.stub_latency_ms / 1000).start()
+    feedback_dir = tempfile.mkdtemp(prefix="studysync-load-")
+    auth = load_auth(
+        args.mongo_uri,
+        BCRYPT_ROUNDS=args.rounds,
+        SENDGRID_API_KEY="SG.stub",
+        SENDGRID_API_HOST=stubs.url,
+        CLOUDINARY_CLOUD_NAME="stub",
+        CLOUDINARY_API_KEY="stub",
+        CLOUDINARY_API_SECRET="stub",
+        CLOUDINARY_UPLOAD_PREFIX=stubs.url,
+        GOOGLE_CALENDAR_ENDPOINT=stubs.url + "/",
+    )
+    import calendar_sync
+    import feedback_analytics
+    import google_calendar
+    import notifications
+    import uploads
+    from feedback_store import FeedbackStore
+
+    app = {"auth": auth, "calendar_sync": calendar_sync, "feedback_analytics": feedback_analytics,
+           "google_calendar": google_calendar, "notifications": notifications, "uploads": uploads}
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    data = seed(app, args.users, args.sessions_per_host, args.participants, args.rounds, rng)
+    print(f"seeded users={args.users} sessions={sum(map(len, data['hosted'].values()))} "
+          f"in {time.perf_counter() - start:.1f}s (stubs at {stubs.url})")
+
+    recorder = Recorder()
+    worker = notifications.NotificationWorker(notifications.outbox, api_key="SG.stub", host=stubs.url)
+    journeys = Journeys(app, recorder, data, FeedbackStore(feedback_dir), worker, args.seed)
+    auth.auth_executor.check_password(PASSWORD, bcrypt.hashpw(b"warm", bcrypt.gensalt(4)))
+    mix = parse_mix(args.mix)
+    serialize = not args.mongo_uri
+    if serialize:
+        print("mongomock backend: journeys run one at a time (pass --mongo-uri for real concurrency)")
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        recorder.__init__()
+        wall, counts, failed = run_level(journeys, mix, data["users"], concurrency, args.duration, serialize)
+        operations = recorder.report(wall)
+        levels.append({"concurrency": concurrency, "wall_s": wall, "journeys": counts,
+                       "failed_journeys": failed, "operations": operations})
+        print(f"\nconcurrency={concurrency} wall={wall:.1f}s journeys={sum(counts.values())} failed={failed}")
+        print(f"  {'operation':22} {'n':>6} {'err':>4} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, stats in operations.items():
+            print(f"  {name:22} {stats['n']:6d} {stats['errors']:4d} {stats['throughput_per_s']:8.1f} "
+                  f"{stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f}")
+            if "last_error" in stats:
+                print(f"  {'':22} last error: {stats['last_error']}")
+
+    results = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "git_commit": git_commit(),
+            "backend": "mongod" if args.mongo_uri else "mongomock",
+            "serialized": serialize,
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "mix": mix,
+        },
+        "levels": levels,
+        "stub_requests": stubs.requests,
+        "uploads": uploads.stats.snapshot(),
+        "notifications": {"sent": worker.sent, "failed": worker.failed},
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        compare(args.compare, levels)
+    auth.auth_executor.shutdown()
+    stubs.stop()
+
+
+if __name__ == "__main__":
+    main()
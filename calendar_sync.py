@@ -0,0 +1,205 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import streamlit as st
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
+
+from auth import db, sessions_collection
+from google_calendar import get_service, new_batch, token_store
+import tracing
+
+# Pushes finalized sessions into every attendee's Google Calendar.
+# Each attendee's event has a deterministic id derived from (session, user),
+# and what was last written is recorded in calendar_events, so re-running a
+# sync only touches attendees whose event is missing or out of date. Inserts
+# and patches for many attendees go out together in Calendar batch requests;
+# each part carries its own user's OAuth token.
+
+BATCH_SIZE = 50          # Calendar API recommends at most 50 calls per batch
+MAX_ATTEMPTS = 5
+RETRY_STATUSES = {403, 429, 500, 502, 503}
+TIMEZONE = st.secrets.get("CALENDAR_TIMEZONE", "UTC")
+
+synced_events = db["calendar_events"]
+
+
+def event_id_for(session_id, user_email):
+    # Calendar ids must be base32hex (0-9, a-v); a hex digest qualifies
+    return hashlib.sha1(f"{session_id}:{user_email}".encode("utf-8")).hexdigest()
+
+
+def event_body(session, slot):
+    start = datetime.fromisoformat(slot)
+    end = start + timedelta(minutes=session.get("duration", 60))
+    return {
+        "summary": f"📚 {session['title']}",
+        "description": session.get("description", ""),
+        "start": {"dateTime": start.isoformat(), "timeZone": TIMEZONE},
+        "end": {"dateTime": end.isoformat(), "timeZone": TIMEZONE},
+    }
+
+
+def sync_session(session_id, reconcile=False):
+    # reconcile=True also checks events already recorded as synced against
+    # Google, re-creating deleted ones and patching ones that were moved.
+    session = sessions_collection.find_one(
+        {"_id": session_id},
+        {"title": 1, "description": 1, "participants": 1, "host_email": 1,
+         "final_slot": 1, "duration": 1})
+    if not session or not session.get("final_slot"):
+        return None
+    slot = session["final_slot"]
+    attendees = list(dict.fromkeys([session["host_email"], *session.get("participants", [])]))
+    records = {r["user_email"]: r for r in synced_events.find({"session_id": session_id})}
+
+    report = {"inserted": 0, "patched": 0, "unchanged": 0, "skipped": [], "failed": {}}
+    credentials = token_store.load_many(attendees)
+    report["skipped"] = [email for email in attendees if email not in credentials]
+
+    pending = {}
+    for email in credentials:
+        record = records.get(email)
+        if record is None:
+            pending[email] = "insert"
+        elif record["slot"] != slot:
+            pending[email] = "patch"
+        elif reconcile:
+            pending[email] = "verify"
+        else:
+            report["unchanged"] += 1
+    if not pending:
+        return report
+
+    service = get_service(next(iter(credentials.values())))
+    body = event_body(session, slot)
+
+    for attempt in range(MAX_ATTEMPTS):
+        retry = {}
+        emails = list(pending)
+        for i in range(0, len(emails), BATCH_SIZE):
+            chunk = {email: pending[email] for email in emails[i:i + BATCH_SIZE]}
+            retry.update(_run_batch(service, session_id, slot, body, chunk, credentials, report))
+        if not retry:
+            break
+        pending = retry
+        time.sleep(min(2 ** attempt, 30))  # back off on rate limits / server errors
+    else:
+        for email, action in pending.items():
+            report["failed"].setdefault(email, f"gave up after {MAX_ATTEMPTS} attempts ({action})")
+    return report
+
+
+def _run_batch(service, session_id, slot, body, actions, credentials, report):
+    retry = {}
+    event_ids = {email: event_id_for(session_id, email) for email in actions}
+
+    def callback(email, response, exception):
+        action = actions[email]
+        if exception is None:
+            if action == "verify":
+                if response.get("status") == "cancelled" or not _same_start(response, body):
+                    retry[email] = "patch"
+                else:
+                    report["unchanged"] += 1
+                return
+            synced_events.update_one(
+                {"session_id": session_id, "user_email": email},
+                {"$set": {"event_id": event_ids[email], "slot": slot,
+                          "synced_at": datetime.utcnow()}},
+                upsert=True)
+            report["inserted" if action == "insert" else "patched"] += 1
+            return
+        status = exception.resp.status if isinstance(exception, HttpError) else None
+        if action == "insert" and status == 409:
+            retry[email] = "patch"       # event exists already (earlier partial run)
+        elif action in ("patch", "verify") and status in (404, 410):
+            retry[email] = "insert"      # user deleted the event
+        elif status in RETRY_STATUSES:
+            retry[email] = action
+        else:
+            report["failed"][email] = str(exception)
+
+    batch = new_batch(service)
+    for email, action in actions.items():
+        events = service.events()
+        if action == "insert":
+            request = events.insert(calendarId="primary", body={**body, "id": event_ids[email]})
+        elif action == "patch":
+            # patch also revives an event the user had deleted (status: cancelled)
+            request = events.patch(calendarId="primary", eventId=event_ids[email],
+                                   body={**body, "status": "confirmed"})
+        else:
+            request = events.get(calendarId="primary", eventId=event_ids[email])
+        request.http = AuthorizedHttp(credentials[email], http=build_http())
+        batch.add(request, callback=lambda _id, response, exception, email=email:
+                  callback(email, response, exception))
+    with tracing.span("google.events_batch"):
+        batch.execute()
+    return retry
+
+
+def _same_start(event, body):
+    actual = event.get("start", {}).get("dateTime")
+    if not actual:
+        return False
+    zone = ZoneInfo(event["start"].get("timeZone") or TIMEZONE)
+    expected = datetime.fromisoformat(body["start"]["dateTime"]).replace(tzinfo=ZoneInfo(TIMEZONE))
+    actual = datetime.fromisoformat(actual.replace("Z", "+00:00"))
+    if actual.tzinfo is None:
+        actual = actual.replace(tzinfo=zone)
+    return actual == expected
+
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="calendar-sync")
+_lock = threading.Lock()
+_running = {}   # session_id -> future of the job syncing it
+_pending = {}   # session_id -> reconcile flag of a request made while it ran
+
+
+def schedule(session_id, reconcile=False):
+    # Run the sync off the Streamlit script thread; one job per session at a
+    # time. A request that arrives mid-run (e.g. the host finalized again after
+    # the job read the old slot) makes that job sync once more when it ends.
+    with _lock:
+        future = _running.get(session_id)
+        if future is not None:
+            _pending[session_id] = _pending.get(session_id, False) or reconcile
+            return future
+        future = _executor.submit(_sync_until_current, session_id, reconcile)
+        _running[session_id] = future
+        return future
+
+
+def _sync_until_current(session_id, reconcile):
+    while True:
+        try:
+            report = sync_session(session_id, reconcile)
+        except Exception as e:
+            print(f"Calendar sync failed for session {session_id}: {e!r}")
+            report = None
+        with _lock:
+            if session_id not in _pending:
+                del _running[session_id]
+                return report
+            reconcile = _pending.pop(session_id)
+
+
+if __name__ == "__main__":
+    import argparse
+    from bson.objectid import ObjectId
+
+    parser = argparse.ArgumentParser(description="Push finalized sessions to attendees' calendars")
+    parser.add_argument("session_ids", nargs="*", help="session _ids (default: every finalized session)")
+    parser.add_argument("--reconcile", action="store_true", help="verify existing events against Google")
+    args = parser.parse_args()
+
+    session_ids = ([ObjectId(session_id) for session_id in args.session_ids] or
+                   [s["_id"] for s in sessions_collection.find({"final_slot": {"$ne": None}}, {"_id": 1})])
+    for session_id in session_ids:
+        print(session_id, sync_session(session_id, reconcile=args.reconcile))
@@ -1,15 +1,13 @@
 import streamlit as st
 import cloudinary
 import cloudinary.uploader
-from dotenv import load_dotenv
-import os
-
-# Load variables from .env file
-load_dotenv()
-
 cloudinary.config(
     cloud_name=st.secrets["CLOUDINARY_CLOUD_NAME"],
     api_key=st.secrets["CLOUDINARY_API_KEY"],
     api_secret=st.secrets["CLOUDINARY_API_SECRET"],
     secure=True
 )
+
+# Lets the uploader target a local fake endpoint instead of api.cloudinary.com
+if st.secrets.get("CLOUDINARY_UPLOAD_PREFIX"):
+    cloudinary.config(upload_prefix=st.secrets["CLOUDINARY_UPLOAD_PREFIX"])
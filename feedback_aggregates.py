@@ -0,0 +1,87 @@
+import json
+import os
+
+# Running aggregates over the feedback log. apply() folds in one entry in
+# O(1); the dashboard reads these instead of re-scanning every row.
+# Persisted as JSON next to the feedback segments and rebuildable from them.
+
+AGGREGATE_COLUMNS = ["session_id", "title", "duration", "rating"]
+
+
+class FeedbackAggregates:
+    def __init__(self):
+        self.rows = 0
+        self.sessions = {}       # session_id -> [rating_sum, rating_count]
+        self.topics = {}         # title -> count
+        self.duration_sum = 0
+        self.rating_counts = {}  # rating -> count
+
+    def apply(self, row):
+        self.rows += 1
+        totals = self.sessions.setdefault(row["session_id"], [0, 0])
+        totals[0] += row["rating"]
+        totals[1] += 1
+        self.topics[row["title"]] = self.topics.get(row["title"], 0) + 1
+        self.duration_sum += row["duration"]
+        self.rating_counts[row["rating"]] = self.rating_counts.get(row["rating"], 0) + 1
+
+    @classmethod
+    def from_frame(cls, frame):
+        aggregates = cls()
+        if frame.empty:
+            return aggregates
+        aggregates.rows = len(frame)
+        by_session = frame.groupby("session_id")["rating"].agg(["sum", "count"])
+        aggregates.sessions = {
+            session_id: [int(total), int(count)]
+            for session_id, total, count in by_session.itertuples()}
+        aggregates.topics = {title: int(n) for title, n in frame["title"].value_counts().items()}
+        aggregates.duration_sum = int(frame["duration"].sum())
+        aggregates.rating_counts = {int(r): int(n) for r, n in frame["rating"].value_counts().items()}
+        return aggregates
+
+    def average_ratings(self):
+        return {session_id: total / count for session_id, (total, count) in self.sessions.items()}
+
+    def topic_counts(self):
+        return dict(sorted(self.topics.items(), key=lambda item: (-item[1], item[0])))
+
+    def average_duration(self):
+        return self.duration_sum / self.rows if self.rows else None
+
+    def most_common_rating(self):
+        # Ties go to the lower rating, matching pandas Series.mode()[0]
+        if not self.rating_counts:
+            return None
+        return min(self.rating_counts, key=lambda rating: (-self.rating_counts[rating], rating))
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "sessions": self.sessions,
+            "topics": self.topics,
+            "duration_sum": self.duration_sum,
+            "rating_counts": {str(r): n for r, n in self.rating_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.rows = data["rows"]
+        aggregates.sessions = data["sessions"]
+        aggregates.topics = data["topics"]
+        aggregates.duration_sum = data["duration_sum"]
+        aggregates.rating_counts = {int(r): n for r, n in data["rating_counts"].items()}
+        return aggregates
+
+
+def save_aggregates(aggregates, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(aggregates.to_dict(), f)
+    os.replace(tmp_path, path)
+
+
+def load_aggregates(path):
+    with open(path, encoding="utf-8") as f:
+        return FeedbackAggregates.from_dict(json.load(f))
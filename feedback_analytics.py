@@ -0,0 +1,82 @@
+import pandas as pd
+
+# Windowed / trend analytics over the raw feedback entries. Everything works
+# on a compact typed frame (categoricals for the repeated strings, small ints
+# for rating and duration) with groupby/resample, never row-by-row Python.
+
+CATEGORY_COLUMNS = ["session_id", "title", "host_email"]
+DTYPES = {
+    "session_id": "category",
+    "title": "category",
+    "host_email": "category",
+    "duration": "int32",
+    "rating": "int8",
+}
+ANALYTICS_COLUMNS = ["session_id", "title", "host_email", "duration", "rating", "timestamp"]
+
+
+def to_typed_frame(frame):
+    frame = frame[[column for column in ANALYTICS_COLUMNS if column in frame.columns]]
+    frame = frame.astype({column: dtype for column, dtype in DTYPES.items() if column in frame.columns})
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    return frame
+
+
+def load_frame(store):
+    return to_typed_frame(store.read(ANALYTICS_COLUMNS))
+
+
+def read_feedback_csv(path):
+    # Typed load of a feedback.csv export (also accepts the old host-email header)
+    frame = pd.read_csv(path, dtype={**DTYPES, "host-email": "category"},
+                        usecols=lambda column: column != "comment", parse_dates=["timestamp"])
+    frame = frame.rename(columns={"host-email": "host_email"})
+    return to_typed_frame(frame)
+
+
+def in_window(frame, start=None, end=None):
+    mask = pd.Series(True, index=frame.index)
+    if start is not None:
+        mask &= frame["timestamp"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= frame["timestamp"] < pd.Timestamp(end)
+    return frame[mask]
+
+
+def _days(frame):
+    return frame["timestamp"].to_numpy().astype("datetime64[D]")
+
+
+def _week_starts(frame):
+    # Monday of each row's week; 1970-01-01 was a Thursday
+    days = _days(frame)
+    weekday = (days.view("int64") + 3) % 7
+    return pd.Series(days - weekday, index=frame.index, name="week")
+
+
+def weekly_host_ratings(frame):
+    # Average rating per host per calendar week (weeks start on Monday)
+    grouped = frame.groupby([_week_starts(frame), "host_email"], observed=True)["rating"]
+    return grouped.agg(["mean", "count"]).reset_index().rename(
+        columns={"mean": "average_rating", "count": "feedback_count"})
+
+
+def topic_trends(frame):
+    # Feedback count per topic per week, one column per topic
+    counts = frame.groupby([_week_starts(frame), "title"], observed=True).size()
+    return counts.unstack("title", fill_value=0)
+
+
+def rolling_average_rating(frame, window="28D"):
+    # Time-based rolling mean computed from daily sums/counts
+    days = pd.Series(_days(frame), index=frame.index, name="day")
+    daily = frame["rating"].astype("int32").groupby(days).agg(["sum", "count"])
+    daily = daily.asfreq("D", fill_value=0)
+    rolled = daily.rolling(window).sum()
+    return (rolled["sum"] / rolled["count"]).rename("average_rating")
+
+
+def rating_percentiles(frame, by="title", percentiles=(0.1, 0.5, 0.9)):
+    result = frame.groupby(by, observed=True)["rating"].quantile(list(percentiles)).unstack()
+    result.columns = [f"p{int(p * 100)}" for p in result.columns]
+    return result
@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from feedback_aggregates import (AGGREGATE_COLUMNS, FeedbackAggregates,
+                                 load_aggregates, save_aggregates)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Append-only feedback storage.
+# New entries go to a small JSON-lines write-ahead log under an exclusive file
+# lock. Once the log holds `segment_rows` entries it is rewritten as an
+# immutable Parquet segment; once there are more than `max_segments`
+# segments they are merged into one (also available as compact()). Readers
+# pull only the columns they ask for from the segments plus the log tail.
+# Running aggregates (feedback_aggregates.py) are updated under the same lock.
+
+SCHEMA = pa.schema([
+    ("session_id", pa.string()),
+    ("title", pa.string()),
+    ("host_email", pa.string()),
+    ("duration", pa.int64()),
+    ("rating", pa.int64()),
+    ("comment", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+])
+COLUMNS = SCHEMA.names
+
+# Header spellings seen in older feedback.csv files
+LEGACY_COLUMN_NAMES = {"host-email": "host_email"}
+
+
+@contextmanager
+def _file_lock(path):
+    with open(path, "a+b") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def normalize_entry(entry):
+    unknown = set(entry) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown feedback fields: {sorted(unknown)}")
+    if not entry.get("session_id"):
+        raise ValueError("Feedback needs a session_id")
+    rating = int(entry["rating"])
+    if not 1 <= rating <= 5:
+        raise ValueError("Rating must be between 1 and 5")
+    timestamp = entry.get("timestamp") or datetime.now()
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return {
+        "session_id": str(entry["session_id"]),
+        "title": str(entry.get("title") or ""),
+        "host_email": str(entry.get("host_email") or ""),
+        "duration": int(entry.get("duration") or 0),
+        "rating": rating,
+        "comment": str(entry.get("comment") or ""),
+        "timestamp": timestamp,
+    }
+
+
+class FeedbackStore:
+    def __init__(self, root="feedback_data", segment_rows=1000, max_segments=16, legacy_csv=None):
+        self.root = root
+        self.segment_rows = segment_rows
+        self.max_segments = max_segments
+        os.makedirs(root, exist_ok=True)
+        self._lock_path = os.path.join(root, ".lock")
+        self._log_path = os.path.join(root, "log.jsonl")
+        self._aggregates_path = os.path.join(root, "aggregates.json")
+        self._aggregates = None
+        self._aggregates_stamp = None
+        # (size, lines) of the log as this process last left it, so appends
+        # only recount it after another process has written to it
+        self._log_stamp = None
+        if legacy_csv:
+            self.import_legacy_csv(legacy_csv)
+
+    def append(self, entry):
+        row = normalize_entry(entry)
+        line = json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n"
+        with _file_lock(self._lock_path):
+            # Before the write, so a first-time rebuild does not count this row twice
+            aggregates = self._load_aggregates()
+            with open(self._log_path, "ab") as log:
+                size = log.tell()
+                # Terminate a torn line left by a crashed writer
+                if size and not self._log_ends_with_newline():
+                    line = "\n" + line
+                data = line.encode("utf-8")
+                log.write(data)
+                log.flush()
+                os.fsync(log.fileno())
+            lines = self._log_lines(size) + data.count(b"\n")
+            self._log_stamp = (size + len(data), lines)
+            aggregates.apply(row)
+            self._save_aggregates(aggregates)
+            if lines >= self.segment_rows:
+                self._write_segment(pa.Table.from_pylist(self._read_log(), schema=SCHEMA))
+                self._remove_log()
+                if len(self._segments()) > self.max_segments:
+                    self._compact()
+        return row
+
+    def read(self, columns=None):
+        with _file_lock(self._lock_path):
+            return self._read(columns)
+
+    def aggregates(self):
+        with _file_lock(self._lock_path):
+            return self._load_aggregates()
+
+    def rebuild_aggregates(self, dry_run=False):
+        # Recompute the running aggregates from the raw entries and report
+        # drift from the stored ones as {field: (stored, actual)}
+        with _file_lock(self._lock_path):
+            stored = (load_aggregates(self._aggregates_path).to_dict()
+                      if os.path.exists(self._aggregates_path) else None)
+            aggregates = FeedbackAggregates.from_frame(self._read(AGGREGATE_COLUMNS))
+            if not dry_run:
+                self._save_aggregates(aggregates)
+        actual = aggregates.to_dict()
+        drift = {}
+        for field, value in actual.items():
+            before = stored[field] if stored else None
+            if isinstance(value, dict):
+                before = before or {}
+                drift.update({f"{field}.{key}": (before.get(key), value.get(key))
+                              for key in set(before) | set(value)
+                              if before.get(key) != value.get(key)})
+            elif before != value:
+                drift[field] = (before, value)
+        return {"stored": stored is not None, "drift": drift}
+
+    def _read(self, columns=None):
+        columns = list(columns or COLUMNS)
+        tables = [pq.read_table(path, columns=columns) for path in self._segments()]
+        log_rows = self._read_log()
+        if log_rows:
+            tables.append(pa.Table.from_pylist(log_rows, schema=SCHEMA).select(columns))
+        if not tables:
+            return SCHEMA.empty_table().select(columns).to_pandas()
+        return pa.concat_tables(tables).to_pandas()
+
+    def compact(self):
+        # Merge every segment plus the pending log into a single segment
+        with _file_lock(self._lock_path):
+            return self._compact()
+
+    def _compact(self):
+        segments = self._segments()
+        tables = [pq.read_table(path) for path in segments]
+        log_rows = self._read_log()
+        if log_rows:
+            tables.append(pa.Table.from_pylist(log_rows, schema=SCHEMA))
+        if len(tables) <= 1 and not log_rows:
+            return len(segments)
+        self._write_segment(pa.concat_tables(tables))
+        for path in segments:
+            os.remove(path)
+        if log_rows:
+            self._remove_log()
+        return 1
+
+    def import_legacy_csv(self, path):
+        # One-time import of the old pandas-appended feedback.csv
+        marker = os.path.join(self.root, ".legacy_imported")
+        if not os.path.exists(path) or os.path.exists(marker):
+            return 0
+        with _file_lock(self._lock_path):
+            if os.path.exists(marker):
+                return 0
+            frame = pd.read_csv(path).rename(columns=LEGACY_COLUMN_NAMES)
+            frame = frame.astype(object).where(frame.notna(), None)
+            rows = [normalize_entry({key: row.get(key) for key in COLUMNS if key in row})
+                    for row in frame.to_dict("records")]
+            if rows:
+                aggregates = self._load_aggregates()
+                self._write_segment(pa.Table.from_pylist(rows, schema=SCHEMA))
+                for row in rows:
+                    aggregates.apply(row)
+                self._save_aggregates(aggregates)
+            open(marker, "w").close()
+        return len(rows)
+
+    def _load_aggregates(self):
+        # Caller holds the lock. Re-parse only if another process rewrote the file.
+        if not os.path.exists(self._aggregates_path):
+            aggregates = FeedbackAggregates.from_frame(self._read(AGGREGATE_COLUMNS))
+            self._save_aggregates(aggregates)
+            return aggregates
+        info = os.stat(self._aggregates_path)
+        stamp = (info.st_mtime_ns, info.st_size)
+        if stamp != self._aggregates_stamp:
+            self._aggregates = load_aggregates(self._aggregates_path)
+            self._aggregates_stamp = stamp
+        return self._aggregates
+
+    def _save_aggregates(self, aggregates):
+        save_aggregates(aggregates, self._aggregates_path)
+        info = os.stat(self._aggregates_path)
+        self._aggregates = aggregates
+        self._aggregates_stamp = (info.st_mtime_ns, info.st_size)
+
+    def _segments(self):
+        return sorted(
+            os.path.join(self.root, name) for name in os.listdir(self.root)
+            if name.startswith("segment-") and name.endswith(".parquet"))
+
+    def _write_segment(self, table):
+        # Segment names sort by creation time; os.replace makes them appear atomically
+        name = f"segment-{datetime.utcnow():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = os.path.join(self.root, f".{name}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(self.root, name))
+
+    def _log_lines(self, size):
+        # Lines in the first `size` bytes of the log
+        if self._log_stamp and self._log_stamp[0] == size:
+            return self._log_stamp[1]
+        if not size:
+            return 0
+        with open(self._log_path, "rb") as log:
+            return log.read(size).count(b"\n")
+
+    def _remove_log(self):
+        os.remove(self._log_path)
+        self._log_stamp = None
+
+    def _log_ends_with_newline(self):
+        with open(self._log_path, "rb") as log:
+            log.seek(-1, os.SEEK_END)
+            return log.read(1) == b"\n"
+
+    def _read_log(self):
+        if not os.path.exists(self._log_path):
+            return []
+        rows = []
+        with open(self._log_path, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crashed process
+                row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+                rows.append(row)
+        return rows
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root="feedback_data", **options):
+    # One store per directory per process, so the cached aggregates and log
+    # length survive Streamlit reruns
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = FeedbackStore(root, **options)
+        return store
@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urljoin
+
+import streamlit as st
+from cachetools import TTLCache
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from auth import db
+import tracing
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+# Days ahead of the last full sync that the event mirror keeps
+MIRROR_DAYS = 31
+
+# GOOGLE_CALENDAR_ENDPOINT points the client at a local fake Calendar API,
+# GOOGLE_TOKEN_URI the token refresh at a fake OAuth server
+_client_options = ({"api_endpoint": st.secrets["GOOGLE_CALENDAR_ENDPOINT"]}
+                   if st.secrets.get("GOOGLE_CALENDAR_ENDPOINT") else None)
+_token_uri = st.secrets.get("GOOGLE_TOKEN_URI")
+
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+
+def get_service(credentials):
+    # The discovery document is parsed once per process; building a service
+    # from the already-parsed dict skips the JSON load on every rerun.
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            _discovery_doc = json.loads(get_static_doc("calendar", "v3"))
+    return build_from_document(_discovery_doc, credentials=credentials,
+                               client_options=_client_options)
+
+
+def new_batch(service):
+    # The discovery batch path ignores api_endpoint overrides, so build it here
+    if _client_options:
+        return BatchHttpRequest(batch_uri=urljoin(_client_options["api_endpoint"], "batch/calendar/v3"))
+    return service.new_batch_http_request()
+
+
+class TokenStore:
+    # OAuth tokens per StudySync user, refreshed automatically when expired
+    def __init__(self, collection):
+        self.collection = collection
+
+    def save(self, user_email, credentials):
+        self.collection.replace_one(
+            {"_id": user_email},
+            {"_id": user_email, "token": json.loads(credentials.to_json()),
+             "updated_at": datetime.utcnow()},
+            upsert=True)
+
+    def load(self, user_email):
+        doc = self.collection.find_one({"_id": user_email})
+        if not doc:
+            return None
+        credentials = _credentials_from(doc)
+        if not credentials.valid and credentials.refresh_token:
+            try:
+                with tracing.span("google.token_refresh"):
+                    credentials.refresh(Request())
+            except RefreshError as e:
+                # Revoked or expired grant: forget it so the user is asked to
+                # authorize again
+                print(f"Calendar token refresh failed for {user_email}: {e}")
+                self.delete(user_email)
+                return None
+            self.save(user_email, credentials)
+        return credentials if credentials.valid else None
+
+    def load_many(self, user_emails):
+        # One query for every attendee of a session; users without a token are left out
+        found = {}
+        for doc in self.collection.find({"_id": {"$in": list(user_emails)}}):
+            credentials = _credentials_from(doc)
+            if not credentials.valid and credentials.refresh_token:
+                try:
+                    with tracing.span("google.token_refresh"):
+                        credentials.refresh(Request())
+                except Exception as e:
+                    print(f"Calendar token refresh failed for {doc['_id']}: {e}")
+                    continue
+                self.save(doc["_id"], credentials)
+            if credentials.valid:
+                found[doc["_id"]] = credentials
+        return found
+
+    def delete(self, user_email):
+        self.collection.delete_one({"_id": user_email})
+
+
+def _credentials_from(doc):
+    # from_authorized_user_info always sets Google's own token endpoint, and
+    # with_token_uri drops the expiry, so carry it over
+    credentials = Credentials.from_authorized_user_info(doc["token"], SCOPES)
+    if _token_uri:
+        overridden = credentials.with_token_uri(_token_uri)
+        overridden.expiry = credentials.expiry
+        return overridden
+    return credentials
+
+
+class _CalendarState:
+    def __init__(self, service, token):
+        self.service = service
+        self.token = token
+        self.events = {}
+        self.sync_token = None
+        self.synced_at = 0.0
+        self.horizon = None
+        self.lock = threading.Lock()
+
+
+class EventCache:
+    # Per-user mirror of the primary calendar. The first load is a full sync;
+    # after `ttl` seconds the next read asks Google only for what changed
+    # since the stored sync token. Upcoming-event queries are answered locally.
+    # Only events starting between now and MIRROR_DAYS after the full sync are
+    # kept; Google refuses timeMin/timeMax alongside sync tokens, so the full
+    # sync still pages through everything and the rest is dropped on arrival.
+    def __init__(self, ttl=60, maxsize=1000):
+        self.ttl = ttl
+        self._states = TTLCache(maxsize=maxsize, ttl=6 * 3600)
+        self._lock = threading.Lock()
+
+    def upcoming(self, user_email, credentials, days=7, limit=10):
+        state = self._state(user_email, credentials)
+        with state.lock:
+            now = datetime.now(timezone.utc)
+            later = now + timedelta(days=days)
+            if state.horizon is not None and later > state.horizon:
+                # Unchanged events past the horizon never arrive incrementally
+                state.sync_token = None
+            if state.sync_token is None or time.monotonic() - state.synced_at > self.ttl:
+                self._sync(state, max(later, now + timedelta(days=MIRROR_DAYS)))
+            window = [event for event in state.events.values()
+                      if now <= _start_of(event) < later]
+        return sorted(window, key=_start_of)[:limit]
+
+    def invalidate(self, user_email):
+        with self._lock:
+            self._states.pop(user_email, None)
+
+    def _state(self, user_email, credentials):
+        with self._lock:
+            state = self._states.get(user_email)
+            # Rebuild the service only when the access token was refreshed
+            if state is None or state.token != credentials.token:
+                state = _CalendarState(get_service(credentials), credentials.token)
+                self._states[user_email] = state
+            return state
+
+    def _sync(self, state, horizon):
+        now = datetime.now(timezone.utc)
+        try:
+            self._sync_pages(state, state.sync_token, now, horizon)
+        except HttpError as e:
+            if e.resp.status != 410 or state.sync_token is None:
+                raise
+            # Sync token expired: start over with a full sync
+            state.sync_token = None
+            self._sync_pages(state, None, now, horizon)
+        state.events = {id_: event for id_, event in state.events.items()
+                        if _start_of(event) >= now}
+        state.synced_at = time.monotonic()
+
+    def _sync_pages(self, state, sync_token, now, horizon):
+        if not sync_token:
+            state.events.clear()
+            state.horizon = horizon
+        page_token = None
+        while True:
+            params = {"calendarId": "primary", "singleEvents": True, "maxResults": 250}
+            if sync_token:
+                params["syncToken"] = sync_token
+            if page_token:
+                params["pageToken"] = page_token
+            with tracing.span("google.events_list"):
+                result = state.service.events().list(**params).execute()
+            for event in result.get("items", []):
+                if event.get("status") != "cancelled" and now <= _start_of(event) < state.horizon:
+                    state.events[event["id"]] = event
+                else:
+                    state.events.pop(event["id"], None)
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                state.sync_token = result.get("nextSyncToken")
+                return
+
+
+def _start_of(event):
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
+    if start_dt.tzinfo is None:  # all-day events
+        start_dt = start_dt.replace(tzinfo=timezone.utc)
+    return start_dt
+
+
+token_store = TokenStore(db["calendar_tokens"])
+event_cache = EventCache(ttl=float(st.secrets.get("CALENDAR_EVENTS_TTL", 60)))
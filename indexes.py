@@ -0,0 +1,87 @@
+from pymongo import ASCENDING, DESCENDING
+
+# Indexes the hot queries in auth.py depend on. create_index is a no-op when
+# an identical index already exists, so this is safe to run on every start.
+INDEXES = {
+    "sessions": [
+        ([("participants", ASCENDING)], {"name": "participants_1"}),
+        ([("host_email", ASCENDING)], {"name": "host_email_1"}),
+    ],
+    "resources": [
+        ([("session_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+         {"name": "session_id_1_timestamp_-1__id_-1"}),
+    ],
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_1", "unique": True}),
+    ],
+    "search_index": [
+        ([("session_id", ASCENDING), ("keys", ASCENDING)], {"name": "session_id_1_keys_1"}),
+    ],
+    "session_series": [
+        ([("participants", ASCENDING)], {"name": "participants_1"}),
+        ([("host_email", ASCENDING)], {"name": "host_email_1"}),
+    ],
+    "busy_intervals": [
+        ([("user_email", ASCENDING), ("start", ASCENDING)], {"name": "user_email_1_start_1"}),
+        ([("session_id", ASCENDING), ("user_email", ASCENDING)],
+         {"name": "session_id_1_user_email_1", "unique": True}),
+    ],
+    "calendar_events": [
+        ([("session_id", ASCENDING), ("user_email", ASCENDING)],
+         {"name": "session_id_1_user_email_1", "unique": True}),
+    ],
+    "notification_outbox": [
+        ([("session_id", ASCENDING), ("recipient", ASCENDING), ("final_slot", ASCENDING)],
+         {"name": "dedupe", "unique": True}),
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {"name": "due"}),
+    ],
+    # Shared rate-limit buckets; Mongo deletes them once they would be full again
+    "rate_limits": [
+        ([("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ],
+}
+
+# (collection, filter) pairs that must be served by an index
+HOT_QUERIES = [
+    ("sessions", {"participants": "probe@example.com"}),
+    ("sessions", {"host_email": "probe@example.com"}),
+    ("users", {"email": "probe@example.com"}),
+    ("resources", {"session_id": "probe"}),
+    ("search_index", {"session_id": "probe"}),
+]
+
+
+class QueryPlanError(Exception):
+    pass
+
+
+def ensure_indexes(db):
+    created = []
+    for collection_name, specs in INDEXES.items():
+        for keys, options in specs:
+            created.append(db[collection_name].create_index(keys, **options))
+    return created
+
+
+def verify_query_plans(db, queries=HOT_QUERIES):
+    # Raise if any hot query would fall back to a full collection scan
+    problems = []
+    for collection_name, query in queries:
+        plan = db[collection_name].find(query).explain()
+        winning = plan.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _stages(winning):
+            problems.append(f"{collection_name}.find({query}) uses COLLSCAN")
+    if problems:
+        raise QueryPlanError("; ".join(problems))
+
+
+def _stages(plan):
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    # Newer servers (SBE) nest the classic plan under queryPlan
+    if "queryPlan" in plan:
+        stages += _stages(plan["queryPlan"])
+    return stages
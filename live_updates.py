@@ -0,0 +1,202 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import streamlit as st
+from pymongo.errors import OperationFailure, PyMongoError
+
+from auth import db, sessions_collection, resources_collection, session_cache
+
+# Live vote tallies and new resources for the sessions someone has open.
+# One background thread per process follows the changes and keeps a small
+# in-memory state per watched session; the vote and resources pages read it
+# from a fragment that re-runs on a timer, so an idle tick costs no query and
+# only the live section re-renders.
+#
+# Change streams (replica set / Atlas) are used when available and resumed
+# from the last token after a dropped connection. Standalone servers and
+# mongomock fall back to polling by timestamp: sessions by updated_at and
+# resources by timestamp, each re-reading a short overlap and dropping repeats.
+
+WATCHED_FIELDS = ("vote_counts", "voter_count", "final_slot")
+POLL_OVERLAP = timedelta(seconds=2)  # tolerates clock skew between app servers
+MAX_NEW_RESOURCES = 50
+
+
+class LiveState:
+    __slots__ = ("votes_version", "resources_version", "vote_counts", "voter_count", "final_slot",
+                 "new_resources", "last_seen")
+
+    def __init__(self, doc):
+        # Bumped on every applied change; pages re-render a section when its version moves
+        self.votes_version = 0
+        self.resources_version = 0
+        self.vote_counts = dict(doc.get("vote_counts", {}))
+        self.voter_count = doc.get("voter_count", 0)
+        self.final_slot = doc.get("final_slot")
+        self.new_resources = []
+        self.last_seen = time.monotonic()
+
+
+class LiveFeed:
+    def __init__(self, poll_interval=1.0, idle_timeout=600):
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.mode = None  # "change_stream" or "polling"
+        self.events = 0
+        self.queries = 0
+        self._states = {}
+        self._lock = threading.Lock()
+        self._resume_token = None
+        self._polled_since = datetime.utcnow()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="live-updates", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, session_id):
+        # Called on every fragment run; also keeps the subscription alive
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is not None:
+                state.last_seen = time.monotonic()
+                return state
+        doc = sessions_collection.find_one({"_id": session_id}, {field: 1 for field in WATCHED_FIELDS}) or {}
+        self.queries += 1
+        with self._lock:
+            return self._states.setdefault(session_id, LiveState(doc))
+
+    def _run(self):
+        # mongomock's Database has no watch()
+        streams = callable(getattr(type(db), "watch", None))
+        while streams and not self._stop.is_set():
+            try:
+                self._follow_change_stream()
+            except OperationFailure as e:
+                if e.code == 286:  # resume point fell off the oplog; start fresh
+                    self._resume_token = None
+                    continue
+                # e.g. 40573 on a standalone mongod
+                print(f"Change streams unavailable, polling instead: {e}")
+                break
+            except PyMongoError as e:
+                print(f"Change stream interrupted, resuming: {e}")
+                self._stop.wait(self.poll_interval)
+        self.mode = "polling"
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except PyMongoError as e:
+                print(f"Live update poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _follow_change_stream(self):
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": sessions_collection.name, "operationType": {"$in": ["update", "replace"]}},
+            {"ns.coll": resources_collection.name, "operationType": "insert"},
+        ]}}]
+        with db.watch(pipeline, resume_after=self._resume_token, max_await_time_ms=1000) as stream:
+            self.mode = "change_stream"
+            while not self._stop.is_set():
+                change = stream.try_next()
+                self._resume_token = stream.resume_token
+                if change is not None:
+                    self._apply_change(change)
+                else:
+                    self._expire_idle()
+
+    def _apply_change(self, change):
+        if change["ns"]["coll"] == resources_collection.name:
+            self._add_resources([change["fullDocument"]])
+            return
+        session_id = change["documentKey"]["_id"]
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                return
+            if change["operationType"] == "replace":
+                fields = {f: change["fullDocument"].get(f) for f in WATCHED_FIELDS}
+            else:
+                fields = change["updateDescription"]["updatedFields"]
+            touched = False
+            for path, value in fields.items():
+                if path.startswith("vote_counts."):
+                    state.vote_counts[path.split(".", 1)[1]] = value
+                elif path == "vote_counts":
+                    state.vote_counts = dict(value or {})
+                elif path in ("voter_count", "final_slot"):
+                    setattr(state, path, value)
+                else:
+                    continue
+                touched = True
+            if touched:
+                state.votes_version += 1
+                self.events += 1
+        if touched:
+            # Writes from other app servers also refresh this process's cache
+            session_cache.invalidate_session(session_id)
+
+    def poll_once(self):
+        self._expire_idle()
+        with self._lock:
+            watched = list(self._states)
+        if not watched:
+            return
+        since = self._polled_since - POLL_OVERLAP
+        self._polled_since = datetime.utcnow()
+
+        changed = sessions_collection.find(
+            {"_id": {"$in": watched}, "updated_at": {"$gt": since}},
+            {field: 1 for field in WATCHED_FIELDS})
+        for doc in changed:
+            with self._lock:
+                state = self._states.get(doc["_id"])
+                if state is None:
+                    continue
+                snapshot = (dict(doc.get("vote_counts", {})), doc.get("voter_count", 0), doc.get("final_slot"))
+                if snapshot == (state.vote_counts, state.voter_count, state.final_slot):
+                    continue  # already applied during the overlap window
+                state.vote_counts, state.voter_count, state.final_slot = snapshot
+                state.votes_version += 1
+                self.events += 1
+            session_cache.invalidate_session(doc["_id"])
+
+        self._add_resources(resources_collection.find(
+            {"session_id": {"$in": watched}, "timestamp": {"$gt": since}}).sort("timestamp", 1))
+        self.queries += 2
+
+    def _add_resources(self, resources):
+        for resource in resources:
+            with self._lock:
+                state = self._states.get(resource["session_id"])
+                if state is None or any(r["_id"] == resource["_id"] for r in state.new_resources):
+                    continue
+                state.new_resources = ([resource] + state.new_resources)[:MAX_NEW_RESOURCES]
+                state.resources_version += 1
+                self.events += 1
+
+    def _expire_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for session_id in [s for s, state in self._states.items() if state.last_seen < cutoff]:
+                del self._states[session_id]
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed():
+    # One feed per process, shared by all Streamlit sessions
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = LiveFeed(poll_interval=float(st.secrets.get("LIVE_POLL_SECONDS", 1)))
+            _feed.start()
+        return _feed
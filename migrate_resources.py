@@ -0,0 +1,35 @@
+import argparse
+from pymongo import UpdateOne
+from auth import sessions_collection, resources_collection
+
+# One-shot move of resources embedded in session documents into the
+# resources collection. Safe to re-run: copies are upserted on
+# (session_id, uploader, timestamp) and only the copied entries are pulled.
+#   python migrate_resources.py [--dry-run]
+
+parser = argparse.ArgumentParser(description="Move embedded session resources to their own collection")
+parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+args = parser.parse_args()
+
+sessions_moved = 0
+resources_moved = 0
+for session in sessions_collection.find({"resources.0": {"$exists": True}}, {"resources": 1}):
+    embedded = session["resources"]
+    sessions_moved += 1
+    resources_moved += len(embedded)
+    if args.dry_run:
+        continue
+
+    resources_collection.bulk_write([
+        UpdateOne(
+            {"session_id": session["_id"], "uploader": r["uploader"], "timestamp": r["timestamp"]},
+            {"$setOnInsert": {**r, "session_id": session["_id"]}},
+            upsert=True)
+        for r in embedded
+    ], ordered=False)
+    sessions_collection.update_one({"_id": session["_id"]}, {"$pullAll": {"resources": embedded}})
+    sessions_collection.update_one({"_id": session["_id"], "resources": {"$size": 0}},
+                                   {"$unset": {"resources": ""}})
+
+action = "would move" if args.dry_run else "moved"
+print(f"{action} {resources_moved} resource(s) from {sessions_moved} session(s)")
@@ -0,0 +1,213 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+import tracing
+
+# One tuned MongoClient per process. auth.py is imported once, so every
+# Streamlit session shares this client and its connection pool. Pool and
+# command listeners keep running counters for the health probe / admin views.
+#
+# MONGO_URI = "mongomock://" swaps in an in-memory mongomock client for local
+# runs and benchmarks; pool settings and listeners do not apply to it.
+
+load_dotenv()  # once per process, for local .env setups
+
+DEFAULTS = {
+    "MONGO_MAX_POOL_SIZE": 50,
+    "MONGO_MIN_POOL_SIZE": 0,
+    "MONGO_MAX_IDLE_MS": 60000,
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": 5000,
+    "MONGO_CONNECT_TIMEOUT_MS": 5000,
+    "MONGO_SOCKET_TIMEOUT_MS": 20000,
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": 10000,
+}
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self, window=1024):
+        self._lock = threading.Lock()
+        self._commands = {}
+        self._recent = deque(maxlen=window)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.command_name, event.duration_micros / 1000, failed=False)
+
+    def failed(self, event):
+        self._record(event.command_name, event.duration_micros / 1000, failed=True)
+
+    def _record(self, name, ms, failed):
+        with self._lock:
+            stats = self._commands.setdefault(name, {"count": 0, "failed": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["failed"] += failed
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            self._recent.append(ms)
+        tracing.record("mongo." + name, ms / 1000, failed)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            commands = {name: dict(stats, mean_ms=stats["total_ms"] / stats["count"])
+                        for name, stats in self._commands.items()}
+
+        def pct(p):
+            return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] if recent else 0.0
+        return {"commands": commands, "p50_ms": pct(50), "p99_ms": pct(99)}
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.max_checkout_ms = 0.0
+        self.cleared = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_checked_out(self, event):
+        self._add(checked_out=1, checkouts=1)
+        duration = getattr(event, "duration", None)  # pymongo >= 4.7
+        if duration is not None:
+            with self._lock:
+                self.max_checkout_ms = max(self.max_checkout_ms, duration * 1000)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def connection_check_out_failed(self, event):
+        self._add(checkout_failures=1)
+
+    def pool_cleared(self, event):
+        self._add(cleared=1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "max_checkout_ms": self.max_checkout_ms,
+                "cleared": self.cleared,
+            }
+
+
+command_metrics = CommandMetrics()
+pool_metrics = PoolMetrics()
+_client = None
+_client_lock = threading.Lock()
+
+
+def _setting(name):
+    return int(st.secrets.get(name, DEFAULTS[name]))
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            uri = st.secrets["MONGO_URI"]
+            if uri.startswith("mongomock://"):
+                import mongomock
+                _patch_mongomock(mongomock)
+                _client = mongomock.MongoClient()
+            else:
+                _client = MongoClient(
+                    uri,
+                    appname="studysync",
+                    maxPoolSize=_setting("MONGO_MAX_POOL_SIZE"),
+                    minPoolSize=_setting("MONGO_MIN_POOL_SIZE"),
+                    maxIdleTimeMS=_setting("MONGO_MAX_IDLE_MS"),
+                    serverSelectionTimeoutMS=_setting("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+                    connectTimeoutMS=_setting("MONGO_CONNECT_TIMEOUT_MS"),
+                    socketTimeoutMS=_setting("MONGO_SOCKET_TIMEOUT_MS"),
+                    waitQueueTimeoutMS=_setting("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+                    retryWrites=True,
+                    retryReads=True,
+                    event_listeners=[command_metrics, pool_metrics],
+                )
+            atexit.register(close)
+        return _client
+
+
+def _patch_mongomock(mongomock):
+    # mongomock 4.3 predates the `sort` argument pymongo >= 4.9 passes to its
+    # bulk builders, so bulk_write fails with a TypeError without this
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(builder, name)
+        if getattr(original, "drops_sort", False):
+            continue
+
+        def drop_sort(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+        drop_sort.drops_sort = True
+        setattr(builder, name, drop_sort)
+
+
+def listing_read_preference():
+    # Session pickers tolerate slightly stale data. The default still reads
+    # from the primary so a freshly created session shows up right away;
+    # "secondaryPreferred" offloads them to replicas at the cost of replica lag.
+    mode = read_pref_mode_from_name(st.secrets.get("MONGO_LISTING_READ_PREFERENCE", "primaryPreferred"))
+    max_staleness = int(st.secrets.get("MONGO_LISTING_MAX_STALENESS_S", -1))
+    return make_read_preference(mode, None, max_staleness)
+
+
+def health():
+    # Round trip to the server; used by the admin page and `python mongo.py`
+    start = time.perf_counter()
+    try:
+        get_client().admin.command("ping")
+        error = None
+    except Exception as e:
+        error = str(e)
+    return {
+        "ok": error is None,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "error": error,
+        "pool": pool_metrics.snapshot(),
+        "commands": command_metrics.snapshot(),
+    }
+
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(health(), indent=2))
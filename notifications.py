@@ -0,0 +1,284 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import streamlit as st
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from auth import db, series_collection, expand_occurrences
+import startup_profile
+import tracing
+
+# Confirmation emails go through a persistent outbox in Mongo instead of being
+# sent inline. One job per (session, recipient, slot): re-finalizing the same
+# slot never emails anyone twice. A background worker claims due jobs, groups
+# them per session and sends each group as one SendGrid call with one
+# personalization per recipient, retrying failures with exponential backoff.
+#
+# The worker also enqueues reminders for upcoming occurrences of recurring
+# series, using the same lazy expansion as the calendar and conflict checks.
+# Bulk-imported sessions queue their invitations here too (final_slot None).
+#
+# Run standalone (e.g. as a separate container) with:  python notifications.py
+
+FROM_EMAIL = "shubhamgupta94181@gmail.com"
+TEMPLATES = {
+    "confirmation": ("✅ Study Session Confirmed!", """
+<p>Hi -name-,</p>
+<p>The study session <strong>{title}</strong> has been confirmed at:</p>
+<h3>{final_slot}</h3>
+<p>Thanks,<br>StudySync Team</p>
+"""),
+    "invitation": ("📚 You're Invited to a Study Session", """
+<p>Hi -name-,</p>
+<p>You have been invited to the study session <strong>{title}</strong>.</p>
+<p>Open StudySync to propose times before <strong>{deadline}</strong>.</p>
+<p>Thanks,<br>StudySync Team</p>
+"""),
+    "reminder": ("⏰ Study Session Reminder", """
+<p>Hi -name-,</p>
+<p>Reminder: your recurring study session <strong>{title}</strong> is coming up at:</p>
+<h3>{final_slot}</h3>
+<p>Thanks,<br>StudySync Team</p>
+"""),
+}
+MAX_PERSONALIZATIONS = 1000  # SendGrid limit per request
+REMINDER_LEAD = timedelta(hours=24)
+REMINDER_SCAN_SECONDS = 900
+
+outbox = db["notification_outbox"]
+
+
+def enqueue_confirmations(session, final_slot):
+    return _enqueue("confirmation", session["_id"], session["title"], final_slot,
+                    session["participants"])
+
+
+def enqueue_invitations(sessions):
+    # All invitations for a batch of new sessions in one unordered insert;
+    # the sessions are new, so no upsert is needed to dedupe
+    now = datetime.utcnow()
+    jobs = [
+        {"session_id": session["_id"], "recipient": email, "final_slot": None,
+         "kind": "invitation", "title": session["title"], "deadline": session.get("propose_deadline"),
+         "status": "pending", "attempts": 0, "next_attempt_at": now, "created_at": now}
+        for session in sessions
+        for email in dict.fromkeys(session["participants"])
+    ]
+    if not jobs:
+        return 0
+    try:
+        return len(outbox.insert_many(jobs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+
+def enqueue_series_reminders(now=None, lead=REMINDER_LEAD):
+    # Occurrences starting within `lead` of now; already-queued ones are no-ops
+    now = now or datetime.now()
+    series = series_collection.find({
+        "rule.dtstart": {"$lt": now + lead},
+        "$or": [{"rule.last_start": None}, {"rule.last_start": {"$gte": now}}],
+    })
+    queued = 0
+    for occurrence in expand_occurrences(series, now, now + lead):
+        queued += _enqueue("reminder", occurrence["series_id"], occurrence["title"],
+                           occurrence["start"].isoformat(), occurrence["attendees"])
+    return queued
+
+
+def _enqueue(kind, session_id, title, final_slot, recipients):
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"session_id": session_id, "recipient": email, "final_slot": final_slot},
+            {"$setOnInsert": {
+                "kind": kind,
+                "title": title,
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }},
+            upsert=True)
+        for email in dict.fromkeys(recipients)
+    ]
+    if not ops:
+        return 0
+    try:
+        return outbox.bulk_write(ops, ordered=False).upserted_count
+    except BulkWriteError as e:
+        # Duplicate keys just mean another replica enqueued the same job
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        return e.details["nUpserted"]
+
+
+class NotificationWorker:
+    def __init__(self, collection, api_key, host=None, concurrency=4, batch_size=500,
+                 max_attempts=6, base_delay=5.0, lease_seconds=120, poll_interval=2.0):
+        self.collection = collection
+        self.api_key = api_key
+        self.host = host or "https://api.sendgrid.com"
+        self._client = None
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.sent = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reminders_scanned_at = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="notification-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        self._wake.set()
+
+    def run_once(self):
+        jobs = self._claim()
+        groups = {}
+        for job in jobs:
+            key = (job.get("kind", "confirmation"), job["session_id"], job["final_slot"])
+            groups.setdefault(key, []).append(job)
+        batches = [group[i:i + MAX_PERSONALIZATIONS]
+                   for group in groups.values()
+                   for i in range(0, len(group), MAX_PERSONALIZATIONS)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self._send_batch, batches))
+        return len(jobs)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._reminders_scanned_at > REMINDER_SCAN_SECONDS:
+                    self._reminders_scanned_at = time.monotonic()
+                    enqueue_series_reminders()
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"Notification worker error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claim(self):
+        # Pending jobs that are due, plus "sending" jobs whose lease expired
+        # (the worker that claimed them died mid-send). Three round trips per
+        # batch: pick candidates, claim the ones still due under a fresh
+        # lease_id, read back what this worker won.
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "lease_until": {"$lte": now}},
+        ]}
+        ids = [job["_id"] for job in self.collection.find(due, {"_id": 1})
+               .sort("next_attempt_at", 1).limit(self.batch_size)]
+        if not ids:
+            return []
+        lease_id = uuid.uuid4().hex
+        self.collection.update_many(
+            {"$and": [{"_id": {"$in": ids}}, due]},
+            {"$set": {"status": "sending", "lease_id": lease_id,
+                      "lease_until": now + timedelta(seconds=self.lease_seconds)}})
+        return list(self.collection.find({"_id": {"$in": ids}, "lease_id": lease_id}))
+
+    @property
+    def client(self):
+        # The SendGrid SDK is only loaded once there is something to send
+        if self._client is None:
+            with startup_profile.section("init:sendgrid"):
+                import sendgrid
+                self._client = sendgrid.SendGridAPIClient(api_key=self.api_key, host=self.host)
+        return self._client
+
+    def _send_batch(self, jobs):
+        from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+
+        first = jobs[0]
+        subject, template = TEMPLATES[first.get("kind", "confirmation")]
+        message = Mail(from_email=FROM_EMAIL, subject=subject,
+                       html_content=template.format(title=first["title"], final_slot=first["final_slot"],
+                                                    deadline=first.get("deadline")))
+        for job in jobs:
+            personalization = Personalization()
+            personalization.add_to(To(job["recipient"]))
+            personalization.add_substitution(Substitution("-name-", job["recipient"].split("@")[0].title()))
+            message.add_personalization(personalization)
+
+        ids = [job["_id"] for job in jobs]
+        try:
+            with tracing.span("sendgrid.send"):
+                response = self.client.send(message)
+            status = response.status_code
+            error = None if 200 <= status < 300 else f"HTTP {status}"
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            error = str(e)
+
+        if error is None:
+            self.collection.update_many(
+                {"_id": {"$in": ids}},
+                {"$set": {"status": "sent", "sent_at": datetime.utcnow()}, "$unset": {"lease_id": "", "lease_until": ""}})
+            self.sent += len(jobs)
+            return
+
+        # 4xx other than 429 will not succeed on retry
+        permanent = status is not None and 400 <= status < 500 and status != 429
+        attempts = first.get("attempts", 0) + 1
+        if permanent or attempts >= self.max_attempts:
+            self.collection.update_many(
+                {"_id": {"$in": ids}},
+                {"$set": {"status": "failed", "last_error": error}, "$inc": {"attempts": 1},
+                 "$unset": {"lease_id": "", "lease_until": ""}})
+            self.failed += len(jobs)
+            print(f"SendGrid error for session {first['session_id']}: {error}")
+            return
+
+        delay = self.base_delay * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+        self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"status": "pending", "last_error": error,
+                      "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)},
+             "$inc": {"attempts": 1}, "$unset": {"lease_id": "", "lease_until": ""}})
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    # One worker thread per process, shared by all Streamlit sessions
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = NotificationWorker(
+                outbox,
+                api_key=st.secrets["SENDGRID_API_KEY"],
+                host=st.secrets.get("SENDGRID_API_HOST"),
+                concurrency=int(st.secrets.get("NOTIFICATION_CONCURRENCY", 4)))
+            _worker.start()
+        return _worker
+
+
+if __name__ == "__main__":
+    worker = get_worker()
+    while True:
+        time.sleep(60)
+        print(f"sent={worker.sent} failed={worker.failed}")
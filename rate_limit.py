@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+
+from cachetools import TTLCache
+from prometheus_client import Counter
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from tracing import registry
+
+# Token-bucket throttling for the login and registration paths, so a burst
+# of attempts is turned away before it reaches Mongo or bcrypt.
+# Every key (an email, a client address) has a bucket holding up to `burst`
+# tokens that refills at `per_minute` tokens a minute; an attempt spends one
+# token and is rejected while the bucket is empty.
+#
+# Buckets live in this process by default. Given a Mongo collection they are
+# kept there instead (one document per key, updated atomically with the
+# server's clock), so the limits hold across replicas. If Mongo cannot be
+# reached the in-process buckets take over until it is back.
+
+_rejected = Counter("studysync_rate_limited", "Attempts rejected by a rate limiter",
+                    ["limiter"], registry=registry)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many attempts, try again in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    def __init__(self, name, burst, per_minute, collection=None, maxsize=100000):
+        self.name = name
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+        self.collection = collection
+        # An idle bucket is full again after this long, so it can be forgotten
+        self.ttl = self.burst / self.rate
+        self._buckets = TTLCache(maxsize=maxsize, ttl=self.ttl)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.backend_errors = 0
+
+    def acquire(self, key, cost=1.0):
+        # Raises RateLimited when the bucket for `key` is empty
+        wait = None
+        if self.collection is not None:
+            try:
+                wait = self._acquire_shared(key, cost)
+            except PyMongoError as e:
+                self.backend_errors += 1
+                print(f"Rate limiter {self.name} falling back to memory: {e}")
+        if wait is None:
+            wait = self._acquire_local(key, cost)
+        if wait:
+            self.rejected += 1
+            _rejected.labels(self.name).inc()
+            raise RateLimited(wait)
+        self.allowed += 1
+
+    def refund(self, key, cost=1.0):
+        # Gives back a token, e.g. after a successful login
+        if self.collection is not None:
+            try:
+                self.collection.update_one(
+                    {"_id": f"{self.name}:{key}"},
+                    [{"$set": {"tokens": {"$min": [self.burst, {"$add": ["$tokens", cost]}]}}}])
+                return
+            except PyMongoError:
+                self.backend_errors += 1
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                self._buckets[key] = (min(self.burst, entry[0] + cost), entry[1])
+
+    def stats(self):
+        return {
+            "backend": "mongo" if self.collection is not None else "memory",
+            "burst": self.burst,
+            "per_minute": self.rate * 60,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "backend_errors": self.backend_errors,
+            "local_keys": len(self._buckets),
+        }
+
+    def _acquire_local(self, key, cost):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+        return (cost - tokens) / self.rate
+
+    def _acquire_shared(self, key, cost):
+        # Refill, spend and report in one atomic update; $$NOW keeps replicas
+        # with skewed clocks consistent
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [self.burst,
+                             {"$add": [{"$ifNull": ["$tokens", self.burst]}, {"$multiply": [elapsed, self.rate]}]}]}
+        doc = self.collection.find_one_and_update(
+            {"_id": f"{self.name}:{key}"},
+            [{"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+             {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+             {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                       "expires_at": {"$add": ["$$NOW", int(self.ttl * 1000)]}}}],
+            upsert=True, return_document=ReturnDocument.AFTER)
+        if doc["allowed"]:
+            return 0.0
+        return (cost - doc["tokens"]) / self.rate
@@ -0,0 +1,25 @@
+import argparse
+import os
+from feedback_store import FeedbackStore
+
+# Recompute the running feedback aggregates from the stored entries.
+#   python rebuild_feedback_aggregates.py                   # default feedback_data/
+#   python rebuild_feedback_aggregates.py --dir <FEEDBACK_DIR>
+#   python rebuild_feedback_aggregates.py --dry-run         # only report drift
+
+parser = argparse.ArgumentParser(description="Rebuild StudySync feedback aggregates")
+parser.add_argument("--dir", default="feedback_data", help="feedback store directory (FEEDBACK_DIR)")
+parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+args = parser.parse_args()
+
+if not os.path.isdir(args.dir):
+    raise SystemExit(f"{args.dir}: no feedback store here")
+
+report = FeedbackStore(args.dir).rebuild_aggregates(dry_run=args.dry_run)
+if not report["stored"]:
+    print("no stored aggregates.json")
+for field, (stored, actual) in sorted(report["drift"].items()):
+    print(f"    {field}: {stored} -> {actual}")
+
+action = "found" if args.dry_run else "repaired"
+print(f"{len(report['drift'])} drifted value(s) {action}")
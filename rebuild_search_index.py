@@ -0,0 +1,36 @@
+import argparse
+from bson.objectid import ObjectId
+from auth import sessions_collection, resources_collection, search_index
+
+# Backfill or repair the search index from sessions and resources.
+#   python rebuild_search_index.py                 # every session
+#   python rebuild_search_index.py --session <id>  # one session
+
+parser = argparse.ArgumentParser(description="Rebuild the StudySync search index")
+parser.add_argument("--session", action="append", help="session _id (repeatable)")
+parser.add_argument("--batch-size", type=int, default=500, help="sessions per round trip")
+args = parser.parse_args()
+
+
+def index_batch(sessions):
+    resources = {}
+    for r in resources_collection.find({"session_id": {"$in": [s["_id"] for s in sessions]}},
+                                       {"session_id": 1, "filename": 1, "file_url": 1, "link": 1}):
+        resources.setdefault(r["session_id"], []).append(r)
+    search_index.rebuild(sessions, resources)
+
+
+query = {"_id": {"$in": [ObjectId(s) for s in args.session]}} if args.session else {}
+indexed = 0
+batch = []
+for session in sessions_collection.find(query, {"title": 1, "description": 1}).batch_size(args.batch_size):
+    batch.append(session)
+    if len(batch) == args.batch_size:
+        index_batch(batch)
+        indexed += len(batch)
+        batch = []
+if batch:
+    index_batch(batch)
+    indexed += len(batch)
+
+print(f"{indexed} session(s) indexed")
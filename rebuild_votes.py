@@ -0,0 +1,34 @@
+import argparse
+from bson.objectid import ObjectId
+from auth import sessions_collection, rebuild_vote_counters
+
+# Recompute the materialized vote counters from proposed_slots.
+#   python rebuild_votes.py                 # every session
+#   python rebuild_votes.py --session <id>  # one session
+#   python rebuild_votes.py --dry-run       # only report drift
+
+parser = argparse.ArgumentParser(description="Rebuild StudySync vote counters")
+parser.add_argument("--session", action="append", help="session _id (repeatable)")
+parser.add_argument("--dry-run", action="store_true", help="report drift without writing")
+args = parser.parse_args()
+
+if args.session:
+    session_ids = [ObjectId(session_id) for session_id in args.session]
+else:
+    session_ids = [s["_id"] for s in sessions_collection.find({}, {"_id": 1})]
+
+drifted = 0
+for session_id in session_ids:
+    report = rebuild_vote_counters(session_id, dry_run=args.dry_run)
+    if report is None:
+        print(f"{session_id}: not found")
+        continue
+    stored_voters, actual_voters = report["voter_count"]
+    if report["drift"] or stored_voters != actual_voters:
+        drifted += 1
+        print(f"{session_id}: voters {stored_voters} -> {actual_voters}")
+        for slot, (stored, actual) in sorted(report["drift"].items()):
+            print(f"    {slot}: {stored} -> {actual}")
+
+action = "found" if args.dry_run else "repaired"
+print(f"{len(session_ids)} session(s) checked, drift {action} in {drifted}")
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+# Weekly / biweekly recurrence rules, stored once per series and expanded
+# lazily. occurrences() jumps straight to the requested window with date
+# arithmetic, so expanding next week of a series that has run for years
+# costs the same as for a brand-new one.
+#
+# rule = {"freq": "WEEKLY", "interval": 1 or 2, "byday": [0..6] (Mon=0),
+#         "dtstart": datetime, "until": datetime or None, "count": int or None,
+#         "duration": minutes}
+
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+
+def occurrences(rule, window_start, window_end, exdates=()):
+    # Yields occurrence start times in [window_start, window_end), oldest first.
+    # EXDATEs are skipped but still count towards COUNT, as in RFC 5545.
+    dtstart = rule["dtstart"]
+    interval = rule.get("interval", 1)
+    days = sorted(rule.get("byday") or [dtstart.weekday()])
+    until = rule.get("until")
+    count = rule.get("count")
+    exdates = set(exdates)
+
+    anchor = dtstart.date() - timedelta(days=dtstart.weekday())  # Monday of week 0
+    time_of_day = dtstart.time()
+    skipped_in_first_week = sum(1 for d in days if d < dtstart.weekday())
+
+    lower = max(window_start, dtstart)
+    week = max(0, (lower.date() - anchor).days // 7)
+    week -= week % interval
+
+    while True:
+        period = week // interval
+        for position, day in enumerate(days):
+            start = datetime.combine(anchor + timedelta(weeks=week, days=day), time_of_day)
+            if start < dtstart:
+                continue
+            index = period * len(days) + position - skipped_in_first_week
+            if count is not None and index >= count:
+                return
+            if until is not None and start > until:
+                return
+            if start >= window_end:
+                return
+            if start >= window_start and start not in exdates:
+                yield start
+        week += interval
+
+
+def last_occurrence_bound(rule):
+    # Latest possible start, for range queries; None means open-ended
+    if rule.get("until"):
+        return rule["until"]
+    if rule.get("count"):
+        periods = (rule["count"] + len(rule["byday"])) // len(rule["byday"]) + 1
+        return rule["dtstart"] + timedelta(weeks=periods * rule.get("interval", 1))
+    return None
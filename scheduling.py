@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+# Turns slot proposals into availability intervals and finds the session
+# windows that the most participants can attend in full.
+#
+# A proposal "user U can start at T" is read as U being free during
+# [T - flexibility, T + duration + flexibility). U can attend a window
+# starting at s iff s lies in [a, b - duration] for one of U's merged
+# intervals [a, b). A sweep over those feasible-start intervals gives the
+# coverage of every start time in O(P log P) for P proposals.
+
+
+def availability_intervals(ballots, duration, flexibility=timedelta(minutes=15)):
+    # ballots: {user: [iso slot, ...]} -> {user: [(start, end), ...]} merged and sorted
+    intervals = {}
+    for user, slots in ballots.items():
+        spans = sorted(
+            (start - flexibility, start + duration + flexibility)
+            for start in (datetime.fromisoformat(slot) for slot in slots))
+        merged = []
+        for start, end in spans:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        if merged:
+            intervals[user] = merged
+    return intervals
+
+
+def best_windows(intervals, duration, top_k=3, granularity=timedelta(minutes=5)):
+    # Ranked non-overlapping windows: most participants first, then earliest
+    events = []
+    for spans in intervals.values():
+        for start, end in spans:
+            latest_start = end - duration
+            if latest_start >= start:
+                events.append((start, 0))         # feasible starts open
+                events.append((latest_start, 1))  # ... and close (inclusive)
+    events.sort()
+
+    # (coverage, first_start, last_start) for every stretch of equal coverage
+    segments = []
+    coverage = 0
+    i = 0
+    while i < len(events):
+        time = events[i][0]
+        closes = 0
+        while i < len(events) and events[i][0] == time:
+            if events[i][1] == 0:
+                coverage += 1
+            else:
+                closes += 1
+            i += 1
+        next_time = events[i][0] if i < len(events) else time
+        if closes:
+            segments.append((coverage, time, time))  # intervals ending here still count at `time`
+        coverage -= closes
+        if coverage and next_time > time:
+            segments.append((coverage, time, next_time))
+
+    segments.sort(key=lambda segment: (-segment[0], segment[1]))
+    windows = []
+    for _, first_start, last_start in segments:
+        # Centre the window in the stretch to leave slack on both sides
+        start = _round(first_start + (last_start - first_start) / 2, granularity)
+        if not first_start <= start <= last_start:
+            start = first_start
+        if any(abs(start - window["start"]) < duration for window in windows):
+            continue
+        users = sorted(user for user, spans in intervals.items()
+                       if any(a <= start and start + duration <= b for a, b in spans))
+        windows.append({"start": start, "end": start + duration,
+                        "participants": len(users), "users": users})
+        if len(windows) == top_k:
+            break
+    return windows
+
+
+def rank_windows(ballots, duration_minutes=60, top_k=3, flexibility_minutes=15):
+    duration = timedelta(minutes=duration_minutes)
+    intervals = availability_intervals(ballots, duration, timedelta(minutes=flexibility_minutes))
+    return best_windows(intervals, duration, top_k)
+
+
+def _round(time, granularity):
+    step = granularity.total_seconds()
+    seconds = (time - datetime.min).total_seconds()
+    return datetime.min + timedelta(seconds=round(seconds / step) * step)
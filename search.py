@@ -0,0 +1,141 @@
+import re
+from urllib.parse import urlparse
+
+from pymongo import DeleteMany, ReplaceOne
+
+# Keyword search over the sessions a user can see. One document per session
+# and one per resource in the search_index collection, so a busy session's
+# entries never grow a single document:
+#   {_id: session_id or resource_id, session_id, kind: "session" | "resource",
+#    label: title, filename or link, url,     # url for resources only
+#    terms: {term: weight},
+#    keys: [every term]}                      # multikey, prefilters prefix queries
+# insert_session / add_resource keep it current; rebuild_search_index.py
+# backfills existing data. Queries are scoped by session_id to the caller's
+# sessions first (session_id_1_keys_1), so their cost depends on how many
+# sessions a user belongs to rather than on the size of the whole corpus.
+
+WEIGHTS = {"title": 3.0, "filename": 2.0, "description": 1.0, "host": 1.0}
+PREFIX_FACTOR = 0.5  # a prefix match counts half as much as a whole word
+STOPWORDS = {"a", "an", "and", "the", "of", "to", "in", "on", "for", "with", "is", "at", "by", "or"}
+_TOKEN = re.compile(r"[^\W_]+")  # words, also split on "_" in filenames
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _terms(fields):
+    terms = {}
+    for field, text in fields:
+        for term in tokenize(text):
+            terms[term] = max(terms.get(term, 0.0), WEIGHTS[field])
+    return terms
+
+
+def _entry(_id, session_id, kind, label, terms, **extra):
+    return {"_id": _id, "session_id": session_id, "kind": kind, "label": label,
+            **extra, "terms": terms, "keys": sorted(terms)}
+
+
+def session_entry(session):
+    return _entry(session["_id"], session["_id"], "session", session.get("title", ""),
+                  _terms([("title", session.get("title")), ("description", session.get("description"))]))
+
+
+def resource_entry(resource):
+    fields = [("filename", resource.get("filename"))]
+    if resource.get("link"):
+        host = urlparse(resource["link"]).hostname or ""
+        fields.append(("host", host.removeprefix("www.")))
+    return _entry(resource["_id"], resource["session_id"], "resource",
+                  resource.get("filename") or resource.get("link", ""), _terms(fields),
+                  url=resource.get("file_url") or resource.get("link"))
+
+
+def search_documents(session, resources):
+    return [session_entry(session)] + [resource_entry(r) for r in resources]
+
+
+class SearchIndex:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def index_session(self, session):
+        entry = session_entry(session)
+        self.collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+    def index_resource(self, resource):
+        entry = resource_entry(resource)
+        self.collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+    def index_new_sessions(self, sessions):
+        # Freshly inserted sessions have no index document yet, so plain inserts do
+        if sessions:
+            self.collection.insert_many([session_entry(s) for s in sessions], ordered=False)
+
+    def rebuild(self, sessions, resources_by_session, batch_size=1000):
+        # Replaces the entries of the given sessions and drops stale ones
+        ops = []
+        for session in sessions:
+            entries = search_documents(session, resources_by_session.get(session["_id"], []))
+            ops += [ReplaceOne({"_id": e["_id"]}, e, upsert=True) for e in entries]
+            ops.append(DeleteMany({"session_id": session["_id"],
+                                   "_id": {"$nin": [e["_id"] for e in entries]}}))
+            if len(ops) >= batch_size:
+                self.collection.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    def search(self, session_ids, query, limit=20):
+        # Every query word must match a whole word or the start of one;
+        # hits are the session itself or one of its resources, best first
+        words = tokenize(query)
+        if not words or not session_ids:
+            return []
+        prefilter = [{"keys": {"$regex": "^" + re.escape(word)}} for word in words]
+        docs = self.collection.find({"session_id": {"$in": list(session_ids)}, "$and": prefilter},
+                                    {"session_id": 1, "kind": 1, "label": 1, "url": 1, "terms": 1})
+        hits = rank(docs, words, limit)
+        # Resource hits name their session; look up titles the query did not match
+        missing = {h["session_id"] for h in hits if h["session_title"] is None}
+        if missing:
+            titles = {doc["_id"]: doc["label"] for doc in self.collection.find(
+                {"_id": {"$in": list(missing)}, "kind": "session"}, {"label": 1})}
+            for hit in hits:
+                if hit["session_title"] is None:
+                    hit["session_title"] = titles.get(hit["session_id"], "")
+        return hits
+
+
+def rank(docs, words, limit=20):
+    hits, titles = [], {}
+    for doc in docs:
+        if doc["kind"] == "session":
+            titles[doc["session_id"]] = doc["label"]
+        score = _score(doc["terms"], words)
+        if score:
+            hits.append({
+                "session_id": doc["session_id"],
+                "resource_id": None if doc["kind"] == "session" else doc["_id"],
+                "label": doc["label"],
+                "url": doc.get("url"),
+                "kind": doc["kind"],
+                "score": score,
+            })
+    for hit in hits:
+        hit["session_title"] = titles.get(hit["session_id"])
+    hits.sort(key=lambda h: (-h["score"], h["label"].lower()))
+    return hits[:limit]
+
+def _score(terms, words):
+    total = 0.0
+    for word in words:
+        best = terms.get(word, 0.0)
+        if not best:
+            best = max((w for t, w in terms.items() if t.startswith(word)), default=0.0) * PREFIX_FACTOR
+        if not best:
+            return 0.0
+        total += best
+    return total
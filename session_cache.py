@@ -0,0 +1,101 @@
+import threading
+from cachetools import TTLCache
+
+# Read-through cache for the session queries in auth.py.
+# auth.py is imported once per process, so one instance is shared by every
+# Streamlit session and survives reruns. Keys look like:
+#   ("participant", email) -> list of sessions the user is invited to
+#   ("host", email)        -> list of sessions the user hosts
+#   ("session", id)        -> single session document (or None)
+#   ("participant_summary", email) / ("host_summary", email)
+#                          -> projected listings, only change on insert
+
+_MISSING = object()
+
+
+class SessionCache:
+    def __init__(self, maxsize=1024, ttl=30):
+        self._maxsize = maxsize
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # session _id -> cache keys whose value contains that session
+        self._keys_by_session = {}
+        # bumped on every invalidation so a load that raced a write is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader, track_sessions=True):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = value
+                if track_sessions:
+                    for session_id in _session_ids(value):
+                        self._keys_by_session.setdefault(session_id, set()).add(key)
+                    if len(self._keys_by_session) > 4 * self._maxsize:
+                        self._prune_index()
+        return value
+
+    def invalidate_session(self, session_id):
+        # Drop the document itself and every listing that embeds it
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(("session", session_id), None)
+            for key in self._keys_by_session.pop(session_id, ()):
+                self._entries.pop(key, None)
+
+    def invalidate_listings(self, host_email=None, participants=()):
+        # A new session only changes the listings of its host and invitees
+        with self._lock:
+            self._generation += 1
+            if host_email:
+                self._entries.pop(("host", host_email), None)
+                self._entries.pop(("host_summary", host_email), None)
+            for email in participants:
+                self._entries.pop(("participant", email), None)
+                self._entries.pop(("participant_summary", email), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_session.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+            }
+
+    def _prune_index(self):
+        # Expired/evicted keys leave stale entries in the reverse index
+        live = set(self._entries.keys())
+        for session_id in list(self._keys_by_session):
+            keys = self._keys_by_session[session_id] & live
+            if keys:
+                self._keys_by_session[session_id] = keys
+            else:
+                del self._keys_by_session[session_id]
+
+
+def _session_ids(value):
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value["_id"]] if "_id" in value else []
+    return [doc["_id"] for doc in value if "_id" in doc]
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import re
+from datetime import date, datetime, timedelta
+
+from auth import insert_sessions, new_session_document
+import notifications
+
+# Bulk session creation from a roster file, e.g. a coordinator creating one
+# session per course section. Accepted layouts:
+#   CSV  title,description,participants,propose_deadline
+#        (participants separated by ";", "," or whitespace)
+#   CSV  title,email[,description,propose_deadline]   one row per invitee,
+#        rows sharing a title become one session
+#   JSON [{"title", "description", "participants": [...] or "a;b", "propose_deadline"}]
+# Emails are trimmed and deduplicated; "Name <a@b.edu>" is accepted. Case is
+# kept as given, because accounts and invitations match emails exactly.
+# Bad rows are reported by row number and the rest still import.
+
+EMAIL = re.compile(r"^[^@\s<>]+@[^@\s<>]+\.[^@\s<>]+$")
+# One entry: an optional display name (quoted, or words without "@") followed
+# by <address>, or else any run of non-separator characters
+_ENTRY = re.compile(r'(?:"[^"]*"|[^;,\s<>@"]+(?:\s+[^;,\s<>@"]+)*)?\s*<[^>]*>|[^;,\s]+')
+MAX_ROWS = 10000
+
+
+class RosterError(ValueError):
+    pass
+
+
+def normalize_email(raw):
+    raw = raw.strip()
+    if raw.endswith(">") and "<" in raw:
+        raw = raw[raw.rindex("<") + 1:-1]
+    email = raw.strip().strip("\"'")
+    return email if EMAIL.match(email) else None
+
+
+def parse_emails(value):
+    # Returns (valid emails in first-seen order, invalid entries)
+    if isinstance(value, str):
+        # Split on ";", "," and whitespace, keeping "Name <email>" together
+        value = _ENTRY.findall(value)
+    valid, invalid = {}, []
+    for raw in value or []:
+        raw = str(raw).strip()
+        if not raw:
+            continue
+        email = normalize_email(raw)
+        if email:
+            valid.setdefault(email, None)
+        else:
+            invalid.append(raw)
+    return list(valid), invalid
+
+
+def read_roster(data, filename=""):
+    # Raw rows as dicts, each with its 1-based source row number under "_row"
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise RosterError(f"Invalid JSON: {e}") from e
+        if not isinstance(records, list):
+            raise RosterError("JSON roster must be a list of sessions")
+        rows = [dict(record, _row=i + 1) for i, record in enumerate(records) if isinstance(record, dict)]
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or "title" not in [f.strip().lower() for f in reader.fieldnames]:
+            raise RosterError("CSV roster needs a header row with a 'title' column")
+        rows = [{(k or "").strip().lower(): (v or "").strip() for k, v in row.items()} | {"_row": i + 2}
+                for i, row in enumerate(reader)]
+        if rows and "participants" not in rows[0] and "email" in rows[0]:
+            rows = _group_by_title(rows)
+    if len(rows) > MAX_ROWS:
+        raise RosterError(f"Roster has {len(rows)} rows; the limit is {MAX_ROWS}")
+    return rows
+
+
+def _group_by_title(rows):
+    sessions = {}
+    for row in rows:
+        key = row.get("title", "").strip()
+        session = sessions.setdefault(key, dict(row, participants=[]))
+        session["participants"].append(row.get("email", ""))
+    return list(sessions.values())
+
+
+def prepare_sessions(rows, host_email, default_deadline=None):
+    # Returns (session documents, [row errors]); a row error is {"row", "title", "error"}
+    default_deadline = default_deadline or date.today() + timedelta(days=7)
+    docs, errors = [], []
+    for row in rows:
+        title = str(row.get("title") or "").strip()
+        participants, invalid = parse_emails(row.get("participants"))
+        problem = None
+        if not title:
+            problem = "missing title"
+        elif not participants:
+            problem = "no valid participant emails"
+        deadline = default_deadline
+        if not problem and row.get("propose_deadline"):
+            try:
+                deadline = datetime.strptime(str(row["propose_deadline"]).strip(), "%Y-%m-%d").date()
+            except ValueError:
+                problem = f"bad propose_deadline {row['propose_deadline']!r} (use YYYY-MM-DD)"
+        if problem:
+            errors.append({"row": row["_row"], "title": title, "error": problem})
+            continue
+        if invalid:
+            errors.append({"row": row["_row"], "title": title,
+                           "error": f"skipped invalid email(s): {', '.join(invalid)}", "warning": True})
+        doc = new_session_document(host_email, title, str(row.get("description") or ""),
+                                   participants, deadline)
+        doc["_row"] = row["_row"]
+        docs.append(doc)
+    return docs, errors
+
+
+def import_sessions(rows, host_email, default_deadline=None, invite=True, batch_size=1000):
+    docs, errors = prepare_sessions(rows, host_email, default_deadline)
+    source_rows = [doc.pop("_row") for doc in docs]
+    created, failed = insert_sessions(docs, batch_size=batch_size)
+    for index, message in failed:
+        errors.append({"row": source_rows[index], "title": docs[index]["title"], "error": message})
+    invited = notifications.enqueue_invitations(created) if invite and created else 0
+    errors.sort(key=lambda e: e["row"])
+    return {
+        "rows": len(rows),
+        "created": len(created),
+        "session_ids": [doc["_id"] for doc in created],
+        "invitations_queued": invited,
+        "errors": [e for e in errors if not e.get("warning")],
+        "warnings": [{k: v for k, v in e.items() if k != "warning"} for e in errors if e.get("warning")],
+    }
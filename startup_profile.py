@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Cold-start breakdown. Heavy integrations are imported and initialized the
+# first time their page is visited; each of those steps is wrapped in
+# section("import:<page>") / section("init:<name>"). When the PROFILE_STARTUP
+# env var names a file, the first run of every section in this process is
+# appended to it as a JSON line:
+#   {"pid", "section", "ms", "since_start_ms", "modules": [top-level packages loaded]}
+#
+#   PROFILE_STARTUP=startup_profile.jsonl streamlit run app.py
+#
+# An env var rather than st.secrets, so it is read before anything else loads.
+
+PROCESS_START = time.perf_counter()
+_path = os.environ.get("PROFILE_STARTUP")
+_seen = set()
+_lock = threading.Lock()
+
+
+def enabled():
+    return bool(_path)
+
+
+@contextmanager
+def section(name):
+    if not _path or name in _seen:
+        yield
+        return
+    before = set(sys.modules)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        loaded = {module.split(".")[0] for module in set(sys.modules) - before}
+        record(name, elapsed, sorted(loaded))
+
+
+def record(name, seconds, modules=()):
+    with _lock:
+        if name in _seen:
+            return
+        _seen.add(name)
+        entry = {
+            "pid": os.getpid(),
+            "section": name,
+            "ms": round(seconds * 1000, 2),
+            "since_start_ms": round((time.perf_counter() - PROCESS_START) * 1000, 2),
+            "modules": list(modules),
+        }
+        with open(_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def load(path, last_process_only=True):
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if last_process_only and entries:
+        entries = [entry for entry in entries if entry["pid"] == entries[-1]["pid"]]
+    return entries
+
+
+def report(path, last_process_only=True):
+    # Slowest sections first, for `python startup_profile.py <file>`
+    entries = load(path, last_process_only)
+    for entry in sorted(entries, key=lambda e: e["ms"], reverse=True):
+        modules = ", ".join(entry["modules"][:8])
+        print(f"{entry['ms']:9.1f} ms  {entry['section']:<28} {modules}")
+
+
+if __name__ == "__main__":
+    report(sys.argv[1] if len(sys.argv) > 1 else "startup_profile.jsonl")
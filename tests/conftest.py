@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+import streamlit as st
+
+# Tests run against mongomock and the local API stubs in benchmarks/_stubs.py.
+# auth.py reads st.secrets and connects at import time, so the secrets are
+# in place before any app module is imported.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+from _stubs import StubServer  # noqa: E402
+
+stub_server = StubServer().start()
+st.secrets = {
+    "MONGO_URI": "mongomock://",
+    "SENDGRID_API_KEY": "SG.test",
+    "SENDGRID_API_HOST": stub_server.url,
+    "GOOGLE_CALENDAR_ENDPOINT": stub_server.url + "/",
+    "GOOGLE_TOKEN_URI": stub_server.url + "/token",
+    "CLOUDINARY_CLOUD_NAME": "stub",
+    "CLOUDINARY_API_KEY": "key",
+    "CLOUDINARY_API_SECRET": "secret",
+    "CLOUDINARY_UPLOAD_PREFIX": stub_server.url,
+}
+
+
+@pytest.fixture
+def stub():
+    stub_server.reset()
+    yield stub_server
+    stub_server.reset()
@@ -0,0 +1,75 @@
+import os
+
+import feedback_store
+from feedback_store import FeedbackStore
+
+
+def entry(i):
+    return {"session_id": f"s{i % 3}", "title": "Calculus", "duration": 60,
+            "rating": i % 5 + 1, "comment": ""}
+
+
+def segments(store):
+    return [name for name in os.listdir(store.root) if name.startswith("segment-")]
+
+
+def test_log_rolls_into_segments_and_segments_compact(tmp_path):
+    store = FeedbackStore(str(tmp_path), segment_rows=3, max_segments=2)
+    for i in range(8):
+        store.append(entry(i))
+    assert len(segments(store)) == 2
+    assert len(store._read_log()) == 2
+
+    store.append(entry(8))
+
+    assert len(segments(store)) == 1
+    assert not os.path.exists(store._log_path)
+    assert len(store.read()) == 9
+    assert store.aggregates().rows == 9
+
+
+def test_log_length_is_recounted_after_another_writer(tmp_path):
+    first = FeedbackStore(str(tmp_path), segment_rows=4)
+    second = FeedbackStore(str(tmp_path), segment_rows=4)
+    first.append(entry(0))
+    second.append(entry(1))
+    first.append(entry(2))
+    assert segments(first) == []
+
+    second.append(entry(3))
+
+    assert len(segments(first)) == 1
+    assert len(first.read()) == 4
+
+
+def test_torn_line_is_not_counted_as_an_entry(tmp_path):
+    store = FeedbackStore(str(tmp_path), segment_rows=2)
+    store.append(entry(0))
+    with open(store._log_path, "ab") as log:
+        log.write(b'{"session_id": "tor')
+
+    store.append(entry(1))
+
+    assert len(segments(store)) == 1
+    assert len(store.read()) == 2
+
+
+def test_get_store_is_shared_per_directory(tmp_path):
+    assert feedback_store.get_store(str(tmp_path)) is feedback_store.get_store(str(tmp_path))
+
+
+def test_rebuild_aggregates_reports_drift(tmp_path):
+    store = FeedbackStore(str(tmp_path))
+    store.append(entry(0))
+    store.append(entry(1))
+    drifted = store.aggregates()
+    drifted.rows = 5
+    drifted.sessions["s1"] = [9, 9]
+    store._save_aggregates(drifted)
+
+    report = store.rebuild_aggregates(dry_run=True)
+    assert report["drift"] == {"rows": (5, 2), "sessions.s1": ([9, 9], [2, 1])}
+    assert store.aggregates().rows == 5
+
+    store.rebuild_aggregates()
+    assert store.rebuild_aggregates(dry_run=True)["drift"] == {}
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+import google_calendar
+
+
+def event(event_id, days_ahead, summary="Study group"):
+    start = datetime.now(timezone.utc) + timedelta(days=days_ahead)
+    return {"id": event_id, "summary": summary,
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + timedelta(hours=1)).isoformat()}}
+
+
+@pytest.fixture
+def cache():
+    # ttl=0 makes every read go back to the fake Calendar API
+    return google_calendar.EventCache(ttl=0)
+
+
+@pytest.fixture
+def creds():
+    return Credentials(token="access-token")
+
+
+def ids(events):
+    return [e["id"] for e in events]
+
+
+def test_full_sync_follows_pages(stub, cache, creds):
+    for i in range(5):
+        stub.calendar.put(event(f"e{i}", i + 1))
+
+    assert ids(cache.upcoming("a@x.edu", creds, days=7)) == ["e0", "e1", "e2", "e3", "e4"]
+    assert stub.requests["google.events_list"] == 3
+    assert all("syncToken" not in q for q in stub.received["google.events_list"])
+
+
+def test_incremental_sync_applies_changes_and_cancellations(stub, cache, creds):
+    stub.calendar.put(event("keep", 1))
+    stub.calendar.put(event("drop", 2))
+    cache.upcoming("a@x.edu", creds)
+
+    stub.calendar.cancel("drop")
+    stub.calendar.put(event("keep", 3, summary="Moved"))
+    stub.calendar.put(event("new", 4))
+    events = cache.upcoming("a@x.edu", creds)
+
+    assert ids(events) == ["keep", "new"]
+    assert events[0]["summary"] == "Moved"
+    assert stub.received["google.events_list"][-1]["syncToken"] == "2"
+
+
+def test_expired_sync_token_falls_back_to_full_sync(stub, cache, creds):
+    stub.calendar.put(event("old", 1))
+    cache.upcoming("a@x.edu", creds)
+
+    stub.calendar.cancel("old")
+    stub.calendar.put(event("fresh", 2))
+    stub.calendar.expire_sync_tokens()
+
+    assert ids(cache.upcoming("a@x.edu", creds)) == ["fresh"]
+    gone, full = stub.received["google.events_list"][-2:]
+    assert "syncToken" in gone and "syncToken" not in full
+
+
+def test_mirror_keeps_only_events_before_the_horizon(stub, cache, creds):
+    stub.calendar.put(event("soon", 1))
+    stub.calendar.put(event("far", google_calendar.MIRROR_DAYS + 10))
+    stub.calendar.put(event("past", -3))
+
+    assert ids(cache.upcoming("a@x.edu", creds, days=7)) == ["soon"]
+    assert list(cache._state("a@x.edu", creds).events) == ["soon"]
+
+
+def test_window_past_the_horizon_forces_full_sync(stub, cache, creds):
+    stub.calendar.put(event("far", google_calendar.MIRROR_DAYS + 10))
+    cache.upcoming("a@x.edu", creds)
+
+    events = cache.upcoming("a@x.edu", creds, days=google_calendar.MIRROR_DAYS + 20)
+
+    assert ids(events) == ["far"]
+    assert all("syncToken" not in q for q in stub.received["google.events_list"])
+
+
+@pytest.fixture
+def store():
+    store = google_calendar.TokenStore(google_calendar.db["calendar_tokens_test"])
+    store.collection.delete_many({})
+    expired = Credentials(token="stale", refresh_token="refresh-me",
+                          client_id="client", client_secret="secret",
+                          expiry=datetime.utcnow() - timedelta(minutes=5))
+    store.save("a@x.edu", expired)
+    yield store
+    store.collection.delete_many({})
+
+
+def test_token_store_refreshes_expired_token(stub, store):
+
+    credentials = store.load("a@x.edu")
+
+    assert credentials.valid and credentials.token.startswith("refreshed-")
+    assert parse_qs(stub.received["google.token"][0].decode())["refresh_token"] == ["refresh-me"]
+    assert store.collection.find_one({"_id": "a@x.edu"})["token"]["token"] == credentials.token
+    assert store.load_many(["a@x.edu", "b@x.edu"]).keys() == {"a@x.edu"}
+    assert stub.requests["google.token"] == 1
+
+
+def test_token_store_forgets_revoked_grant(stub, store):
+    stub.script("google.token", 400)
+
+    assert store.load("a@x.edu") is None
+    assert store.collection.find_one({"_id": "a@x.edu"}) is None
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson.objectid import ObjectId
+
+import notifications
+
+SLOT = "2030-01-07T18:00:00"
+
+
+@pytest.fixture
+def outbox():
+    notifications.outbox.delete_many({})
+    yield notifications.outbox
+    notifications.outbox.delete_many({})
+
+
+@pytest.fixture
+def worker(stub, outbox):
+    return notifications.NotificationWorker(outbox, api_key="SG.test", host=stub.url,
+                                            concurrency=2, max_attempts=3, base_delay=60)
+
+
+def session(*participants):
+    return {"_id": ObjectId(), "title": "Linear Algebra", "participants": list(participants)}
+
+
+def make_due(outbox):
+    outbox.update_many({"status": "pending"}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+
+
+def test_confirmations_go_out_as_one_request(stub, outbox, worker):
+    assert notifications.enqueue_confirmations(session("a@x.edu", "b@x.edu", "a@x.edu"), SLOT) == 2
+
+    assert worker.run_once() == 2
+    assert stub.requests["sendgrid.send"] == 1
+    message = json.loads(stub.received["sendgrid.send"][0])
+    assert sorted(p["to"][0]["email"] for p in message["personalizations"]) == ["a@x.edu", "b@x.edu"]
+    assert SLOT in message["content"][0]["value"]
+    assert outbox.count_documents({"status": "sent"}) == 2
+
+
+def test_same_session_recipient_and_slot_is_queued_once(stub, outbox, worker):
+    s = session("a@x.edu", "b@x.edu")
+    assert notifications.enqueue_confirmations(s, SLOT) == 2
+    worker.run_once()
+
+    assert notifications.enqueue_confirmations(s, SLOT) == 0
+    assert worker.run_once() == 0
+    assert stub.requests["sendgrid.send"] == 1
+    # A different slot is a new confirmation
+    assert notifications.enqueue_confirmations(s, "2030-01-08T18:00:00") == 2
+
+
+@pytest.mark.parametrize("status", [500, 429])
+def test_transient_errors_are_retried_with_backoff(stub, outbox, worker, status):
+    notifications.enqueue_confirmations(session("a@x.edu"), SLOT)
+    stub.script("sendgrid.send", status)
+
+    before = datetime.utcnow()
+    worker.run_once()
+    job = outbox.find_one()
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1
+    assert str(status) in job["last_error"]
+    delay = (job["next_attempt_at"] - before).total_seconds()
+    assert 60 * 0.8 - 1 <= delay <= 60 * 1.2 + 1
+
+    assert worker.run_once() == 0  # not due yet
+    make_due(outbox)
+    worker.run_once()
+    assert outbox.find_one()["status"] == "sent"
+    assert worker.sent == 1
+
+
+def test_backoff_doubles_per_attempt(stub, outbox, worker):
+    notifications.enqueue_confirmations(session("a@x.edu"), SLOT)
+    stub.script("sendgrid.send", 503, 503)
+    worker.run_once()
+    make_due(outbox)
+    before = datetime.utcnow()
+    worker.run_once()
+    job = outbox.find_one()
+    assert job["attempts"] == 2
+    assert 120 * 0.8 - 1 <= (job["next_attempt_at"] - before).total_seconds() <= 120 * 1.2 + 1
+
+
+def test_permanent_client_error_is_not_retried(stub, outbox, worker):
+    notifications.enqueue_confirmations(session("a@x.edu", "b@x.edu"), SLOT)
+    stub.script("sendgrid.send", 400)
+
+    worker.run_once()
+    assert outbox.count_documents({"status": "failed", "attempts": 1}) == 2
+    make_due(outbox)
+    assert worker.run_once() == 0
+    assert stub.requests["sendgrid.send"] == 1
+    assert worker.failed == 2
+
+
+def test_gives_up_after_max_attempts(stub, outbox, worker):
+    notifications.enqueue_confirmations(session("a@x.edu"), SLOT)
+    stub.script("sendgrid.send", 500, 500, 500)
+    for _ in range(3):
+        make_due(outbox)
+        worker.run_once()
+    job = outbox.find_one()
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+
+
+def test_expired_lease_is_reclaimed(stub, outbox, worker):
+    now = datetime.utcnow()
+    base = {"session_id": ObjectId(), "final_slot": SLOT, "kind": "confirmation", "title": "T",
+            "attempts": 0, "next_attempt_at": now, "created_at": now, "status": "sending"}
+    outbox.insert_many([
+        dict(base, recipient="crashed@x.edu", lease_until=now - timedelta(seconds=1)),
+        dict(base, recipient="inflight@x.edu", lease_until=now + timedelta(minutes=2)),
+    ])
+
+    assert worker.run_once() == 1
+    assert outbox.find_one({"recipient": "crashed@x.edu"})["status"] == "sent"
+    assert outbox.find_one({"recipient": "inflight@x.edu"})["status"] == "sending"
+
+
+def test_claims_are_disjoint_between_workers(stub, outbox, worker):
+    notifications.enqueue_confirmations(session("a@x.edu", "b@x.edu", "c@x.edu"), SLOT)
+    other = notifications.NotificationWorker(outbox, api_key="SG.test", host=stub.url, batch_size=2)
+
+    claimed = other._claim()
+    assert len(claimed) == 2
+    assert len({job["lease_id"] for job in claimed}) == 1
+    rest = worker._claim()
+    assert [job["recipient"] for job in rest] == ["c@x.edu"]
+    assert worker._claim() == []
+
+
+def test_invitations_use_the_invitation_template(stub, outbox, worker):
+    s = dict(session("a@x.edu"), propose_deadline="2030-01-05")
+    assert notifications.enqueue_invitations([s]) == 1
+    worker.run_once()
+    message = json.loads(stub.received["sendgrid.send"][0])
+    assert "Invited" in message["subject"]
+    assert "2030-01-05" in message["content"][0]["value"]
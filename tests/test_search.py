@@ -0,0 +1,79 @@
+import pytest
+from bson.objectid import ObjectId
+
+import search
+from auth import db
+
+
+@pytest.fixture
+def index():
+    index = search.SearchIndex(db["search_index_test"])
+    index.collection.delete_many({})
+    yield index
+    index.collection.delete_many({})
+
+
+def session(title, description=""):
+    return {"_id": ObjectId(), "title": title, "description": description}
+
+
+def resource(session_id, **fields):
+    return {"_id": ObjectId(), "session_id": session_id, **fields}
+
+
+def test_each_resource_is_its_own_entry(index):
+    algebra = session("Linear Algebra", "eigenvalues")
+    index.index_session(algebra)
+    notes = resource(algebra["_id"], filename="eigen_notes.pdf", file_url="https://files.test/eigen.pdf")
+    index.index_resource(notes)
+    index.index_resource(resource(algebra["_id"], link="https://www.github.com/x/algebra"))
+
+    assert index.collection.count_documents({"session_id": algebra["_id"]}) == 3
+    assert index.collection.find_one({"_id": notes["_id"]})["keys"] == ["eigen", "notes", "pdf"]
+
+
+def test_hits_rank_sessions_and_resources(index):
+    algebra = session("Linear Algebra", "eigenvalues")
+    chemistry = session("Organic Chemistry")
+    index.index_new_sessions([algebra, chemistry])
+    notes = resource(algebra["_id"], filename="eigen_notes.pdf", file_url="https://files.test/eigen.pdf")
+    index.index_resource(notes)
+
+    hits = index.search({algebra["_id"], chemistry["_id"]}, "eigen")
+
+    assert [(h["kind"], h["label"]) for h in hits] == [("resource", "eigen_notes.pdf"),
+                                                       ("session", "Linear Algebra")]
+    assert hits[0]["resource_id"] == notes["_id"]
+    assert hits[0]["url"] == "https://files.test/eigen.pdf"
+    assert hits[0]["session_title"] == "Linear Algebra"
+
+
+def test_resource_hit_names_its_session_without_a_session_match(index):
+    algebra = session("Linear Algebra")
+    index.index_session(algebra)
+    index.index_resource(resource(algebra["_id"], link="https://github.com/x/y"))
+
+    hits = index.search({algebra["_id"]}, "github")
+
+    assert [(h["kind"], h["session_title"]) for h in hits] == [("resource", "Linear Algebra")]
+
+
+def test_search_is_scoped_to_the_given_sessions(index):
+    mine, other = session("Thermodynamics"), session("Thermodynamics II")
+    index.index_new_sessions([mine, other])
+
+    assert [h["session_id"] for h in index.search({mine["_id"]}, "thermo")] == [mine["_id"]]
+    assert index.search({mine["_id"]}, "thermo quantum") == []
+
+
+def test_rebuild_replaces_a_sessions_entries(index):
+    algebra = session("Linear Algebra")
+    stale = resource(algebra["_id"], filename="old.pdf")
+    index.index_session(algebra)
+    index.index_resource(stale)
+    kept = resource(algebra["_id"], filename="new.pdf")
+
+    index.rebuild([dict(algebra, title="Matrix Algebra")], {algebra["_id"]: [kept]})
+
+    assert {d["_id"] for d in index.collection.find()} == {algebra["_id"], kept["_id"]}
+    assert index.search({algebra["_id"]}, "matrix")[0]["label"] == "Matrix Algebra"
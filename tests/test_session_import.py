@@ -0,0 +1,20 @@
+import pytest
+
+from session_import import parse_emails
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("a@x.edu; b@x.edu,c@x.edu", (["a@x.edu", "b@x.edu", "c@x.edu"], [])),
+    ("a@x.edu b@x.edu\nc@x.edu", (["a@x.edu", "b@x.edu", "c@x.edu"], [])),
+    ("a@x.edu Bob <b@x.edu>", (["a@x.edu", "b@x.edu"], [])),
+    ("Bob Smith <b@x.edu>, Ann <a@x.edu>", (["b@x.edu", "a@x.edu"], [])),
+    ('"Smith, Bob" <b@x.edu>; a@x.edu', (["b@x.edu", "a@x.edu"], [])),
+    ("Bob b@x.edu", (["b@x.edu"], ["Bob"])),
+    ("a@x.edu not-an-email A@x.edu a@x.edu", (["a@x.edu", "A@x.edu"], ["not-an-email"])),
+])
+def test_parse_emails(value, expected):
+    assert parse_emails(value) == expected
+
+
+def test_parse_emails_accepts_a_list():
+    assert parse_emails([" a@x.edu ", "Bob <b@x.edu>", "", "bad"]) == (["a@x.edu", "b@x.edu"], ["bad"])
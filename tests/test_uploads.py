@@ -0,0 +1,28 @@
+import io
+
+import pytest
+
+import uploads
+
+
+@pytest.fixture
+def blobs():
+    uploads.blobs.delete_many({})
+    yield uploads.blobs
+    uploads.blobs.delete_many({})
+
+
+def test_public_id_keeps_the_extension():
+    assert uploads.public_id_for("abc", "Lecture Notes.PDF") == "abc.pdf"
+    assert uploads.public_id_for("abc", "README") == "abc"
+    assert uploads.public_id_for("abc", "weird.ext with spaces") == "abc"
+
+
+def test_upload_keeps_the_extension_and_deduplicates(stub, blobs):
+    content = b"%PDF-1.7 eigenvalues"
+    first = uploads.upload_resource(io.BytesIO(content), "notes.pdf")
+    again = uploads.upload_resource(io.BytesIO(content), "copy.pdf")
+
+    assert first["url"].endswith(f"study_sessions/blobs/{first['sha256']}.pdf")
+    assert again["deduplicated"] and again["url"] == first["url"]
+    assert stub.requests["cloudinary.upload"] == 1
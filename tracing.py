@@ -0,0 +1,133 @@
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+
+# In-process timings for page runs and hot-path calls (auth.py data functions,
+# bcrypt, Mongo commands, Cloudinary, SendGrid, Google APIs). Each span costs
+# two perf_counter() calls, a deque append and a histogram observe, so it is
+# left on in production. Recent samples per name live in a ring buffer for
+# exact percentiles on the admin page; the Prometheus histograms cover the
+# whole process lifetime.
+#
+# Names look like "page.dashboard", "auth.get_vote_counts", "mongo.find",
+# "sendgrid.send". The part before the first dot is the exported `kind` label.
+
+RING_SIZE = 2048
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry = CollectorRegistry()
+_latency = Histogram("studysync_span_seconds", "Time spent in a traced page run or call",
+                     ["kind", "name"], buckets=BUCKETS, registry=registry)
+_errors = Counter("studysync_span_errors", "Traced spans that raised",
+                  ["kind", "name"], registry=registry)
+
+
+class _Series:
+    __slots__ = ("samples", "count", "errors", "total", "histogram", "error_counter")
+
+    def __init__(self, name):
+        kind = name.split(".", 1)[0]
+        self.samples = deque(maxlen=RING_SIZE)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.histogram = _latency.labels(kind, name)
+        self.error_counter = _errors.labels(kind, name)
+
+
+_series = {}
+_lock = threading.Lock()
+
+
+def record(name, seconds, error=False):
+    # Plain attribute updates without a lock: a rare lost increment under
+    # contention is an acceptable price for keeping spans cheap
+    series = _series.get(name)
+    if series is None:
+        with _lock:
+            series = _series.setdefault(name, _Series(name))
+    series.samples.append(seconds)
+    series.count += 1
+    series.total += seconds
+    series.histogram.observe(seconds)
+    if error:
+        series.errors += 1
+        series.error_counter.inc()
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        # st.rerun()/st.stop() raise BaseException subclasses; not errors
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, error)
+
+
+def traced(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                record(name, time.perf_counter() - start, error)
+        return wrapper
+    return decorate
+
+
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else 0.0
+
+
+def snapshot(prefix=""):
+    # One row per name; percentiles over the last RING_SIZE samples
+    with _lock:
+        items = [(name, series) for name, series in _series.items() if name.startswith(prefix)]
+    rows = []
+    for name, series in sorted(items):
+        recent = sorted(series.samples)
+        rows.append({
+            "name": name,
+            "count": series.count,
+            "errors": series.errors,
+            "mean_ms": series.total / series.count * 1000 if series.count else 0.0,
+            "p50_ms": _percentile(recent, 50) * 1000,
+            "p95_ms": _percentile(recent, 95) * 1000,
+            "p99_ms": _percentile(recent, 99) * 1000,
+            "max_ms": recent[-1] * 1000 if recent else 0.0,
+        })
+    return rows
+
+
+def export_prometheus():
+    return generate_latest(registry).decode("utf-8")
+
+
+_server_lock = threading.Lock()
+_server_started = False
+
+
+def serve(port):
+    # Optional scrape endpoint next to Streamlit (METRICS_PORT); once per process
+    global _server_started
+    from prometheus_client import start_http_server
+    with _server_lock:
+        if not _server_started:
+            start_http_server(int(port), registry=registry)
+            _server_started = True
+
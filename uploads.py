@@ -0,0 +1,111 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+from cloudinary_config import cloudinary
+import cloudinary.uploader
+
+from auth import db
+import tracing
+
+# Resource uploads are content-addressed: the file is hashed locally in
+# chunks first, and if the same bytes were ever uploaded (to any session) the
+# existing Cloudinary asset is linked instead of uploading again. New files go
+# through Cloudinary's chunked upload_large path. Raw assets only keep an
+# extension as part of their public_id, so it is appended to the hash.
+
+HASH_CHUNK_SIZE = 1024 * 1024
+_EXTENSION = re.compile(r"\.[A-Za-z0-9]{1,10}")
+UPLOAD_CHUNK_SIZE = int(st.secrets.get("CLOUDINARY_CHUNK_SIZE", 20 * 1024 * 1024))
+
+blobs = db["resource_blobs"]  # _id = sha256 of the content
+
+
+class UploadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.deduplicated = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+        self.upload_seconds = 0.0
+
+    def record(self, size, seconds, deduplicated):
+        with self._lock:
+            if deduplicated:
+                self.deduplicated += 1
+                self.bytes_saved += size
+            else:
+                self.uploads += 1
+                self.bytes_uploaded += size
+                self.upload_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "deduplicated": self.deduplicated,
+                "bytes_uploaded": self.bytes_uploaded,
+                "bytes_saved": self.bytes_saved,
+                "throughput_bytes_per_s": (self.bytes_uploaded / self.upload_seconds
+                                           if self.upload_seconds else 0.0),
+            }
+
+
+stats = UploadStats()
+
+
+def hash_stream(file_obj, chunk_size=HASH_CHUNK_SIZE):
+    digest = hashlib.sha256()
+    size = 0
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest(), size
+
+
+def public_id_for(content_hash, filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    return content_hash + ext if _EXTENSION.fullmatch(ext) else content_hash
+
+
+def upload_resource(file_obj, filename):
+    content_hash, size = hash_stream(file_obj)
+    blob = blobs.find_one({"_id": content_hash})
+    if blob:
+        stats.record(size, 0.0, deduplicated=True)
+        return {"url": blob["url"], "sha256": content_hash, "bytes": size,
+                "deduplicated": True, "seconds": 0.0}
+
+    start = time.perf_counter()
+    with tracing.span("cloudinary.upload_large"):
+        result = cloudinary.uploader.upload_large(
+            file_obj,
+            resource_type="raw",  # for non-image files like PDFs, DOCs
+            folder="study_sessions/blobs/",
+            public_id=public_id_for(content_hash, filename),
+            filename=filename,
+            chunk_size=UPLOAD_CHUNK_SIZE,
+        )
+    seconds = time.perf_counter() - start
+
+    # A concurrent upload of the same bytes may have won; either URL is valid
+    blobs.update_one(
+        {"_id": content_hash},
+        {"$setOnInsert": {
+            "url": result["secure_url"],
+            "public_id": result.get("public_id"),
+            "bytes": size,
+            "filename": filename,
+            "created_at": datetime.utcnow(),
+        }},
+        upsert=True)
+    stats.record(size, seconds, deduplicated=False)
+    return {"url": result["secure_url"], "sha256": content_hash, "bytes": size,
+            "deduplicated": False, "seconds": seconds}